@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List
+import asyncio
 import uuid
 from datetime import datetime, timedelta
 from ..core.auth import get_current_user
+from ..core.stats import stats as stats_aggregator
+from ..ml.features import feature_store
 from ..schemas import AnomalyAlert, DashboardStats
 import logging
 
@@ -65,18 +68,26 @@ async def get_alerts(
 
 @router.get("/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
+    series: bool = False,
+    buckets: int = 60,
     current_user: str = Depends(get_current_user)
 ):
     """
-    Get dashboard statistics
+    Get dashboard statistics from the incrementally maintained aggregate.
+    Pass ``series=true`` to include the most recent ``buckets`` time buckets.
     """
     try:
+        # Totals are shared by every API and Celery worker process
+        totals = await asyncio.to_thread(stats_aggregator.totals)
         stats = DashboardStats(
-            total_documents=25,
-            total_queries=150,
-            avg_processing_time=2.3,
-            anomalies_detected=len(MOCK_ALERTS),
-            last_processed=datetime.utcnow() - timedelta(minutes=15)
+            total_documents=totals.count("parse"),
+            total_queries=totals.count("query"),
+            avg_processing_time=round(totals.mean("parse", "query"), 3),
+            anomalies_detected=totals.distinct("anomalies"),
+            last_processed=totals.last_seen("parse"),
+            latency=stats_aggregator.latency(),
+            series=stats_aggregator.series(buckets) if series else None,
+            corpus=feature_store.summary()
         )
         
         return stats
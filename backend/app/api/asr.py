@@ -1,9 +1,11 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from ..core.auth import get_current_user
+from ..core.config import settings
+from ..core.metrics import span
+from ..core.ratelimit import admit
+from ..ml.audio import is_wav, preprocess_wav
 from ..ml.granite_client import granite_client
 from ..schemas import ASRResponse
-import aiofiles
-import os
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,7 +16,7 @@ router = APIRouter()
 async def speech_to_text(
     audio_file: UploadFile = File(...),
     language: str = "en-US",
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(admit("asr"))
 ):
     """
     Convert speech to text using IBM Granite ASR
@@ -30,14 +32,36 @@ async def speech_to_text(
         # Read audio file content
         audio_data = await audio_file.read()
         
-        # Call Granite ASR service
-        result = await granite_client.speech_to_text(audio_data, language)
+        # Downsample and cut dead air from WAV input before paying for upload and ASR time
+        report = {}
+        if settings.asr_preprocess and is_wav(audio_data):
+            try:
+                with span("audio_preprocess"):
+                    audio_data, report = await asyncio.to_thread(
+                        preprocess_wav,
+                        audio_data,
+                        settings.asr_sample_rate,
+                        settings.asr_max_pause,
+                        settings.asr_vad_threshold_db
+                    )
+            except ValueError as e:
+                # Encodings we cannot decode go to the ASR service untouched
+                logger.warning(f"Skipping audio preprocessing: {e}")
+        
+        if report and not report["processed_duration"]:
+            # Nothing but silence
+            result = {"transcript": "", "confidence": 0.0, "duration": 0.0, "language": language}
+        else:
+            # Call Granite ASR service
+            result = await granite_client.speech_to_text(audio_data, language)
         
         response = ASRResponse(
             transcript=result["transcript"],
             confidence=result["confidence"],
             duration=result.get("duration"),
-            language=result["language"]
+            language=result["language"],
+            original_duration=report.get("original_duration"),
+            processed_duration=report.get("processed_duration")
         )
         
         logger.info(f"Successfully transcribed audio file: {audio_file.filename}")
@@ -0,0 +1,257 @@
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import multiprocessing
+import os
+import tarfile
+import time
+import uuid
+import zipfile
+import logging
+from ..core.config import settings
+from ..core.metrics import capture_observations, record_observations
+from ..core.ratelimit import admission, admit
+from ..core.stats import stats
+from ..core.storage import storage
+from ..schemas import BulkParseResult
+from .parse import build_document, embedding_job, index_document, parse_file, save_file_content
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# (filename, content, error) for each file found in the request
+Member = Tuple[str, Optional[bytes], Optional[str]]
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _init_worker(overrides: Dict[str, Any]) -> None:
+    """Workers start from a fresh interpreter; apply the API process's settings"""
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """
+    Worker processes for parsing; pdfminer and pandas are CPU-bound.
+    Workers come from a forkserver rather than a fork of the API process,
+    whose threads (stats flusher, to_thread pool) may hold locks that a
+    forked child would inherit locked.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=settings.bulk_parse_workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_init_worker,
+            initargs=(settings.model_dump(),)
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def _parse_in_worker(key: str, file_extension: str) -> Tuple[Optional[Dict[str, Any]], Optional[int], Optional[str], list]:
+    """
+    Runs in a pool process; HTTPException does not pickle, so errors come
+    back as values. Metrics observed while parsing are returned too, since
+    only the parent process's registry is scraped.
+    """
+    with capture_observations() as observations:
+        try:
+            return parse_file(key, file_extension), None, None, observations
+        except HTTPException as e:
+            return None, e.status_code, e.detail, observations
+        except Exception as e:
+            return None, 500, str(e), observations
+
+
+def _too_large(filename: str) -> Member:
+    return filename, None, f"File too large. Maximum size is {settings.max_file_size / (1024*1024):.1f}MB"
+
+
+def _read_limited(stream) -> Optional[bytes]:
+    data = stream.read(settings.max_file_size + 1)
+    return None if len(data) > settings.max_file_size else data
+
+
+def _iter_zip(upload: UploadFile) -> Iterator[Member]:
+    with zipfile.ZipFile(upload.file) as archive:
+        for info in archive.infolist():
+            if info.is_dir():
+                continue
+            if info.file_size > settings.max_file_size:
+                yield _too_large(info.filename)
+                continue
+            with archive.open(info) as member:
+                data = _read_limited(member)
+            yield (info.filename, data, None) if data is not None else _too_large(info.filename)
+
+
+def _iter_tar(upload: UploadFile) -> Iterator[Member]:
+    # Stream mode: members are read in order without seeking or extracting
+    with tarfile.open(fileobj=upload.file, mode="r|*") as archive:
+        for info in archive:
+            if not info.isfile():
+                continue
+            if info.size > settings.max_file_size:
+                yield _too_large(info.name)
+                continue
+            data = _read_limited(archive.extractfile(info))
+            yield (info.name, data, None) if data is not None else _too_large(info.name)
+
+
+def iter_members(files: List[UploadFile]) -> Iterator[Member]:
+    """Yield every file in the request, expanding ZIP/TAR archives one member at a time"""
+    for upload in files:
+        name = upload.filename.lower()
+        try:
+            if name.endswith(ZIP_SUFFIXES) or name.endswith(TAR_SUFFIXES):
+                if upload.size is not None and upload.size > settings.bulk_max_archive_size:
+                    yield upload.filename, None, "Archive too large"
+                elif name.endswith(ZIP_SUFFIXES):
+                    yield from _iter_zip(upload)
+                else:
+                    yield from _iter_tar(upload)
+            elif upload.size is not None and upload.size > settings.max_file_size:
+                yield _too_large(upload.filename)
+            else:
+                upload.file.seek(0)
+                yield upload.filename, upload.file.read(), None
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            yield upload.filename, None, f"Invalid archive: {e}"
+
+
+async def _parse_member(
+    filename: str,
+    content: bytes,
+    current_user: str,
+    parsed: List[Dict[str, Any]]
+) -> BulkParseResult:
+    start_time = time.time()
+    key = await save_file_content(os.path.basename(filename), content)
+    try:
+        file_extension = os.path.splitext(filename)[1].lower()
+        loop = asyncio.get_running_loop()
+        parsed_data, status_code, error, observations = await loop.run_in_executor(
+            get_parse_pool(), _parse_in_worker, key, file_extension
+        )
+        record_observations(observations)
+        if error is not None:
+            await asyncio.to_thread(storage.delete, key)
+            return BulkParseResult(filename=filename, status="error", error=error, status_code=status_code)
+
+        document = build_document(
+            str(uuid.uuid4()), filename, key, len(content),
+            "application/octet-stream", current_user, parsed_data
+        )
+        record = await asyncio.to_thread(index_document, document)
+        if record is not None:
+            parsed.append(record)
+        stats.observe("parse", time.time() - start_time)
+        return BulkParseResult(filename=filename, status="ok", document=document)
+    except Exception as e:
+        logger.error(f"Error parsing {filename} in bulk upload: {e}")
+        await asyncio.to_thread(storage.delete, key)
+        return BulkParseResult(filename=filename, status="error", error=str(e), status_code=500)
+
+
+async def _stream_results(files: List[UploadFile], current_user: str, parsed: List[Dict[str, Any]]):
+    """
+    Parse members concurrently and yield NDJSON lines in completion order.
+    Admission charged one token per uploaded file; archive members beyond
+    that are charged as they are found.
+    """
+    # Bounds both in-flight parses and member bytes held in memory
+    slots = asyncio.Semaphore(settings.bulk_parse_workers * 2)
+    pending = set()
+    members = iter_members(files)
+    count = 0
+
+    async def run(filename: str, content: bytes) -> BulkParseResult:
+        try:
+            return await _parse_member(filename, content, current_user, parsed)
+        finally:
+            slots.release()
+
+    try:
+        while True:
+            await slots.acquire()
+            # Archive reads and decompression stay off the event loop
+            member = await asyncio.to_thread(next, members, None)
+            if member is None:
+                slots.release()
+                break
+            count += 1
+            if count > settings.bulk_max_files:
+                slots.release()
+                yield BulkParseResult(
+                    filename=member[0], status="error", status_code=413,
+                    error=f"Too many files. Maximum is {settings.bulk_max_files} per request"
+                ).model_dump_json() + "\n"
+                break
+            if count > len(files) and settings.admission_enabled and await admission.charge(current_user, "parse_bulk"):
+                slots.release()
+                yield BulkParseResult(
+                    filename=member[0], status="error", status_code=429,
+                    error="Rate limit exceeded for parse_bulk requests"
+                ).model_dump_json() + "\n"
+                break
+
+            filename, content, error = member
+            if error is not None:
+                slots.release()
+                yield BulkParseResult(filename=filename, status="error", error=error, status_code=400).model_dump_json() + "\n"
+                continue
+            pending.add(asyncio.ensure_future(run(filename, content)))
+
+            done = {task for task in pending if task.done()}
+            pending -= done
+            for task in done:
+                yield task.result().model_dump_json() + "\n"
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result().model_dump_json() + "\n"
+    finally:
+        # Stop outstanding parses if the client goes away
+        for task in pending:
+            task.cancel()
+    
+    logger.info(f"Bulk parse finished: {len(parsed)} of {min(count, settings.bulk_max_files)} files parsed")
+
+
+async def bulk_cost(files: List[UploadFile] = File(...)) -> int:
+    """Admission tokens for a bulk upload: one per uploaded file or archive"""
+    return len(files)
+
+
+@router.post("/parse/bulk")
+async def parse_documents_bulk(
+    files: List[UploadFile] = File(...),
+    current_user: str = Depends(admit("parse_bulk", cost=bulk_cost))
+):
+    """
+    Parse many files, or ZIP/TAR archives of files, in one request.
+    Results stream back as newline-delimited JSON (one ``BulkParseResult``
+    per file) in completion order; a failing file does not fail the batch.
+    """
+    parsed: List[Dict[str, Any]] = []
+    return StreamingResponse(
+        _stream_results(files, current_user, parsed),
+        media_type="application/x-ndjson",
+        # Embed everything in batches once the stream has been sent
+        background=BackgroundTask(embedding_job(), parsed)
+    )
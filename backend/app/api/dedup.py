@@ -0,0 +1,31 @@
+from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+import logging
+from ..core.auth import get_admin_user
+from ..ml.dedup import dedup_detector
+from ..ml.retrieval import retriever
+from ..ml.shared_index import shared_index
+from ..schemas import DedupRescanResponse
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/admin/dedup/rescan", response_model=DedupRescanResponse)
+async def rescan_duplicates(admin_user: str = Depends(get_admin_user)):
+    """
+    Re-scan the indexed corpus for near-duplicates and rebuild the ingest
+    detector from it (e.g. after a restart or a threshold change). Only a
+    Redis-backed detector (``DEDUP_REDIS``) is rebuilt for every worker.
+    """
+    try:
+        documents = shared_index.records() if shared_index is not None else list(retriever.documents)
+        result = await asyncio.to_thread(dedup_detector.rescan, documents)
+        logger.info(f"Near-duplicate rescan by {admin_user}")
+        return DedupRescanResponse(**result)
+    except Exception as e:
+        logger.error(f"Error rescanning for duplicates: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error rescanning for duplicates: {str(e)}"
+        )
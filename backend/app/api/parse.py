@@ -1,48 +1,68 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from typing import Dict, Any
-import aiofiles
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, HTTPException, Depends, Query
+from typing import BinaryIO, Dict, Any, List, Optional
+import asyncio
+import io
 import os
 import uuid
+import time
 from datetime import datetime
-import pandas as pd
-from pdfminer.high_level import extract_text
-from pdfminer.pdfpage import PDFPage
 import logging
-from ..core.auth import get_current_user
 from ..core.config import settings
+from ..core.metrics import PDF_PAGE_DURATION, span, timed
+from ..core.ratelimit import admit
+from ..core.responses import FastJSONResponse
+from ..core.stats import stats
+from ..core.storage import storage
+from ..ml.dedup import dedup_detector
+from ..ml.features import extract_features, feature_store
+from ..ml.granite_client import granite_client
+from ..ml.retrieval import retriever
+from ..ml.shared_index import shared_index
 from ..schemas import FileUploadResponse, ParsedDocument
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Characters of content sent to the embedding model per document
+EMBEDDING_TEXT_LIMIT = 1000
+
+
+def _new_key(filename: str) -> str:
+    return f"{uuid.uuid4()}{os.path.splitext(filename)[1]}"
+
+
+async def save_file_content(filename: str, content: bytes) -> str:
+    """Store file content under a unique key and return the key"""
+    key = _new_key(filename)
+    await asyncio.to_thread(storage.save, key, io.BytesIO(content))
+    return key
+
 
 async def save_uploaded_file(file: UploadFile) -> str:
-    """Save uploaded file and return file path"""
-    # Create uploads directory if it doesn't exist
-    os.makedirs(settings.upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(settings.upload_dir, unique_filename)
-    
-    # Save file
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
-    
-    return file_path
+    """Stream an uploaded file to storage and return its key"""
+    key = _new_key(file.filename)
+    file.file.seek(0)
+    await asyncio.to_thread(storage.save, key, file.file)
+    return key
 
 
-def parse_pdf(file_path: str) -> Dict[str, Any]:
+@timed("parse_pdf")
+def parse_pdf(file: BinaryIO) -> Dict[str, Any]:
     """Parse PDF file and extract content"""
+    from pdfminer.high_level import extract_text
+    from pdfminer.pdfpage import PDFPage
+    
     try:
+        start_time = time.perf_counter()
+        
         # Extract text content
-        content = extract_text(file_path)
+        content = extract_text(file)
         
         # Get page count
-        with open(file_path, 'rb') as f:
-            page_count = len(list(PDFPage.get_pages(f)))
+        file.seek(0)
+        page_count = len(list(PDFPage.get_pages(file)))
+        
+        PDF_PAGE_DURATION.observe((time.perf_counter() - start_time) / max(page_count, 1))
         
         # Basic metadata
         word_count = len(content.split())
@@ -58,10 +78,13 @@ def parse_pdf(file_path: str) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail=f"Error parsing PDF: {str(e)}")
 
 
-def parse_csv(file_path: str) -> Dict[str, Any]:
+@timed("parse_csv")
+def parse_csv(file: BinaryIO) -> Dict[str, Any]:
     """Parse CSV file and extract content"""
+    import pandas as pd
+    
     try:
-        df = pd.read_csv(file_path)
+        df = pd.read_csv(file)
         
         # Convert to string representation
         content = df.to_string()
@@ -79,11 +102,11 @@ def parse_csv(file_path: str) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail=f"Error parsing CSV: {str(e)}")
 
 
-def parse_text(file_path: str) -> Dict[str, Any]:
+@timed("parse_text")
+def parse_text(file: BinaryIO) -> Dict[str, Any]:
     """Parse text file"""
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        content = file.read().decode('utf-8')
         
         word_count = len(content.split())
         line_count = len(content.split('\n'))
@@ -99,14 +122,212 @@ def parse_text(file_path: str) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail=f"Error parsing text file: {str(e)}")
 
 
+PARSERS = {
+    '.pdf': parse_pdf,
+    '.csv': parse_csv,
+    '.txt': parse_text,
+    '.md': parse_text
+}
+
+
+def parse_file(key: str, file_extension: str) -> Dict[str, Any]:
+    """Parse a stored file with the parser for its extension"""
+    parser = PARSERS.get(file_extension)
+    if parser is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file_extension}"
+        )
+    # Remote backends stream the file in ranged blocks rather than downloading it
+    with storage.open(key) as file:
+        return parser(file)
+
+
+def build_document(
+    file_id: str,
+    filename: str,
+    key: str,
+    file_size: int,
+    content_type: str,
+    uploaded_by: str,
+    parsed_data: Dict[str, Any]
+) -> ParsedDocument:
+    return ParsedDocument(
+        file_id=file_id,
+        filename=filename,
+        content=parsed_data["content"],
+        metadata={
+            "file_path": storage.uri(key),
+            "storage_key": key,
+            "file_size": file_size,
+            "content_type": content_type,
+            "uploaded_by": uploaded_by,
+            "upload_time": datetime.utcnow().isoformat(),
+            **{k: v for k, v in parsed_data.items() if k != "content"}
+        },
+        page_count=parsed_data.get("page_count"),
+        word_count=parsed_data.get("word_count")
+    )
+
+
+# PDF text comes back from pdfminer with pages separated by form feeds
+PAGE_SEPARATOR = "\f"
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated ``fields=`` selection of ParsedDocument fields"""
+    if fields is None:
+        return None
+    selected = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in selected if name not in ParsedDocument.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    return selected
+
+
+def shape_document(
+    document: ParsedDocument,
+    fields: Optional[List[str]] = None,
+    include_content: bool = True,
+    content_limit: Optional[int] = None,
+    page: Optional[int] = None,
+    page_size: int = 1
+) -> Dict[str, Any]:
+    """
+    Plain dict of the requested parts of a parsed document, ready for a
+    fast JSON encoder. ``page``/``page_size`` select pages of the content
+    (1-based; non-PDF content is a single page) and ``content_limit``
+    truncates it; both add ``content_length`` with the full length.
+    """
+    names = fields or list(ParsedDocument.model_fields)
+    if not include_content:
+        names = [name for name in names if name != "content"]
+    shaped = {name: getattr(document, name) for name in names}
+    if "content" not in shaped:
+        return shaped
+
+    content = document.content
+    if page is not None:
+        pages = content.split(PAGE_SEPARATOR)
+        if len(pages) > 1 and not pages[-1].strip():
+            pages.pop()
+        start = (page - 1) * page_size
+        content = PAGE_SEPARATOR.join(pages[start:start + page_size])
+        shaped["page"] = page
+        shaped["page_size"] = page_size
+        shaped["total_pages"] = len(pages)
+    if content_limit is not None and len(content) > content_limit:
+        content = content[:content_limit]
+        shaped["content_truncated"] = True
+    if content is not document.content:
+        shaped["content_length"] = len(document.content)
+    shaped["content"] = content
+    return shaped
+
+
+def check_duplicate(document: ParsedDocument) -> bool:
+    """
+    Tag a parsed document that nearly duplicates an ingested one (MinHash
+    similarity at or above ``settings.dedup_threshold``) and return whether
+    it should be kept out of the index
+    """
+    if not settings.dedup_enabled:
+        return False
+    with span("dedup"):
+        # Scoped to the uploader: users never see each other's documents as duplicates
+        duplicate_of, similarity = dedup_detector.check(
+            document.file_id, document.content, str(document.metadata.get("uploaded_by", ""))
+        )
+    if duplicate_of is None:
+        return False
+    document.metadata["duplicate_of"] = duplicate_of
+    document.metadata["duplicate_similarity"] = round(similarity, 4)
+    stats.increment("duplicates")
+    logger.info(f"{document.filename} is a near-duplicate of {duplicate_of} ({similarity:.2f})")
+    return settings.dedup_skip_duplicates
+
+
+def index_document(document: ParsedDocument) -> Optional[Dict[str, Any]]:
+    """
+    Build the retrieval record for a parsed document. With the in-process
+    retriever it is searchable by keyword immediately; with the shared index
+    it is published together with its embedding. Its anomaly features go to
+    the feature store either way. Returns None when the document is a
+    near-duplicate that is skipped.
+    """
+    with span("extract_features"):
+        feature_store.add(document.file_id, extract_features(document.content))
+    if check_duplicate(document):
+        return None
+    record = {
+        "id": document.file_id,
+        "filename": document.filename,
+        "content": document.content,
+        "metadata": document.metadata
+    }
+    if shared_index is None:
+        with span("index_document"):
+            retriever.add_document(record)
+    return record
+
+
+async def embed_documents(documents: List[Dict[str, Any]], batch_size: int = 64) -> None:
+    """Embed retrieval records in batches and add them to the vector index"""
+    for i in range(0, len(documents), batch_size):
+        batch = documents[i:i + batch_size]
+        try:
+            result = await granite_client.create_embeddings(
+                [record["content"][:EMBEDDING_TEXT_LIMIT] for record in batch]
+            )
+            embeddings = result["embeddings"]
+        except Exception as e:
+            logger.error(f"Error embedding {len(batch)} documents: {e}")
+            if shared_index is None:
+                continue
+            # Still publish so the batch is keyword-searchable; zero vectors never match
+            embeddings = [[0.0] * settings.embedding_dimension for _ in batch]
+        
+        if shared_index is not None:
+            await asyncio.to_thread(shared_index.publish, batch, embeddings)
+        else:
+            # Adds take the retriever lock, which searches hold in worker threads
+            await asyncio.to_thread(retriever.add_embeddings, [record["id"] for record in batch], embeddings)
+
+
+def embedding_job():
+    """
+    What embeds newly indexed records after the response is sent: with the
+    shared index, a Celery task on the ingest queue (any worker can
+    publish); otherwise this process, which owns the in-memory retriever
+    """
+    if shared_index is None:
+        return embed_documents
+    from ..tasks import enqueue_embeddings
+    return enqueue_embeddings
+
+
 @router.post("/parse", response_model=ParsedDocument)
 async def parse_document(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user: str = Depends(get_current_user)
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    include_content: bool = True,
+    content_limit: Optional[int] = Query(None, ge=0, description="Truncate content to this many characters"),
+    page: Optional[int] = Query(None, ge=1, description="Return only this page of the content"),
+    page_size: int = Query(1, ge=1, description="Pages returned with page="),
+    current_user: str = Depends(admit("parse"))
 ):
     """
-    Parse uploaded document and extract content
+    Parse uploaded document and extract content. Clients that only need
+    metadata can skip or trim the content with ``fields``,
+    ``include_content``, ``content_limit`` and ``page``.
     """
+    start_time = time.time()
+    selected_fields = parse_fields(fields)
+    
     # Validate file size
     if file.size > settings.max_file_size:
         raise HTTPException(
@@ -115,47 +336,36 @@ async def parse_document(
         )
     
     # Save uploaded file
-    file_path = await save_uploaded_file(file)
+    with span("save_upload"):
+        key = await save_uploaded_file(file)
     file_id = str(uuid.uuid4())
     
     try:
         # Determine file type and parse accordingly
         file_extension = os.path.splitext(file.filename)[1].lower()
-        
-        if file_extension == '.pdf':
-            parsed_data = parse_pdf(file_path)
-        elif file_extension == '.csv':
-            parsed_data = parse_csv(file_path)
-        elif file_extension in ['.txt', '.md']:
-            parsed_data = parse_text(file_path)
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type: {file_extension}"
-            )
+        # Parsers read through storage (ranged GETs with S3); keep them off the loop
+        parsed_data = await asyncio.to_thread(parse_file, key, file_extension)
         
         # Create response
-        response = ParsedDocument(
-            file_id=file_id,
-            filename=file.filename,
-            content=parsed_data["content"],
-            metadata={
-                "file_path": file_path,
-                "file_size": file.size,
-                "content_type": file.content_type,
-                "uploaded_by": current_user,
-                "upload_time": datetime.utcnow().isoformat(),
-                **{k: v for k, v in parsed_data.items() if k != "content"}
-            },
-            page_count=parsed_data.get("page_count"),
-            word_count=parsed_data.get("word_count")
+        response = build_document(
+            file_id, file.filename, key, file.size,
+            file.content_type, current_user, parsed_data
         )
         
+        # Searchable by keyword immediately; by vector once the embedding lands.
+        # MinHash signatures and dedup index lookups (Redis) stay off the loop
+        record = await asyncio.to_thread(index_document, response)
+        if record is not None:
+            background_tasks.add_task(embedding_job(), [record])
+        
+        stats.observe("parse", time.time() - start_time)
         logger.info(f"Successfully parsed document: {file.filename}")
-        return response
+        # Serialized straight from a shaped dict, skipping response model validation
+        return FastJSONResponse(shape_document(
+            response, selected_fields, include_content, content_limit, page, page_size
+        ))
         
     except Exception as e:
         # Clean up file on error
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise e
\ No newline at end of file
+        await asyncio.to_thread(storage.delete, key)
+        raise e
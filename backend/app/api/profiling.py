@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
+import asyncio
+import logging
+from ..core.auth import get_admin_user
+from ..core.config import settings
+from ..core.profiling import sampling_profiler
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/admin/profile/sample", response_class=PlainTextResponse)
+async def sample_profile(
+    duration: float = 10.0,
+    interval: float = 0.005,
+    admin_user: str = Depends(get_admin_user)
+):
+    """
+    Sample this worker's stacks for ``duration`` seconds and return them
+    as collapsed stacks for flamegraph tools
+    """
+    if not settings.profiling_enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    
+    duration = max(0.0, min(duration, settings.profiling_max_seconds))
+    interval = max(interval, 0.001)
+    
+    # Sample from a separate thread so the event loop itself gets sampled
+    stacks = await asyncio.to_thread(sampling_profiler.sample, duration, interval)
+    if stacks is None:
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+    
+    logger.info(f"Sampling profile by {admin_user}: {sum(stacks.values())} samples over {duration:.1f}s")
+    return PlainTextResponse(sampling_profiler.render(stacks))
@@ -1,14 +1,26 @@
 from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple
+import asyncio
+import itertools
 import time
 import logging
-from ..core.auth import get_current_user
+from ..core.config import settings
+from ..core.metrics import span
+from ..core.ratelimit import admit
+from ..core.stats import stats
+from ..ml.context import adaptive_max_tokens, estimate_tokens, mmr_rerank, pack_context
+from ..ml.filters import Filter, parse_filter
 from ..ml.granite_client import granite_client
-from ..schemas import QueryRequest, QueryResponse
+from ..ml.retrieval import retriever
+from ..ml.shared_index import shared_index
+from ..schemas import BatchQueryRequest, BatchQueryResult, QueryRequest, QueryResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+QUERY_EMBEDDING_BATCH_SIZE = 64
+
 # Mock document store for demo
 MOCK_DOCUMENTS = [
     {
@@ -31,94 +43,190 @@ MOCK_DOCUMENTS = [
     }
 ]
 
+for _doc in MOCK_DOCUMENTS:
+    retriever.add_document(_doc)
+
+
+def _fallback_documents(limit: int) -> List[Dict[str, Any]]:
+    """The first ``limit`` documents with zero scores, for when retrieval finds nothing"""
+    documents = shared_index.records() if shared_index is not None else iter(retriever.documents)
+    return [{**doc, "similarity_score": 0.0} for doc in itertools.islice(documents, limit)]
 
-async def semantic_search(query: str, limit: int = 5) -> List[Dict[str, Any]]:
+
+async def semantic_search(
+    query: str,
+    limit: int = 5,
+    with_embeddings: bool = False,
+    filters: Optional[Filter] = None
+) -> List[Dict[str, Any]]:
     """
-    Perform semantic search using embeddings and vector similarity
-    In production, this would use Pinecone vector database
+    Hybrid search: BM25 over the inverted index fused with embedding
+    similarity (reciprocal rank fusion), restricted to documents matching
+    ``filters``
+    In production, the vector side would use Pinecone vector database
     """
+    return (await semantic_search_batch([query], limit, with_embeddings, filters))[0]
+
+
+async def semantic_search_batch(
+    queries: List[str],
+    limit: int = 5,
+    with_embeddings: bool = False,
+    filters: Optional[Filter] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    ``semantic_search`` for many queries: embeddings are created in batched
+    calls and the vector side is scored as one matrix multiply
+    """
+    # Unfiltered documents must not leak into a filtered query
+    def fallback() -> List[Dict[str, Any]]:
+        return [] if filters is not None else _fallback_documents(limit)
+
     try:
-        # Create embedding for query
-        query_embedding_result = await granite_client.create_embeddings([query])
-        query_embedding = query_embedding_result["embeddings"][0]
+        # Create embeddings for all queries
+        with span("embed_query"):
+            query_embeddings: List[List[float]] = []
+            for i in range(0, len(queries), QUERY_EMBEDDING_BATCH_SIZE):
+                result = await granite_client.create_embeddings(queries[i:i + QUERY_EMBEDDING_BATCH_SIZE])
+                query_embeddings.extend(result["embeddings"])
         
-        # For demo, return mock relevant documents based on keyword matching
-        relevant_docs = []
-        query_lower = query.lower()
+        with span("match_documents"):
+            index = shared_index if shared_index is not None else retriever
+            # Scoring a large batch is CPU-bound; keep the event loop serving other clients
+            batch = await asyncio.to_thread(
+                index.search_batch, queries, query_embeddings, limit, with_embeddings=with_embeddings, filters=filters
+            )
         
-        for doc in MOCK_DOCUMENTS:
-            # Simple keyword matching for demo
-            content_lower = doc["content"].lower()
-            if any(word in content_lower for word in query_lower.split()):
-                relevant_docs.append({
-                    **doc,
-                    "similarity_score": 0.85  # Mock similarity score
-                })
-        
-        # If no keyword matches, return all documents with lower scores
-        if not relevant_docs:
-            relevant_docs = [
-                {**doc, "similarity_score": 0.3} for doc in MOCK_DOCUMENTS
-            ]
-        
-        return relevant_docs[:limit]
+        # If nothing matches, return all documents with lower scores
+        return [relevant_docs or fallback() for relevant_docs in batch]
         
     except Exception as e:
         logger.error(f"Error in semantic search: {e}")
-        return MOCK_DOCUMENTS[:limit]
+        return [fallback() for _ in queries]
+
+
+PROMPT_TEMPLATE = """Based on the following documents, answer the user's question.
+
+Context:
+{context}
+
+Question: {question}
+
+Please provide a comprehensive answer based on the context provided. If the context doesn't contain enough information to answer the question, please say so.
+
+Answer:"""
+
+
+def context_budget(question: str) -> int:
+    """
+    Context tokens that fit in the model window next to the prompt and the
+    shortest answer; raises ValueError when not even the question fits
+    """
+    overhead = estimate_tokens(PROMPT_TEMPLATE.format(context="", question=question))
+    answer_tokens = min(settings.generation_min_tokens, settings.generation_max_tokens)
+    available = settings.model_context_window - overhead - answer_tokens
+    if available < 0:
+        raise ValueError(
+            f"Question too long: about {overhead} prompt tokens leave no room for an answer "
+            f"in the {settings.model_context_window} token context window"
+        )
+    return min(settings.context_token_budget, available)
+
+
+def build_prompt(question: str, candidates: List[Dict[str, Any]], context_limit: int) -> Tuple[List[Dict[str, Any]], str, int]:
+    """
+    Pick relevant but non-redundant candidates (MMR), pack them into the
+    context token budget (trimmed to what the model window has left) and
+    size the generation to the rest. Returns the documents used, the prompt
+    and ``max_tokens``.
+    """
+    budget = context_budget(question)
+    order = mmr_rerank(
+        [doc.get("fusion_score", doc["similarity_score"]) for doc in candidates],
+        [doc.get("embedding") for doc in candidates],
+        context_limit,
+        settings.context_mmr_lambda
+    )
+    relevant_docs, context, context_tokens = pack_context(
+        [candidates[i] for i in order],
+        budget,
+        settings.context_doc_token_limit
+    )
+    
+    prompt = PROMPT_TEMPLATE.format(context=context, question=question)
+    
+    max_tokens = adaptive_max_tokens(
+        estimate_tokens(prompt),
+        context_tokens,
+        settings.generation_min_tokens,
+        settings.generation_max_tokens,
+        settings.model_context_window
+    )
+    return relevant_docs, prompt, max_tokens
+
+
+def format_sources(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
+        {
+            "document_id": doc["id"],
+            "filename": doc["filename"],
+            "similarity_score": doc["similarity_score"],
+            "excerpt": doc["content"][:200] + "..." if len(doc["content"]) > 200 else doc["content"],
+            "metadata": doc["metadata"]
+        }
+        for doc in documents
+    ]
+
+
+def _parse_filters(expression: Optional[Dict[str, Any]], current_user: str) -> Optional[Filter]:
+    try:
+        return parse_filter(expression, current_user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {e}")
 
 
 @router.post("/query", response_model=QueryResponse)
 async def query_documents(
     request: QueryRequest,
-    current_user: str = Depends(get_current_user)
+    current_user: str = Depends(admit("query"))
 ):
     """
     Query documents using RAG (Retrieval-Augmented Generation)
     """
     start_time = time.time()
+    query_filter = _parse_filters(request.filters, current_user)
+    try:
+        context_budget(request.question)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     
     try:
-        # Step 1: Semantic search to find relevant documents
-        relevant_docs = await semantic_search(request.question, request.context_limit)
-        
-        # Step 2: Prepare context from relevant documents
-        context_parts = []
-        for doc in relevant_docs:
-            context_parts.append(f"Document: {doc['filename']}\nContent: {doc['content'][:500]}...")
+        # Step 1: Semantic search for a candidate pool larger than the context
+        with span("retrieval"):
+            candidates = await semantic_search(
+                request.question,
+                max(request.context_limit, settings.context_candidates),
+                with_embeddings=True,
+                filters=query_filter
+            )
         
-        context = "\n\n".join(context_parts)
+        # Step 2: Pick relevant but non-redundant documents (MMR) and pack
+        # them into the context token budget
+        with span("prompt_assembly"):
+            relevant_docs, prompt, max_tokens = await asyncio.to_thread(
+                build_prompt, request.question, candidates, request.context_limit
+            )
         
         # Step 3: Generate answer using Granite Instruct
-        prompt = f"""Based on the following documents, answer the user's question.
-
-Context:
-{context}
-
-Question: {request.question}
-
-Please provide a comprehensive answer based on the context provided. If the context doesn't contain enough information to answer the question, please say so.
-
-Answer:"""
-        
-        generation_result = await granite_client.generate_text(prompt, max_tokens=300)
+        with span("generation"):
+            generation_result = await granite_client.generate_text(prompt, max_tokens=max_tokens)
         answer = generation_result["generated_text"]
         
         # Step 4: Prepare sources if requested
-        sources = []
-        if request.include_sources:
-            sources = [
-                {
-                    "document_id": doc["id"],
-                    "filename": doc["filename"],
-                    "similarity_score": doc["similarity_score"],
-                    "excerpt": doc["content"][:200] + "..." if len(doc["content"]) > 200 else doc["content"],
-                    "metadata": doc["metadata"]
-                }
-                for doc in relevant_docs
-            ]
+        sources = format_sources(relevant_docs) if request.include_sources else []
         
         processing_time = time.time() - start_time
+        stats.observe("query", processing_time)
         
         response = QueryResponse(
             answer=answer,
@@ -135,4 +243,91 @@ Answer:"""
         raise HTTPException(
             status_code=500,
             detail=f"Error processing query: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+async def _stream_batch(request: BatchQueryRequest, query_filter: Optional[Filter]):
+    """Answer every question and yield NDJSON lines in completion order"""
+    start_time = time.time()
+    # Repeated questions are retrieved and generated once
+    positions: Dict[str, List[int]] = {}
+    for index, question in enumerate(request.questions):
+        positions.setdefault(question.strip(), []).append(index)
+    questions = list(positions)
+    
+    with span("retrieval"):
+        batch = await semantic_search_batch(
+            questions,
+            max(request.context_limit, settings.context_candidates),
+            with_embeddings=True,
+            filters=query_filter
+        )
+    
+    # Bounds in-flight generation calls to the model service
+    slots = asyncio.Semaphore(settings.query_batch_concurrency)
+    
+    async def answer(question: str, candidates: List[Dict[str, Any]]) -> Tuple[str, Optional[QueryResponse], Optional[str]]:
+        try:
+            async with slots:
+                relevant_docs, prompt, max_tokens = await asyncio.to_thread(
+                    build_prompt, question, candidates, request.context_limit
+                )
+                generation_result = await granite_client.generate_text(prompt, max_tokens=max_tokens)
+        except Exception as e:
+            logger.error(f"Error answering batch question: {e}")
+            return question, None, str(e)
+        # From the start of the request, like a single query: retrieval,
+        # waiting for a slot, prompt assembly and generation
+        processing_time = time.time() - start_time
+        stats.observe("query", processing_time)
+        return question, QueryResponse(
+            answer=generation_result["generated_text"],
+            sources=format_sources(relevant_docs) if request.include_sources else [],
+            confidence=0.85,  # Mock confidence score
+            processing_time=processing_time
+        ), None
+    
+    tasks = [asyncio.ensure_future(answer(q, c)) for q, c in zip(questions, batch)]
+    try:
+        for future in asyncio.as_completed(tasks):
+            question, response, error = await future
+            for i in positions[question]:
+                yield BatchQueryResult(
+                    index=i,
+                    question=request.questions[i],
+                    status="ok" if error is None else "error",
+                    response=response,
+                    error=error
+                ).model_dump_json() + "\n"
+    finally:
+        # Stop outstanding generations if the client goes away
+        for task in tasks:
+            task.cancel()
+    
+    logger.info(f"Answered {len(request.questions)} batch questions ({len(questions)} unique) in {time.time() - start_time:.2f}s")
+
+
+async def batch_cost(request: BatchQueryRequest) -> int:
+    """Admission tokens for a batch: one per question"""
+    return len(request.questions)
+
+
+@router.post("/query/batch")
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    current_user: str = Depends(admit("query_batch", cost=batch_cost))
+):
+    """
+    Answer many questions in one request. Questions are embedded and
+    retrieved together, generations run concurrently, and results stream
+    back as NDJSON (one BatchQueryResult per line, in completion order).
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions provided")
+    if len(request.questions) > settings.query_batch_max_questions:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many questions. Maximum is {settings.query_batch_max_questions} per request"
+        )
+    query_filter = _parse_filters(request.filters, current_user)
+    return StreamingResponse(_stream_batch(request, query_filter), media_type="application/x-ndjson")
@@ -1,13 +1,150 @@
-from fastapi import HTTPException, Security, status
+from fastapi import Depends, HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwt
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import threading
+import time
+import httpx
+import logging
 from .config import settings
 
+logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens, keyed by a hash of the token.
+
+    Entries expire at the token's own ``exp`` (capped by ``max_ttl``), so a
+    cached token is never honoured past the point a fresh decode would
+    reject it.
+    """
+
+    def __init__(self, maxsize: int = 10000, max_ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            username, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return username
+
+    def put(self, token: str, username: str, exp: Optional[float]) -> None:
+        expires_at = time.time() + self.max_ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (username, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class JWKSCache:
+    """
+    Auth0 signing keys, refreshed in the background.
+
+    A ``kid`` that is not cached triggers one refetch (rate limited by
+    ``min_refetch_interval``) that concurrent callers share, so a key
+    rotation costs a single JWKS request rather than one per request.
+    While fetches fail the interval doubles after each failure, up to
+    ``refresh_interval``, so an Auth0 outage is not hammered.
+    """
+
+    def __init__(self, domain: str, refresh_interval: float = 3600.0, min_refetch_interval: float = 30.0):
+        self.url = f"https://{domain}/.well-known/jwks.json"
+        self.refresh_interval = refresh_interval
+        self.min_refetch_interval = min_refetch_interval
+        self._keys: Dict[str, Dict[str, Any]] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._failures = 0
+        self._inflight: Optional[asyncio.Future] = None
+
+    async def _fetch(self) -> None:
+        async with httpx.AsyncClient(timeout=10.0) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+            keys = response.json().get("keys", [])
+        self._keys = {key["kid"]: key for key in keys if "kid" in key}
+        self._fetched_at = time.monotonic()
+        logger.info(f"Loaded {len(self._keys)} JWKS keys from {self.url}")
+
+    async def _attempt(self) -> None:
+        self._attempted_at = time.monotonic()
+        try:
+            await self._fetch()
+        except Exception:
+            self._failures += 1
+            raise
+        self._failures = 0
+
+    async def refresh(self) -> None:
+        """Fetch the key set, joining any fetch already in flight"""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.ensure_future(self._attempt())
+        await asyncio.shield(self._inflight)
+
+    def cached_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        return self._keys.get(kid)
+
+    def _refetch_interval(self) -> float:
+        return min(self.min_refetch_interval * 2 ** self._failures, max(self.refresh_interval, self.min_refetch_interval))
+
+    async def get_key(self, kid: str) -> Optional[Dict[str, Any]]:
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._attempted_at >= self._refetch_interval():
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error fetching JWKS: {e}")
+            key = self._keys.get(kid)
+        return key
+
+    async def run_refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing JWKS: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+
+# Global verification caches
+token_cache = TokenCache(
+    maxsize=settings.token_cache_size,
+    max_ttl=settings.token_cache_max_ttl
+)
+jwks_cache = JWKSCache(
+    settings.auth0_domain,
+    refresh_interval=settings.jwks_refresh_interval
+) if settings.auth0_domain else None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -19,6 +156,33 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
+def _decode(token: str, jwk: Optional[Dict[str, Any]]) -> str:
+    """Decode and validate a token, returning its subject"""
+    if jwks_cache is not None:
+        if jwk is None:
+            raise JWTError("Unknown signing key")
+        payload = jwt.decode(
+            token,
+            jwk,
+            algorithms=["RS256"],
+            audience=settings.auth0_audience,
+            issuer=f"https://{settings.auth0_domain}/",
+            options={"verify_aud": settings.auth0_audience is not None}
+        )
+    else:
+        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
+
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    token_cache.put(token, username, payload.get("exp"))
+    return username
+
+
 def verify_token(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
     Verify JWT token. In production, this should validate Auth0 tokens.
@@ -26,22 +190,53 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
     """
     try:
         token = credentials.credentials
-        payload = jwt.decode(token, settings.secret_key, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Could not validate credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        return username
+        username = token_cache.get(token)
+        if username is not None:
+            return username
+
+        jwk = None
+        if jwks_cache is not None:
+            jwk = jwks_cache.cached_key(jwt.get_unverified_header(token).get("kid"))
+        return _decode(token, jwk)
+    except JWTError:
+        # For demo purposes, return a default user if no valid token
+        return "demo_user"
+
+
+async def verify_token_async(token: str) -> str:
+    """
+    Async variant of ``verify_token``: cache hits return without leaving
+    the event loop, Auth0 keys are fetched without blocking it, and the
+    signature check on a miss runs in a worker thread.
+    """
+    try:
+        username = token_cache.get(token)
+        if username is not None:
+            return username
+
+        jwk = None
+        if jwks_cache is not None:
+            jwk = await jwks_cache.get_key(jwt.get_unverified_header(token).get("kid"))
+        return await asyncio.to_thread(_decode, token, jwk)
     except JWTError:
         # For demo purposes, return a default user if no valid token
         return "demo_user"
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
     Get current authenticated user. Stubbed for demo.
     """
-    return verify_token(credentials)
\ No newline at end of file
+    return await verify_token_async(credentials.credentials)
+
+
+async def get_admin_user(current_user: str = Depends(get_current_user)):
+    """
+    Require the current user to be listed in ``settings.admin_users``.
+    """
+    if current_user not in settings.admin_users:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
@@ -0,0 +1,146 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Content types worth compressing; images, archives and audio already are
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def _accepted_encodings(headers: List[Tuple[bytes, bytes]]) -> Dict[str, float]:
+    """Parse Accept-Encoding into ``{coding: q}``"""
+    accepted: Dict[str, float] = {}
+    for name, value in headers:
+        if name.lower() != b"accept-encoding":
+            continue
+        for item in value.decode("latin-1").split(","):
+            coding, _, params = item.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            if coding:
+                accepted[coding.strip().lower()] = q
+    return accepted
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits=31 writes the gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.compress(data)
+        return body + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _BrotliEncoder:
+    def __init__(self, brotli, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        body = self._compressor.process(data)
+        return body + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing text and JSON responses with brotli (when
+    the ``brotli`` package is installed and the client accepts it) or gzip.
+    Single-body responses below ``minimum_size`` bytes are sent as is;
+    streamed responses are compressed chunk by chunk and flushed after each
+    chunk so NDJSON results still arrive incrementally.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.brotli = _brotli()
+
+    def _choose_encoding(self, scope) -> Optional[str]:
+        accepted = _accepted_encodings(scope.get("headers", []))
+        if self.brotli is not None and accepted.get("br", 0) > 0:
+            return "br"
+        if accepted.get("gzip", 0) > 0:
+            return "gzip"
+        return None
+
+    def _encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli, self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        encoder = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, encoder
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if start_message is not None:
+                start, start_message = start_message, None
+                headers = [(k, v) for k, v in start["headers"]]
+                header_map = {k.lower(): v for k, v in headers}
+                content_type = header_map.get(b"content-type", b"").decode("latin-1")
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                if (
+                    b"content-encoding" in header_map
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    await send(start)
+                    await send(message)
+                    encoder = False
+                    return
+
+                encoder = self._encoder(encoding)
+                compressed = encoder.compress(body, final=not more_body)
+                headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+                headers.append((b"content-encoding", encoding.encode()))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    headers.append((b"content-length", str(len(compressed)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+                return
+
+            if not encoder:
+                await send(message)
+                return
+            more_body = message.get("more_body", False)
+            await send({
+                "type": "http.response.body",
+                "body": encoder.compress(message.get("body", b""), final=not more_body),
+                "more_body": more_body
+            })
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,39 +1,146 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
     # App settings
     app_name: str = "ML Document Processing API"
     debug: bool = False
+    warmup_on_startup: bool = False
     secret_key: str = "super-secret-key-change-in-production"
     
     # Granite AI settings
     granite_api_key: Optional[str] = None
     granite_api_url: str = "https://granite-api.ibm.com"
+    embedding_dimension: int = 768
     
     # Pinecone settings
     pinecone_api_key: Optional[str] = None
     pinecone_environment: str = "us-west1-gcp"
     pinecone_index_name: str = "ml-documents"
     
+    # RAG prompt assembly: MMR over retrieved candidates, packed into a token budget
+    context_token_budget: int = 1500
+    context_doc_token_limit: int = 400
+    context_mmr_lambda: float = 0.7
+    context_candidates: int = 20
+    generation_min_tokens: int = 64
+    generation_max_tokens: int = 300
+    model_context_window: int = 4096
+    
+    # Batch query settings
+    query_batch_concurrency: int = 8
+    query_batch_max_questions: int = 1000
+    
+    # Embedding storage: float32, float16, int8 (per-dimension scalar) or pq
+    # (product quantization, one byte per subspace). Shared index segments
+    # keep the exact vectors on disk and re-rank rerank_factor x candidates.
+    embedding_codec: str = "int8"
+    embedding_pq_subspaces: int = 96
+    embedding_codec_train_size: int = 4096
+    embedding_rerank_factor: int = 4
+    
+    # Metadata fields queries can filter on: exact-match fields (bitmap
+    # indexed) and ISO date fields (range filters over sorted timestamps)
+    filter_attributes: List[str] = ["type", "file_type", "content_type", "uploaded_by"]
+    filter_date_attributes: List[str] = ["date", "upload_time"]
+    
+    # Shared memory-mapped index for multi-worker deployments (off when unset)
+    shared_index_dir: Optional[str] = None
+    shared_index_poll_interval: float = 1.0
+    shared_index_merge_factor: int = 10  # similarly sized segments merged at a time
+    shared_index_max_merge_docs: int = 1000000  # larger segments are never rewritten
+    
+    # Per-document feature store file shared by workers (in memory when unset)
+    feature_store_path: Optional[str] = None
+    
+    # Near-duplicate detection at ingest (MinHash/LSH)
+    dedup_enabled: bool = True
+    dedup_threshold: float = 0.9
+    dedup_skip_duplicates: bool = True
+    dedup_min_tokens: int = 20  # shorter documents are never compared
+    dedup_redis: bool = False  # share the LSH index across workers through Redis
+    
     # Redis settings
     redis_url: str = "redis://localhost:6379"
     
+    # Celery worker settings
+    celery_prefetch_multiplier: int = 1
+    celery_max_memory_per_child: int = 512 * 1024  # KiB; worker process is replaced above this
+    celery_result_expires: int = 3600  # seconds
+    
     # AWS settings
     aws_access_key_id: Optional[str] = None
     aws_secret_access_key: Optional[str] = None
     aws_bucket_name: str = "ml-app-uploads"
+    aws_region: Optional[str] = None
+    
+    # Upload storage: "local" (upload_dir) or "s3" (aws_bucket_name; s3_endpoint_url for MinIO)
+    storage_backend: str = "local"
+    s3_endpoint_url: Optional[str] = None
+    s3_prefix: str = "uploads/"
+    s3_multipart_chunk_size: int = 8 * 1024 * 1024
+    s3_read_block_size: int = 1024 * 1024
+    storage_cache_dir: Optional[str] = None
+    storage_cache_max_bytes: int = 1024 * 1024 * 1024  # 1GB
+    upload_retention_days: Optional[float] = None
     
     # Auth0 settings
     auth0_domain: Optional[str] = None
     auth0_client_id: Optional[str] = None
     auth0_client_secret: Optional[str] = None
+    auth0_audience: Optional[str] = None
+    jwks_refresh_interval: float = 3600.0
+    token_cache_size: int = 10000
+    token_cache_max_ttl: float = 300.0
+    admin_users: List[str] = []
+    
+    # ASR pre-processing for WAV input: mono, downsampled, silence trimmed
+    asr_preprocess: bool = True
+    asr_sample_rate: int = 16000  # higher-rate input is downsampled; lower rates are kept
+    asr_max_pause: float = 0.5  # seconds kept of longer internal pauses
+    asr_vad_threshold_db: float = 12.0  # speech level above the noise floor
+    
+    # Admission control for expensive routes: per-user token buckets
+    # (tokens/second and burst size per route class) and a concurrency cap.
+    # Batch routes take one token per question or file, so their burst is
+    # also the largest batch a user can send.
+    admission_enabled: bool = True
+    rate_limits: Dict[str, float] = {
+        "query": 1.0, "query_batch": 1.0, "parse": 0.5, "parse_bulk": 0.5, "asr": 0.2
+    }
+    rate_limit_bursts: Dict[str, int] = {
+        "query": 10, "query_batch": 1000, "parse": 20, "parse_bulk": 1000, "asr": 3
+    }
+    rate_limit_redis: bool = False
+    max_concurrent_requests: int = 32
+    admission_queue_size: int = 64
+    admission_queue_timeout: float = 2.0
     
     # File upload settings
     upload_dir: str = "./uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
     
+    # Responses smaller than this are not compressed
+    compression_minimum_size: int = 1024
+    
+    # Bulk parse settings
+    bulk_parse_workers: int = 4
+    bulk_max_files: int = 1000
+    bulk_max_archive_size: int = 500 * 1024 * 1024  # 500MB
+    
+    # Dashboard stats settings
+    stats_bucket_seconds: int = 60
+    stats_retention_buckets: int = 1440  # 24h of 1-minute buckets
+    # Keep totals in Redis so every API and Celery worker process reports the
+    # same numbers across restarts; events are flushed every flush interval
+    stats_redis: bool = False
+    stats_flush_interval: float = 1.0
+    
+    # Profiling settings (admin only, off by default)
+    profiling_enabled: bool = False
+    profiling_max_seconds: float = 60.0
+    
     class Config:
         env_file = ".env"
 
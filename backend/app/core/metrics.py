@@ -0,0 +1,260 @@
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ASGI scope of the request being served, used to label stage spans
+current_scope: ContextVar[Optional[dict]] = ContextVar("current_scope", default=None)
+
+# Set in pool worker processes, whose registry nobody scrapes: histogram
+# observations are collected here and recorded again by the parent
+_captured: ContextVar[Optional[List[Tuple[str, float, Dict[str, str]]]]] = ContextVar(
+    "captured_observations", default=None
+)
+
+DEFAULT_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        captured = _captured.get()
+        if captured is not None:
+            captured.append((self.name, value, labels))
+            return
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                cumulative += counts[-1]
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                plain = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{plain} {total[0]}")
+                lines.append(f"{self.name}_count{plain} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def get(self, name: str) -> Optional[Any]:
+        for metric in self._metrics:
+            if metric.name == name:
+                return metric
+        return None
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry and the metrics recorded by the API
+registry = MetricsRegistry()
+
+REQUEST_COUNT = registry.counter(
+    "http_requests_total",
+    "Total HTTP requests by method, route and status",
+    ["method", "route", "status"]
+)
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by method and route",
+    ["method", "route"]
+)
+STAGE_DURATION = registry.histogram(
+    "stage_duration_seconds",
+    "Time spent in each processing stage by route",
+    ["route", "stage"]
+)
+ADMISSION_REJECTED = registry.counter(
+    "admission_rejected_total",
+    "Requests rejected by admission control by route class and reason",
+    ["route_class", "reason"]
+)
+PDF_PAGE_DURATION = registry.histogram(
+    "pdf_parse_seconds_per_page",
+    "PDF parse time divided by page count",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as ``stage`` under the current route"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(
+            time.perf_counter() - start, route=route_label(current_scope.get()), stage=stage
+        )
+
+
+def timed(stage: str):
+    """Decorator form of ``span`` for sync and async callables"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def capture_observations() -> Iterator[List[Tuple[str, float, Dict[str, str]]]]:
+    """
+    Collect histogram observations (spans included) made in the block
+    instead of recording them. Code run in a worker process returns the
+    list to the parent, which passes it to ``record_observations``.
+    """
+    observations: List[Tuple[str, float, Dict[str, str]]] = []
+    token = _captured.set(observations)
+    try:
+        yield observations
+    finally:
+        _captured.reset(token)
+
+
+def record_observations(observations: List[Tuple[str, float, Dict[str, str]]]) -> None:
+    """Record observations captured in another process; spans get the current route"""
+    route = route_label(current_scope.get())
+    for name, value, labels in observations:
+        metric = registry.get(name)
+        if metric is None:
+            continue
+        if metric is STAGE_DURATION:
+            labels = {**labels, "route": route}
+        metric.observe(value, **labels)
+
+
+def route_label(scope: Optional[dict]) -> str:
+    """Route template (not the raw path) so label cardinality stays bounded"""
+    if scope is None:
+        return "none"
+    path = getattr(scope.get("route"), "path", None)
+    if path is None:
+        return "unmatched"
+    # Newer FastAPI keeps an included router's prefix outside the route itself
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", path)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts and latency per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = current_scope.set(scope)
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            current_scope.reset(token)
+            route = route_label(scope)
+            REQUEST_DURATION.observe(duration, method=scope["method"], route=route)
+            REQUEST_COUNT.inc(method=scope["method"], route=route, status=status_code[0])
@@ -0,0 +1,150 @@
+import cProfile
+import io
+import logging
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+from urllib.parse import parse_qs
+from fastapi.security import HTTPAuthorizationCredentials
+from .auth import verify_token
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SamplingProfiler:
+    """
+    Time-boxed stack sampler for a live worker.
+
+    A background thread snapshots every other thread's stack with
+    ``sys._current_frames`` and aggregates them as collapsed stacks
+    (``frame;frame;frame count``) ready for flamegraph tools. Nothing runs
+    unless a sampling session is in progress.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        parts = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(parts))
+
+    def sample(self, duration: float, interval: float = 0.005) -> Optional[Dict[str, int]]:
+        """
+        Sample all threads for ``duration`` seconds. Blocking; returns
+        ``None`` if another session is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            own_ident = threading.get_ident()
+            stacks: Counter = Counter()
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident != own_ident:
+                        stacks[self._collapse(frame)] += 1
+                time.sleep(interval)
+            return dict(stacks)
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def render(stacks: Dict[str, int]) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(stacks.items())) + "\n"
+
+
+class RequestProfilerMiddleware:
+    """
+    ASGI middleware profiling a single request with cProfile.
+
+    Triggered by an ``X-Profile: 1`` header or ``?profile=1`` from an admin
+    user; the response body is replaced by a pstats summary and the
+    original status is reported in ``X-Profiled-Status``. Only installed
+    when ``settings.profiling_enabled`` is set. cProfile sees the whole
+    thread, so concurrent requests on the same worker show up as well.
+    """
+
+    def __init__(self, app, limit: int = 40):
+        self.app = app
+        self.limit = limit
+        # Only one cProfile session can be active per interpreter
+        self._active = False
+
+    @staticmethod
+    def _requested(scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile") in (b"1", b"true"):
+            return True
+        query = parse_qs(scope.get("query_string", b"").decode())
+        return query.get("profile", [""])[0] in ("1", "true")
+
+    @staticmethod
+    def _authorized(scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        scheme, _, token = headers.get(b"authorization", b"").decode().partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return False
+        credentials = HTTPAuthorizationCredentials(scheme=scheme, credentials=token)
+        try:
+            return verify_token(credentials) in settings.admin_users
+        except Exception:
+            return False
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or self._active
+            or not self._requested(scope)
+            or not self._authorized(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = [500]
+
+        async def capture(message):
+            # Swallow the real response; only its status is reported
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, capture)
+        finally:
+            profiler.disable()
+            self._active = False
+
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(self.limit)
+        body = output.getvalue().encode()
+        logger.info(f"Profiled request {scope['method']} {scope['path']}")
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profiled-status", str(status_code[0]).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# Global sampling profiler instance
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Optional, Tuple
+import logging
+from fastapi import Depends, HTTPException, status
+from .auth import get_current_user
+from .config import settings
+from .metrics import ADMISSION_REJECTED
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket: refill from the elapsed time, then take ``cost`` tokens.
+# Uses the Redis server clock so workers on different nodes agree.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class TokenBucketLimiter:
+    """
+    In-process token buckets keyed by ``(user, route_class)``. Each bucket
+    refills at ``rate`` tokens per second up to ``capacity``; the least
+    recently used buckets are dropped beyond ``max_buckets``.
+    """
+
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    async def acquire(self, user: str, route_class: str, rate: float, capacity: int, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; return 0 on success or the seconds until they would be available"""
+        key = (user, route_class)
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (float(capacity), now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisTokenBucketLimiter:
+    """Token buckets shared by every worker through Redis (fails open)"""
+
+    def __init__(self, redis_url: str, prefix: str = "ratelimit:"):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+        self._script = None
+
+    async def acquire(self, user: str, route_class: str, rate: float, capacity: int, cost: float = 1.0) -> float:
+        if self._client is None:
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.redis_url)
+            self._script = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+        try:
+            wait = await self._script(keys=[f"{self.prefix}{route_class}:{user}"], args=[rate, capacity, cost])
+            return float(wait)
+        except Exception as e:
+            # An unavailable limiter must not take the API down with it
+            logger.warning(f"Redis rate limiter unavailable, admitting request: {e}")
+            return 0.0
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyLimiter:
+    """
+    Caps concurrently running expensive requests. Up to ``queue_size``
+    requests wait (FIFO, at most ``timeout`` seconds) for a slot; beyond
+    that they are rejected immediately. Freed slots are handed directly to
+    the next waiter so late arrivals cannot jump the queue.
+    """
+
+    def __init__(self, limit: int, queue_size: int, timeout: float):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.queue_size:
+            raise Overloaded()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as we gave up; pass it on
+                self.release()
+            if isinstance(e, asyncio.TimeoutError):
+                raise Overloaded() from e
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    """
+    Per-user rate limits per route class plus a per-process cap on
+    concurrent expensive requests. With Redis enabled the rate limits are
+    shared across workers; the concurrency cap always protects the local
+    process.
+    """
+
+    def __init__(self, rate_limiter, concurrency: ConcurrencyLimiter):
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+
+    async def charge(self, user: str, route_class: str, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens from the caller's bucket; 0 on success, else seconds to wait"""
+        rate = settings.rate_limits.get(route_class)
+        if not rate:
+            return 0.0
+        capacity = settings.rate_limit_bursts.get(route_class, 1)
+        return await self.rate_limiter.acquire(user, route_class, rate, capacity, cost)
+
+    async def check_rate(self, user: str, route_class: str, cost: float = 1.0) -> None:
+        capacity = settings.rate_limit_bursts.get(route_class, 1)
+        if settings.rate_limits.get(route_class) and cost > capacity:
+            # Could never be admitted, however long the caller waits
+            ADMISSION_REJECTED.inc(route_class=route_class, reason="too_large")
+            raise HTTPException(
+                status_code=413,
+                detail=f"Request costs {cost:g} {route_class} tokens; the limit is {capacity} per request"
+            )
+        wait = await self.charge(user, route_class, cost)
+        if wait > 0:
+            ADMISSION_REJECTED.inc(route_class=route_class, reason="rate_limited")
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded for {route_class} requests",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+    async def acquire_slot(self, route_class: str) -> None:
+        try:
+            await self.concurrency.acquire()
+        except Overloaded:
+            ADMISSION_REJECTED.inc(route_class=route_class, reason="overloaded")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry shortly",
+                headers={"Retry-After": str(max(1, math.ceil(self.concurrency.timeout)))}
+            )
+
+
+def create_admission_controller() -> AdmissionController:
+    if settings.rate_limit_redis:
+        rate_limiter = RedisTokenBucketLimiter(settings.redis_url)
+    else:
+        rate_limiter = TokenBucketLimiter()
+    return AdmissionController(
+        rate_limiter,
+        ConcurrencyLimiter(
+            settings.max_concurrent_requests,
+            settings.admission_queue_size,
+            settings.admission_queue_timeout
+        )
+    )
+
+
+# Global admission controller instance
+admission = create_admission_controller()
+
+
+async def _unit_cost() -> int:
+    return 1
+
+
+def admit(route_class: str, cost: Optional[Callable[..., Awaitable[int]]] = None):
+    """
+    Dependency for expensive routes: authenticates, applies the caller's
+    rate limit for ``route_class`` (429) and holds a concurrency slot for
+    the rest of the request (503 when the queue is full or times out).
+    Resolves to the current user.
+
+    ``cost`` is a dependency returning how many tokens the request takes,
+    e.g. one per question of a batch; requests costing more than the
+    bucket holds are rejected outright (413).
+    """
+    async def dependency(
+        current_user: str = Depends(get_current_user),
+        tokens: int = Depends(cost or _unit_cost)
+    ):
+        if not settings.admission_enabled:
+            yield current_user
+            return
+        await admission.check_rate(current_user, route_class, tokens)
+        await admission.acquire_slot(route_class)
+        try:
+            yield current_user
+        finally:
+            admission.concurrency.release()
+
+    return dependency
@@ -0,0 +1,12 @@
+from fastapi.responses import JSONResponse
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson. Accepts NumPy values and non-string
+    dict keys (e.g. the row index in a CSV preview) without a conversion pass.
+    """
+
+    def render(self, content) -> bytes:
+        import orjson
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
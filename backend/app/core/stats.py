@@ -0,0 +1,409 @@
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LatencySketch:
+    """
+    Streaming latency histogram with logarithmic (HDR-style) buckets.
+
+    Recording is O(1); quantiles are accurate to within ``precision``
+    relative error. Buckets are kept sparse so an idle sketch costs
+    almost nothing.
+    """
+
+    def __init__(self, min_value: float = 1e-4, precision: float = 0.02):
+        self._min = min_value
+        self._log_gamma = math.log1p(2 * precision)
+        self._counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value <= self._min:
+            return 0
+        return int(math.log(value / self._min) / self._log_gamma) + 1
+
+    def _value(self, index: int) -> float:
+        if index == 0:
+            return self._min
+        # Midpoint of (min * gamma^(i-1), min * gamma^i]
+        lower = self._min * math.exp((index - 1) * self._log_gamma)
+        upper = lower * math.exp(self._log_gamma)
+        return (lower + upper) / 2
+
+    def record(self, value: float) -> None:
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencySketch") -> None:
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen > rank:
+                return min(self._value(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+class _Bucket:
+    __slots__ = ("start", "counters", "latency")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.counters: Dict[str, int] = {}
+        self.latency: Dict[str, LatencySketch] = {}
+
+
+class Totals:
+    """Point-in-time read of the shared totals"""
+
+    def __init__(
+        self,
+        counters: Dict[str, int],
+        durations: Dict[str, float],
+        last_seen: Dict[str, float],
+        distinct: Dict[str, int]
+    ):
+        self.counters = counters
+        self.durations = durations
+        self._last_seen = last_seen
+        self._distinct = distinct
+
+    def count(self, name: str) -> int:
+        return self.counters.get(name, 0)
+
+    def mean(self, *names: str) -> float:
+        """Mean duration across one or more observed event names"""
+        count = sum(self.counters.get(n, 0) for n in names if n in self.durations)
+        return sum(self.durations.get(n, 0.0) for n in names) / count if count else 0.0
+
+    def last_seen(self, name: str) -> Optional[datetime]:
+        timestamp = self._last_seen.get(name)
+        return datetime.utcfromtimestamp(timestamp) if timestamp else None
+
+    def distinct(self, name: str) -> int:
+        """Number of distinct members added under ``name``"""
+        return self._distinct.get(name, 0)
+
+
+class MemoryCounters:
+    """Totals kept in this process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._durations: Dict[str, float] = {}
+        self._last_seen: Dict[str, float] = {}
+        self._members: Dict[str, Set[str]] = {}
+
+    def apply(
+        self,
+        counters: Dict[str, int],
+        durations: Dict[str, float],
+        last_seen: Dict[str, float],
+        members: Dict[str, Set[str]]
+    ) -> None:
+        with self._lock:
+            for name, amount in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+            for name, total in durations.items():
+                self._durations[name] = self._durations.get(name, 0.0) + total
+            for name, timestamp in last_seen.items():
+                self._last_seen[name] = max(self._last_seen.get(name, 0.0), timestamp)
+            for name, ids in members.items():
+                self._members.setdefault(name, set()).update(ids)
+
+    def totals(self) -> Totals:
+        with self._lock:
+            return Totals(
+                dict(self._counters),
+                dict(self._durations),
+                dict(self._last_seen),
+                {name: len(ids) for name, ids in self._members.items()}
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._durations.clear()
+            self._last_seen.clear()
+            self._members.clear()
+
+
+class RedisCounters:
+    """
+    Totals in Redis, shared by every API and Celery worker process and kept
+    across restarts. Distinct members go into HyperLogLogs: about 1% error
+    and at most 12 KB per name however many ids are added.
+    """
+
+    def __init__(self, redis_url: str, prefix: str = "stats:"):
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.from_url(self.redis_url)
+        return self._client
+
+    def apply(
+        self,
+        counters: Dict[str, int],
+        durations: Dict[str, float],
+        last_seen: Dict[str, float],
+        members: Dict[str, Set[str]]
+    ) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for name, amount in counters.items():
+            pipe.hincrby(f"{self.prefix}counters", name, amount)
+        for name, total in durations.items():
+            pipe.hincrbyfloat(f"{self.prefix}durations", name, total)
+        if last_seen:
+            pipe.hset(f"{self.prefix}last_seen", mapping=last_seen)
+        for name, ids in members.items():
+            pipe.sadd(f"{self.prefix}distinct", name)
+            pipe.pfadd(f"{self.prefix}distinct:{name}", *ids)
+        pipe.execute()
+
+    def totals(self) -> Totals:
+        pipe = self.client.pipeline(transaction=False)
+        for key in ("counters", "durations", "last_seen", "distinct"):
+            getter = pipe.smembers if key == "distinct" else pipe.hgetall
+            getter(f"{self.prefix}{key}")
+        counters, durations, last_seen, names = pipe.execute()
+        names = sorted(name.decode() for name in names)
+        pipe = self.client.pipeline(transaction=False)
+        for name in names:
+            pipe.pfcount(f"{self.prefix}distinct:{name}")
+        return Totals(
+            {k.decode(): int(v) for k, v in counters.items()},
+            {k.decode(): float(v) for k, v in durations.items()},
+            {k.decode(): float(v) for k, v in last_seen.items()},
+            dict(zip(names, pipe.execute() if names else []))
+        )
+
+    def reset(self) -> None:
+        keys = list(self.client.scan_iter(f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class StatsAggregator:
+    """
+    Incrementally maintained counters and latency sketches.
+
+    Hot paths call ``observe``/``increment``/``add_distinct``; readers get
+    totals (counts, mean durations, last event times, distinct counts)
+    from ``totals`` without scanning anything, and per-interval rollups
+    from ``series``. Totals live in ``store``; with a shared store events
+    are buffered and flushed every ``flush_interval`` seconds from a
+    background thread so hot paths never wait on it. Latency sketches and
+    the series are per process.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: int = 60,
+        retention: int = 1440,
+        store=None,
+        flush_interval: float = 0.0
+    ):
+        self.bucket_seconds = bucket_seconds
+        self.store = store if store is not None else MemoryCounters()
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._latency: Dict[str, LatencySketch] = {}
+        self._buckets: Deque[_Bucket] = deque(maxlen=retention)
+        self._pending_counters: Dict[str, int] = {}
+        self._pending_durations: Dict[str, float] = {}
+        self._pending_last_seen: Dict[str, float] = {}
+        self._pending_members: Dict[str, Set[str]] = {}
+        self._flusher_pid: Optional[int] = None
+
+    def _current_bucket(self, now: float) -> _Bucket:
+        start = now - (now % self.bucket_seconds)
+        if not self._buckets or self._buckets[-1].start != start:
+            self._buckets.append(_Bucket(start))
+        return self._buckets[-1]
+
+    def _pending(self, name: str, amount: int, now: float) -> None:
+        self._pending_counters[name] = self._pending_counters.get(name, 0) + amount
+        self._pending_last_seen[name] = now
+
+    def _recorded(self) -> None:
+        if self.flush_interval <= 0:
+            self.flush()
+        elif self._flusher_pid != os.getpid():
+            # Threads do not survive fork: each worker process starts its own
+            self._flusher_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, name="stats-flush", daemon=True).start()
+            atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """Push buffered events to the store"""
+        with self._lock:
+            pending = (
+                self._pending_counters, self._pending_durations,
+                self._pending_last_seen, self._pending_members
+            )
+            if not any(pending):
+                return
+            self._pending_counters, self._pending_durations = {}, {}
+            self._pending_last_seen, self._pending_members = {}, {}
+        try:
+            self.store.apply(*pending)
+        except Exception as e:
+            logger.warning(f"Stats store unavailable, keeping events for the next flush: {e}")
+            counters, durations, last_seen, members = pending
+            with self._lock:
+                for name, amount in counters.items():
+                    self._pending_counters[name] = self._pending_counters.get(name, 0) + amount
+                for name, total in durations.items():
+                    self._pending_durations[name] = self._pending_durations.get(name, 0.0) + total
+                for name, timestamp in last_seen.items():
+                    self._pending_last_seen[name] = max(self._pending_last_seen.get(name, 0.0), timestamp)
+                for name, ids in members.items():
+                    self._pending_members.setdefault(name, set()).update(ids)
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Add ``amount`` to the ``name`` counter"""
+        now = time.time()
+        with self._lock:
+            bucket = self._current_bucket(now)
+            bucket.counters[name] = bucket.counters.get(name, 0) + amount
+            self._pending(name, amount, now)
+        self._recorded()
+
+    def observe(self, name: str, duration: float) -> None:
+        """Count one ``name`` event and record its duration in seconds"""
+        now = time.time()
+        with self._lock:
+            bucket = self._current_bucket(now)
+            bucket.counters[name] = bucket.counters.get(name, 0) + 1
+            self._pending(name, 1, now)
+            self._pending_durations[name] = self._pending_durations.get(name, 0.0) + duration
+            if name not in self._latency:
+                self._latency[name] = LatencySketch()
+            self._latency[name].record(duration)
+            if name not in bucket.latency:
+                bucket.latency[name] = LatencySketch()
+            bucket.latency[name].record(duration)
+        self._recorded()
+
+    def add_distinct(self, name: str, members: Iterable[str]) -> None:
+        """Add ids to the ``name`` distinct count; repeats are counted once"""
+        members = {str(member) for member in members}
+        if not members:
+            return
+        with self._lock:
+            self._pending_members.setdefault(name, set()).update(members)
+        self._recorded()
+
+    def totals(self) -> Totals:
+        """Totals across every process sharing the store, including this one's unflushed events"""
+        self.flush()
+        return self.store.totals()
+
+    def count(self, name: str) -> int:
+        return self.totals().count(name)
+
+    def mean(self, *names: str) -> float:
+        """Running mean duration across one or more event names"""
+        return self.totals().mean(*names)
+
+    def last_seen(self, name: str) -> Optional[datetime]:
+        return self.totals().last_seen(name)
+
+    def distinct(self, name: str) -> int:
+        return self.totals().distinct(name)
+
+    def latency(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: s.summary() for name, s in self._latency.items()}
+
+    def series(self, limit: int = 60) -> List[Dict]:
+        """Most recent ``limit`` time buckets, oldest first"""
+        with self._lock:
+            buckets = list(self._buckets)[-limit:] if limit > 0 else []
+            return [
+                {
+                    "start": datetime.utcfromtimestamp(b.start),
+                    "counters": dict(b.counters),
+                    "latency": {n: s.summary() for n, s in b.latency.items()},
+                }
+                for b in buckets
+            ]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latency.clear()
+            self._buckets.clear()
+            self._pending_counters.clear()
+            self._pending_durations.clear()
+            self._pending_last_seen.clear()
+            self._pending_members.clear()
+        self.store.reset()
+
+
+def create_stats() -> StatsAggregator:
+    if settings.stats_redis:
+        return StatsAggregator(
+            bucket_seconds=settings.stats_bucket_seconds,
+            retention=settings.stats_retention_buckets,
+            store=RedisCounters(settings.redis_url),
+            flush_interval=settings.stats_flush_interval
+        )
+    return StatsAggregator(
+        bucket_seconds=settings.stats_bucket_seconds,
+        retention=settings.stats_retention_buckets
+    )
+
+
+# Global stats aggregator instance
+stats = create_stats()
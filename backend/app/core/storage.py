@@ -0,0 +1,380 @@
+import hashlib
+import io
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+import logging
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StorageBackend:
+    """Where uploaded files live. Keys are flat names such as ``<uuid>.pdf``."""
+
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        """Store ``fileobj`` (read from its current position) and return its size"""
+        raise NotImplementedError
+
+    def open(self, key: str) -> BinaryIO:
+        """Seekable binary reader for a stored file"""
+        raise NotImplementedError
+
+    def size(self, key: str) -> int:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def uri(self, key: str) -> str:
+        raise NotImplementedError
+
+    def list_modified(self) -> Iterator[Tuple[str, float]]:
+        """``(key, last modified epoch seconds)`` for every stored file"""
+        raise NotImplementedError
+
+    def expire(self, max_age: float) -> int:
+        """Delete files older than ``max_age`` seconds and return how many"""
+        cutoff = time.time() - max_age
+        expired = [key for key, modified in self.list_modified() if modified < cutoff]
+        for key in expired:
+            self.delete(key)
+        if expired:
+            logger.info(f"Expired {len(expired)} uploads older than {max_age:.0f}s")
+        return len(expired)
+
+
+class LocalStorage(StorageBackend):
+    """Files under a local directory (``settings.upload_dir`` unless given)"""
+
+    def __init__(self, root: Optional[str] = None):
+        self._root = root
+
+    @property
+    def root(self) -> str:
+        return self._root or settings.upload_dir
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, os.path.basename(key))
+
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.path(key), "wb") as f:
+            shutil.copyfileobj(fileobj, f, 1024 * 1024)
+            return f.tell()
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.path(key))
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def uri(self, key: str) -> str:
+        return self.path(key)
+
+    def list_modified(self) -> Iterator[Tuple[str, float]]:
+        if not os.path.isdir(self.root):
+            return
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                yield entry.name, entry.stat().st_mtime
+
+
+class RangedReader(io.RawIOBase):
+    """
+    Seekable reader over an S3 object that fetches only the byte ranges
+    actually read. Wrap in ``io.BufferedReader`` to coalesce small reads.
+    """
+
+    def __init__(self, client, bucket: str, key: str, size: int):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._size = size
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        elif whence == io.SEEK_END:
+            self._position = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self._position = max(self._position, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        if self._position >= self._size or not len(buffer):
+            return 0
+        end = min(self._position + len(buffer), self._size) - 1
+        response = self._client.get_object(
+            Bucket=self._bucket, Key=self._key, Range=f"bytes={self._position}-{end}"
+        )
+        data = response["Body"].read()
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+class _NonClosing:
+    """File proxy whose ``close`` is a no-op: boto3 closes what it uploads"""
+
+    def __init__(self, fileobj: BinaryIO):
+        self._fileobj = fileobj
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._fileobj, name)
+
+    def close(self) -> None:
+        pass
+
+
+class S3Storage(StorageBackend):
+    """
+    S3-compatible object storage (AWS, MinIO). Uploads stream through boto3's
+    multipart transfer in ``chunk_size`` parts; reads are ranged GETs in
+    ``block_size`` blocks, so parsers never need the whole object locally.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        chunk_size: int = 8 * 1024 * 1024,
+        block_size: int = 1024 * 1024,
+        **client_kwargs: Any
+    ):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.chunk_size = chunk_size
+        self.block_size = block_size
+        self._client_kwargs = client_kwargs
+        self._client = None
+        self._client_pid = None
+
+    @property
+    def client(self):
+        # boto3 clients are not fork-safe; parse pool workers build their own
+        if self._client is None or self._client_pid != os.getpid():
+            import boto3
+            self._client = boto3.client("s3", **self._client_kwargs)
+            self._client_pid = os.getpid()
+        return self._client
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        from boto3.s3.transfer import TransferConfig
+
+        start = fileobj.tell()
+        size = fileobj.seek(0, io.SEEK_END) - start
+        fileobj.seek(start)
+        config = TransferConfig(
+            multipart_threshold=self.chunk_size,
+            multipart_chunksize=self.chunk_size,
+            use_threads=False
+        )
+        self.client.upload_fileobj(_NonClosing(fileobj), self.bucket, self._object_key(key), Config=config)
+        return size
+
+    def open(self, key: str) -> BinaryIO:
+        raw = RangedReader(self.client, self.bucket, self._object_key(key), self.size(key))
+        return io.BufferedReader(raw, buffer_size=self.block_size)
+
+    def size(self, key: str) -> int:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(key) from e
+            raise
+        return response["ContentLength"]
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self._object_key(key)}"
+
+    def list_modified(self) -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):], item["LastModified"].timestamp()
+
+
+class CachedStorage(StorageBackend):
+    """
+    Local-disk LRU read-through cache in front of a remote backend.
+
+    Files up to a quarter of ``max_bytes`` are cached whole, both when
+    saved and on first read; larger files stream straight from the backend.
+    The directory is scanned once at startup (recency is the cache file's
+    mtime, so a new process picks up the existing cache); after that each
+    process tracks recency and the byte total in memory, and inserts evict
+    least recently used files until the cache is back under ``max_bytes``.
+    """
+
+    def __init__(self, backend: StorageBackend, cache_dir: str, max_bytes: int):
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        # Cache file path -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.startswith(".tmp-"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        for _, size, path in sorted(entries):
+            self._entries[path] = size
+        self._total = sum(self._entries.values())
+
+    def _cache_path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, digest + os.path.splitext(key)[1])
+
+    def _cacheable(self, size: int) -> bool:
+        return size <= self.max_bytes // 4
+
+    def _track(self, path: str, size: int) -> None:
+        """Record ``path`` as most recently used; caller holds the lock"""
+        self._total += size - self._entries.pop(path, 0)
+        self._entries[path] = size
+
+    def _insert(self, key: str, source: BinaryIO) -> str:
+        path = self._cache_path(key)
+        tmp_path = os.path.join(self.cache_dir, f".tmp-{uuid.uuid4().hex}")
+        with open(tmp_path, "wb") as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+            size = f.tell()
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._track(path, size)
+            self._evict()
+        return path
+
+    def _evict(self) -> None:
+        """Drop least recently used files until under ``max_bytes``; caller holds the lock"""
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            path, size = self._entries.popitem(last=False)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total -= size
+
+    def save(self, key: str, fileobj: BinaryIO) -> int:
+        start = fileobj.tell()
+        size = self.backend.save(key, fileobj)
+        if self._cacheable(size):
+            # Freshly uploaded files are parsed right away; keep a local copy
+            fileobj.seek(start)
+            self._insert(key, fileobj)
+        return size
+
+    def open(self, key: str) -> BinaryIO:
+        path = self._cache_path(key)
+        try:
+            f = open(path, "rb")
+            os.utime(path)
+            self.hits += 1
+            with self._lock:
+                # Possibly cached by another process sharing the directory
+                self._track(path, self._entries.get(path, os.fstat(f.fileno()).st_size))
+            return f
+        except FileNotFoundError:
+            pass
+        self.misses += 1
+        if not self._cacheable(self.backend.size(key)):
+            return self.backend.open(key)
+        with self.backend.open(key) as source:
+            path = self._insert(key, source)
+        return open(path, "rb")
+
+    def size(self, key: str) -> int:
+        try:
+            return os.path.getsize(self._cache_path(key))
+        except FileNotFoundError:
+            return self.backend.size(key)
+
+    def delete(self, key: str) -> None:
+        path = self._cache_path(key)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._total -= self._entries.pop(path, 0)
+        self.backend.delete(key)
+
+    def uri(self, key: str) -> str:
+        return self.backend.uri(key)
+
+    def list_modified(self) -> Iterator[Tuple[str, float]]:
+        return self.backend.list_modified()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def create_storage() -> StorageBackend:
+    """Build the storage backend described by settings"""
+    if settings.storage_backend == "s3":
+        client_kwargs = {
+            "endpoint_url": settings.s3_endpoint_url,
+            "region_name": settings.aws_region,
+            "aws_access_key_id": settings.aws_access_key_id,
+            "aws_secret_access_key": settings.aws_secret_access_key
+        }
+        backend: StorageBackend = S3Storage(
+            settings.aws_bucket_name,
+            prefix=settings.s3_prefix,
+            chunk_size=settings.s3_multipart_chunk_size,
+            block_size=settings.s3_read_block_size,
+            **{k: v for k, v in client_kwargs.items() if v is not None}
+        )
+    elif settings.storage_backend == "local":
+        backend = LocalStorage()
+    else:
+        raise ValueError(f"Unknown storage backend: {settings.storage_backend}")
+
+    if settings.storage_cache_dir:
+        backend = CachedStorage(backend, settings.storage_cache_dir, settings.storage_cache_max_bytes)
+    return backend
+
+
+# Global storage instance
+storage = create_storage()
@@ -1,10 +1,16 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import logging
 from contextlib import asynccontextmanager
+from .core.auth import jwks_cache
+from .core.compression import CompressionMiddleware
 from .core.config import settings
-from .api import parse, asr, query, alerts
+from .core.metrics import MetricsMiddleware, registry
+from .core.profiling import RequestProfilerMiddleware
+from .ml.warmup import warm_up
+from .api import parse, bulk, asr, query, alerts, profiling, dedup
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,11 +25,20 @@ async def lifespan(app: FastAPI):
     logger.info(f"Environment: {'Development' if settings.debug else 'Production'}")
     
     # Initialize services here (Pinecone, etc.)
+    jwks_refresh_task = None
     try:
         # Initialize Pinecone (stubbed for demo)
         logger.info("Initializing vector database...")
         # pinecone.init(api_key=settings.pinecone_api_key, environment=settings.pinecone_environment)
         
+        # Keep Auth0 signing keys warm so token checks never wait on a fetch
+        if jwks_cache is not None:
+            jwks_refresh_task = asyncio.create_task(jwks_cache.run_refresh_loop())
+        
+        # Heavy dependencies load lazily; optionally pay that cost before serving
+        if settings.warmup_on_startup:
+            await asyncio.to_thread(warm_up)
+        
         # Initialize other services
         logger.info("Services initialized successfully")
         
@@ -32,6 +47,10 @@ async def lifespan(app: FastAPI):
     
     yield
     
+    if jwks_refresh_task is not None:
+        jwks_refresh_task.cancel()
+    bulk.shutdown_parse_pool()
+    
     # Shutdown
     logger.info("Shutting down ML Document Processing API")
 
@@ -53,11 +72,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large text/JSON responses (brotli when available, else gzip)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_minimum_size)
+
+# Record per-route request metrics
+app.add_middleware(MetricsMiddleware)
+
+# Per-request profiling is only installed when enabled, so it costs nothing otherwise
+if settings.profiling_enabled:
+    app.add_middleware(RequestProfilerMiddleware)
+
 # Include API routers
 app.include_router(parse.router, prefix="/api", tags=["Document Processing"])
+app.include_router(bulk.router, prefix="/api", tags=["Document Processing"])
 app.include_router(asr.router, prefix="/api", tags=["Speech Recognition"])
 app.include_router(query.router, prefix="/api", tags=["Query Processing"])
 app.include_router(alerts.router, prefix="/api", tags=["Alerts & Analytics"])
+app.include_router(profiling.router, prefix="/api", tags=["Administration"])
+app.include_router(dedup.router, prefix="/api", tags=["Administration"])
 
 
 @app.get("/")
@@ -84,6 +116,15 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Global exception handler"""
@@ -1,8 +1,11 @@
-import numpy as np
-from typing import List, Dict, Any, Tuple
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 import logging
+import time
+from ..core.stats import stats
+from .features import FEATURE_NAMES, FeatureStore, extract_features, feature_store
+
+if TYPE_CHECKING:
+    import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -10,34 +13,44 @@ logger = logging.getLogger(__name__)
 class AnomalyDetector:
     def __init__(self, contamination: float = 0.1):
         self.contamination = contamination
-        self.scaler = StandardScaler()
-        self.isolation_forest = IsolationForest(
-            contamination=contamination,
-            random_state=42,
-            n_estimators=100
-        )
+        # scikit-learn is imported on first use, not at module import
+        self._scaler = None
+        self._isolation_forest = None
         self.is_fitted = False
     
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self._scaler = StandardScaler()
+        return self._scaler
+    
+    @property
+    def isolation_forest(self):
+        if self._isolation_forest is None:
+            from sklearn.ensemble import IsolationForest
+            self._isolation_forest = IsolationForest(
+                contamination=self.contamination,
+                random_state=42,
+                n_estimators=100
+            )
+        return self._isolation_forest
+    
     def extract_features(self, document: Dict[str, Any]) -> List[float]:
         """
         Extract numerical features from document for anomaly detection
         """
-        content = document.get('content', '')
-        
-        features = [
-            len(content),  # Document length
-            len(content.split()),  # Word count
-            len(set(content.split())),  # Unique word count
-            content.count('.'),  # Sentence count (rough)
-            content.count('\n'),  # Line breaks
-            len([w for w in content.split() if len(w) > 10]),  # Long words
-            content.count('http'),  # URLs
-            content.count('@'),  # Email addresses
-            len([w for w in content.split() if w.isupper()]),  # Uppercase words
-            content.count('!') + content.count('?'),  # Exclamation/question marks
+        return extract_features(document.get('content', ''))
+    
+    def _feature_matrix(self, documents: List[Dict[str, Any]]) -> "np.ndarray":
+        """Features of each document, read from the feature store when it has them"""
+        import numpy as np
+        stored = feature_store.get_many([doc.get("file_id") for doc in documents])
+        rows = [
+            features if features is not None else self.extract_features(doc)
+            for features, doc in zip(stored, documents)
         ]
-        
-        return features
+        return np.asarray(rows, dtype=np.float64).reshape(len(documents), len(FEATURE_NAMES))
     
     def fit(self, documents: List[Dict[str, Any]]) -> None:
         """
@@ -48,27 +61,51 @@ class AnomalyDetector:
             return
         
         try:
-            features = [self.extract_features(doc) for doc in documents]
-            features_array = np.array(features)
-            
-            # Handle case where we have only one document
-            if len(features_array) < 2:
-                logger.warning("Need at least 2 documents for anomaly detection")
-                return
-            
-            # Standardize features
-            self.scaler.fit(features_array)
-            features_scaled = self.scaler.transform(features_array)
-            
-            # Fit isolation forest
-            self.isolation_forest.fit(features_scaled)
-            self.is_fitted = True
-            
-            logger.info(f"Anomaly detector trained on {len(documents)} documents")
-            
+            self.fit_features(self._feature_matrix(documents))
         except Exception as e:
             logger.error(f"Error training anomaly detector: {e}")
     
+    def fit_features(self, features: "np.ndarray") -> None:
+        """Train on a (documents x features) matrix, e.g. from the feature store"""
+        # Handle case where we have only one document
+        if len(features) < 2:
+            logger.warning("Need at least 2 documents for anomaly detection")
+            return
+        
+        # Standardize features
+        self.scaler.fit(features)
+        features_scaled = self.scaler.transform(features)
+        
+        # Fit isolation forest
+        self.isolation_forest.fit(features_scaled)
+        self.is_fitted = True
+        
+        logger.info(f"Anomaly detector trained on {len(features)} documents")
+    
+    def score_features(self, features: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        Score a (documents x features) matrix in one pass.
+        Returns: (is_anomaly, normalized_score, raw_score) arrays
+        """
+        import numpy as np
+        features_scaled = self.scaler.transform(features)
+        
+        # Get anomaly score (-1 for anomaly, 1 for normal)
+        predictions = self.isolation_forest.predict(features_scaled)
+        raw_scores = self.isolation_forest.decision_function(features_scaled)
+        
+        # Normalize score to 0-1 range (higher = more anomalous)
+        normalized = np.maximum(0, (0.5 - raw_scores) / 0.5)
+        return predictions == -1, normalized, raw_scores
+    
+    def _details(self, features: "np.ndarray", raw_score: float, normalized_score: float) -> Dict[str, Any]:
+        return {
+            "features": [float(value) for value in features],
+            "raw_score": float(raw_score),
+            "normalized_score": float(normalized_score),
+            "feature_names": FEATURE_NAMES
+        }
+    
     def detect_anomaly(self, document: Dict[str, Any]) -> Tuple[bool, float, Dict[str, Any]]:
         """
         Detect if a document is anomalous
@@ -78,56 +115,79 @@ class AnomalyDetector:
             logger.warning("Anomaly detector not fitted")
             return False, 0.0, {"error": "Detector not trained"}
         
+        import numpy as np
+        
         try:
-            features = self.extract_features(document)
-            features_array = np.array([features])
-            features_scaled = self.scaler.transform(features_array)
-            
-            # Get anomaly score (-1 for anomaly, 1 for normal)
-            prediction = self.isolation_forest.predict(features_scaled)[0]
-            anomaly_score = self.isolation_forest.decision_function(features_scaled)[0]
-            
-            is_anomaly = prediction == -1
-            
-            # Normalize score to 0-1 range (higher = more anomalous)
-            normalized_score = max(0, (0.5 - anomaly_score) / 0.5)
-            
-            details = {
-                "features": features,
-                "raw_score": float(anomaly_score),
-                "normalized_score": float(normalized_score),
-                "feature_names": [
-                    "document_length", "word_count", "unique_words", "sentences",
-                    "line_breaks", "long_words", "urls", "emails", "uppercase_words", "punctuation"
-                ]
-            }
-            
-            return is_anomaly, normalized_score, details
+            features = np.array([self.extract_features(document)], dtype=np.float64)
+            is_anomaly, normalized, raw = self.score_features(features)
+            return bool(is_anomaly[0]), float(normalized[0]), self._details(features[0], raw[0], normalized[0])
             
         except Exception as e:
             logger.error(f"Error detecting anomaly: {e}")
             return False, 0.0, {"error": str(e)}
     
+    def _results(
+        self,
+        ids: List[str],
+        filenames: List[str],
+        features: "np.ndarray"
+    ) -> List[Dict[str, Any]]:
+        start_time = time.time()
+        is_anomaly, normalized, raw = self.score_features(features)
+        # One event per scan, however many documents it scored
+        stats.observe("anomaly_scan", time.time() - start_time)
+        results = []
+        for i, (document_id, filename) in enumerate(zip(ids, filenames)):
+            results.append({
+                "document_id": document_id,
+                "filename": filename,
+                "is_anomaly": bool(is_anomaly[i]),
+                "anomaly_score": float(normalized[i]),
+                "details": self._details(features[i], raw[i], normalized[i])
+            })
+        # Distinct ids, so rescoring the same documents does not count them again
+        stats.add_distinct("anomalies", [document_id for document_id, flagged in zip(ids, is_anomaly) if flagged])
+        return results
+    
     def batch_detect(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         Detect anomalies in a batch of documents
         """
-        results = []
-        
-        for i, doc in enumerate(documents):
-            is_anomaly, score, details = self.detect_anomaly(doc)
-            
-            result = {
-                "document_id": doc.get("file_id", f"doc_{i}"),
-                "filename": doc.get("filename", f"document_{i}"),
-                "is_anomaly": is_anomaly,
-                "anomaly_score": score,
-                "details": details
+        ids = [doc.get("file_id", f"doc_{i}") for i, doc in enumerate(documents)]
+        filenames = [doc.get("filename", f"document_{i}") for i, doc in enumerate(documents)]
+        if not self.is_fitted:
+            logger.warning("Anomaly detector not fitted")
+            error = "Detector not trained"
+        else:
+            try:
+                return self._results(ids, filenames, self._feature_matrix(documents))
+            except Exception as e:
+                logger.error(f"Error detecting anomalies: {e}")
+                error = str(e)
+        return [
+            {
+                "document_id": document_id,
+                "filename": filename,
+                "is_anomaly": False,
+                "anomaly_score": 0.0,
+                "details": {"error": error}
             }
-            
-            results.append(result)
-        
-        return results
+            for document_id, filename in zip(ids, filenames)
+        ]
+    
+    def rescore_store(self, store: Optional[FeatureStore] = None, refit: bool = False) -> List[Dict[str, Any]]:
+        """
+        Score every document in the feature store (optionally re-training on
+        it first) without touching document content
+        """
+        store = store or feature_store
+        file_ids, features, _ = store.columns()
+        features = features.astype("float64")
+        if refit or not self.is_fitted:
+            self.fit_features(features)
+        if not self.is_fitted or not len(file_ids):
+            return []
+        return self._results(list(file_ids), list(file_ids), features)
 
 
 # Global anomaly detector instance
@@ -0,0 +1,209 @@
+import io
+import struct
+import wave
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+import logging
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def decode_wav(data: bytes) -> Tuple["np.ndarray", int]:
+    """
+    Decode a PCM (8/16/24/32-bit) or IEEE float WAV into float32 samples
+    in [-1, 1] shaped (frames, channels), plus the sample rate
+    """
+    import numpy as np
+
+    if not is_wav(data):
+        raise ValueError("Not a RIFF/WAVE file")
+    fmt: Optional[Tuple[int, int, int, int]] = None
+    samples = None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id, size = struct.unpack_from("<4sI", data, offset)
+        body = data[offset + 8:offset + 8 + size]
+        if chunk_id == b"fmt ":
+            if len(body) < 16:
+                raise ValueError("Truncated WAV fmt chunk")
+            audio_format, channels, rate = struct.unpack_from("<HHI", body)
+            bits = struct.unpack_from("<H", body, 14)[0]
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                audio_format = struct.unpack_from("<H", body, 24)[0]
+            if not channels or not rate or not bits or bits % 8:
+                raise ValueError(f"Invalid WAV format: {channels} channels, {rate} Hz, {bits} bits")
+            fmt = (audio_format, channels, rate, bits)
+        elif chunk_id == b"data":
+            samples = body
+        # Chunks are word aligned
+        offset += 8 + size + (size & 1)
+    if fmt is None or samples is None:
+        raise ValueError("WAV file is missing its fmt or data chunk")
+
+    audio_format, channels, rate, bits = fmt
+    width = bits // 8
+    usable = len(samples) - len(samples) % (width * channels)
+    raw = np.frombuffer(samples[:usable], dtype=np.uint8)
+    if audio_format == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        pcm = raw.view(np.float32 if bits == 32 else np.float64).astype(np.float32)
+    elif audio_format == WAVE_FORMAT_PCM and bits == 8:
+        pcm = (raw.astype(np.float32) - 128.0) / 128.0
+    elif audio_format == WAVE_FORMAT_PCM and bits in (16, 32):
+        dtype = np.int16 if bits == 16 else np.int32
+        pcm = raw.view(dtype).astype(np.float32) / float(2 ** (bits - 1))
+    elif audio_format == WAVE_FORMAT_PCM and bits == 24:
+        # Sign-extend little-endian 3-byte samples into int32
+        triples = raw.reshape(-1, 3).astype(np.int32)
+        values = triples[:, 0] | (triples[:, 1] << 8) | (triples[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        pcm = values.astype(np.float32) / float(2 ** 23)
+    else:
+        raise ValueError(f"Unsupported WAV encoding: format {audio_format}, {bits} bits")
+    return pcm.reshape(-1, channels), rate
+
+
+def encode_wav(samples: "np.ndarray", rate: int) -> bytes:
+    """Encode mono float samples as 16-bit PCM WAV"""
+    import numpy as np
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def resample(samples: "np.ndarray", rate: int, target_rate: int, taps: int = 63) -> "np.ndarray":
+    """
+    Resample mono audio. Downsampling first low-passes with a Hann-windowed
+    sinc at the new Nyquist frequency so speech above it does not alias.
+    """
+    import numpy as np
+
+    if rate == target_rate or not len(samples):
+        return samples.astype(np.float32)
+    if target_rate < rate:
+        cutoff = 0.5 * target_rate / rate
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(taps)
+        samples = np.convolve(samples, kernel / kernel.sum(), mode="same")
+    duration = len(samples) / rate
+    positions = np.arange(int(duration * target_rate)) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def voice_activity(
+    samples: "np.ndarray",
+    rate: int,
+    frame_seconds: float = 0.03,
+    threshold_db: float = 12.0,
+    floor_db: float = -55.0,
+    silence_db: float = -45.0
+) -> "np.ndarray":
+    """
+    Energy-based VAD: a frame is speech when its RMS level is at least
+    ``threshold_db`` above the recording's noise floor (10th percentile
+    frame level). Frames below ``floor_db`` dBFS are always silence and
+    frames above ``silence_db`` dBFS always speech, so a quiet speaker is
+    never cut. Recordings whose quietest frames are not silence-level or
+    not ``threshold_db`` below the speech level (90th percentile) have no
+    silence to find. Returns one bool per frame.
+    """
+    import numpy as np
+
+    frame = max(1, int(rate * frame_seconds))
+    count = len(samples) // frame
+    if not count:
+        return np.zeros(0, dtype=bool)
+    frames = samples[:count * frame].reshape(count, frame)
+    level = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    noise_floor = np.percentile(level, 10)
+    speech_level = np.percentile(level, 90)
+    if noise_floor > silence_db or speech_level - noise_floor < threshold_db:
+        return level >= floor_db
+    return level >= min(max(noise_floor + threshold_db, floor_db), silence_db)
+
+
+def trim_silence(
+    samples: "np.ndarray",
+    rate: int,
+    max_pause: float = 0.5,
+    padding: float = 0.15,
+    frame_seconds: float = 0.03,
+    threshold_db: float = 12.0
+) -> "np.ndarray":
+    """
+    Drop leading and trailing silence and shorten internal pauses longer
+    than ``max_pause`` to ``max_pause``. Speech is padded by ``padding``
+    seconds on each side so word onsets and tails survive.
+    """
+    import numpy as np
+
+    voiced = voice_activity(samples, rate, frame_seconds, threshold_db)
+    if not voiced.any():
+        return samples[:0]
+    frame = max(1, int(rate * frame_seconds))
+    pad = int(round(padding / frame_seconds))
+    # Dilate speech frames by the padding
+    kernel = np.ones(2 * pad + 1, dtype=bool)
+    keep = np.convolve(voiced, kernel, mode="same") > 0
+
+    # Keep at most max_pause of every remaining silent run (except the edges, dropped entirely)
+    max_frames = int(round(max_pause / frame_seconds))
+    edges = np.flatnonzero(np.diff(np.concatenate(([1], keep.astype(np.int8), [1]))))
+    for start, end in zip(edges[::2], edges[1::2]):
+        if start == 0 or end == len(keep):
+            continue
+        if end - start > max_frames:
+            keep[start:start + max_frames // 2] = True
+            keep[end - (max_frames - max_frames // 2):end] = True
+        else:
+            keep[start:end] = True
+    return samples[:len(keep) * frame].reshape(len(keep), frame)[keep].reshape(-1)
+
+
+def preprocess_wav(
+    data: bytes,
+    target_rate: int = 16000,
+    max_pause: float = 0.5,
+    threshold_db: float = 12.0
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Decode, downmix to mono, downsample to ``target_rate``, trim silence
+    and re-encode as 16-bit PCM WAV. Audio recorded below ``target_rate``
+    (8 kHz telephony) keeps its native rate: upsampling would only grow
+    the payload. Returns the processed audio and a report with original
+    and processed durations and sizes.
+    """
+    samples, rate = decode_wav(data)
+    original_duration = len(samples) / rate if rate else 0.0
+    mono = samples.mean(axis=1)
+    output_rate = min(rate, target_rate)
+    mono = resample(mono, rate, output_rate)
+    trimmed = trim_silence(mono, output_rate, max_pause=max_pause, threshold_db=threshold_db)
+    encoded = encode_wav(trimmed, output_rate)
+    report = {
+        "original_duration": round(original_duration, 3),
+        "processed_duration": round(len(trimmed) / output_rate, 3),
+        "original_bytes": len(data),
+        "processed_bytes": len(encoded),
+        "sample_rate": output_rate
+    }
+    logger.info(
+        f"Audio preprocessed: {report['original_duration']:.1f}s -> {report['processed_duration']:.1f}s, "
+        f"{len(data)} -> {len(encoded)} bytes"
+    )
+    return encoded, report
@@ -0,0 +1,118 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Average characters per token for English text with BPE-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate; avoids running a real tokenizer per request"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to about ``max_tokens`` tokens, at a word boundary when possible"""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    # Leave room for the ellipsis
+    limit -= 3
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > limit // 2 else limit].rstrip() + "..."
+
+
+def mmr_rerank(
+    relevance: Sequence[float],
+    embeddings: Sequence[Optional[Sequence[float]]],
+    k: int,
+    lambda_: float = 0.7
+) -> List[int]:
+    """
+    Maximal marginal relevance: repeatedly pick the candidate maximizing
+    ``lambda_ * relevance - (1 - lambda_) * max similarity to those already
+    picked``. Returns candidate indices in pick order. Candidates without an
+    embedding are never penalized as redundant.
+    """
+    import numpy as np
+
+    n = len(relevance)
+    k = min(k, n)
+    if k <= 0:
+        return []
+    relevance = np.asarray(relevance, dtype=np.float32)
+    if relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    dimension = next((len(e) for e in embeddings if e is not None), 0)
+    vectors = np.zeros((n, dimension), dtype=np.float32)
+    for i, embedding in enumerate(embeddings):
+        if embedding is not None:
+            vectors[i] = embedding
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    # Pairwise cosine similarities computed once; each step is then a vector max
+    similarity = vectors @ vectors.T
+
+    selected: List[int] = []
+    redundancy = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    for _ in range(k):
+        scores = lambda_ * relevance - (1 - lambda_) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def pack_context(
+    documents: List[Dict[str, Any]],
+    token_budget: int,
+    doc_token_limit: int,
+    min_doc_tokens: int = 32
+) -> Tuple[List[Dict[str, Any]], str, int]:
+    """
+    Greedily pack documents, in order, into ``token_budget`` tokens. Each
+    document's content is capped at ``doc_token_limit`` tokens and the last
+    one is truncated to the remaining budget if at least ``min_doc_tokens``
+    fit. Returns the documents used, the context text and its token estimate.
+    """
+    packed, parts, used = [], [], 0
+    for document in documents:
+        header = f"Document: {document['filename']}\nContent: "
+        # One token reserved for the separator between documents
+        remaining = token_budget - used - estimate_tokens(header) - 1
+        if remaining < min_doc_tokens:
+            break
+        content = truncate_to_tokens(document["content"], min(doc_token_limit, remaining))
+        part = header + content
+        packed.append(document)
+        parts.append(part)
+        used += estimate_tokens(part) + 1
+    return packed, "\n\n".join(parts), used
+
+
+def adaptive_max_tokens(
+    prompt_tokens: int,
+    context_tokens: int,
+    minimum: int,
+    maximum: int,
+    context_window: int
+) -> int:
+    """
+    Answer length cap that grows with the amount of evidence (a quarter of
+    the context plus ``minimum``) and never overflows the model's window.
+    Raises ValueError when the prompt leaves less than ``minimum`` tokens.
+    """
+    floor = min(minimum, maximum)
+    if context_window - prompt_tokens < floor:
+        raise ValueError(
+            f"Prompt of about {prompt_tokens} tokens leaves less than {floor} tokens "
+            f"of the {context_window} token context window for the answer"
+        )
+    return max(min(maximum, minimum + context_tokens // 4, context_window - prompt_tokens), floor)
@@ -0,0 +1,300 @@
+import threading
+import uuid
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+import logging
+from ..core.config import settings
+from .retrieval import tokenize
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mersenne prime for the universal hash family; shingle hashes are reduced
+# below it so (a * x + b) never overflows uint64
+_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """
+    MinHash signatures over word shingles. The fraction of equal signature
+    slots between two documents estimates the Jaccard similarity of their
+    shingle sets. Texts with fewer than ``min_tokens`` tokens get no
+    signature: blank or image-only documents would otherwise all look
+    identical.
+    """
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, min_tokens: int = 20, seed: int = 1):
+        import numpy as np
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.min_tokens = max(min_tokens, 1)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=num_perm).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=num_perm).astype(np.uint64)
+
+    def shingles(self, text: str) -> "np.ndarray":
+        import numpy as np
+        tokens = tokenize(text)
+        if not tokens:
+            return np.empty(0, dtype=np.uint64)
+        size = min(self.shingle_size, len(tokens))
+        # crc32 is stable across processes, unlike hash()
+        hashes = {
+            zlib.crc32(" ".join(tokens[i:i + size]).encode()) % _PRIME
+            for i in range(len(tokens) - size + 1)
+        }
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, text: str) -> Optional["np.ndarray"]:
+        import numpy as np
+        if len(tokenize(text)) < self.min_tokens:
+            return None
+        shingles = self.shingles(text)
+        signature = np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        # Vectorized over permutations x shingles, chunked to bound memory on long documents
+        for start in range(0, len(shingles), 8192):
+            chunk = shingles[start:start + 8192]
+            hashed = (np.outer(self._a, chunk) + self._b[:, None]) % _PRIME
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    @staticmethod
+    def similarity(first: "np.ndarray", second: "np.ndarray") -> float:
+        return float((first == second).mean())
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing over MinHash signatures: documents
+    sharing any band bucket become candidates, so lookups touch a handful
+    of buckets instead of the whole corpus. Buckets are namespaced by
+    ``scope`` (the uploader), so documents only match within their scope.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 8):
+        self.bands = bands
+        self.rows = rows
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self._signatures: Dict[str, "np.ndarray"] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._signatures
+
+    def _keys(self, signature: "np.ndarray", scope: str) -> Iterable[Tuple[int, bytes]]:
+        prefix = scope.encode() + b"\0"
+        for band in range(self.bands):
+            yield band, prefix + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, doc_id: str, signature: "np.ndarray", scope: str = "") -> None:
+        self._signatures[doc_id] = signature
+        for band, key in self._keys(signature, scope):
+            self._buckets[band].setdefault(key, []).append(doc_id)
+
+    def candidates(self, signature: "np.ndarray", scope: str = "") -> Dict[str, "np.ndarray"]:
+        """Signatures of the documents sharing a band bucket with ``signature``"""
+        found: Dict[str, "np.ndarray"] = {}
+        for band, key in self._keys(signature, scope):
+            for doc_id in self._buckets[band].get(key, ()):
+                found[doc_id] = self._signatures[doc_id]
+        return found
+
+
+class RedisLSHIndex(LSHIndex):
+    """
+    ``LSHIndex`` kept in Redis so every API worker process shares it: band
+    buckets are sets and signatures live in one hash. ``replace`` swaps in
+    a rebuilt index for all processes at once by moving a generation
+    pointer, then deletes the previous generation.
+    """
+
+    def __init__(self, redis_url: str, bands: int = 16, rows: int = 8, prefix: str = "dedup:"):
+        super().__init__(bands, rows)
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.from_url(self.redis_url)
+        return self._client
+
+    def _generation(self) -> str:
+        generation = self.client.get(f"{self.prefix}generation")
+        return generation.decode() if generation else "0"
+
+    def _bucket_key(self, generation: str, band: int, key: bytes) -> str:
+        return f"{self.prefix}{generation}:{band}:{key.hex()}"
+
+    def __len__(self) -> int:
+        return self.client.hlen(f"{self.prefix}{self._generation()}:signatures")
+
+    def __contains__(self, doc_id: str) -> bool:
+        return bool(self.client.hexists(f"{self.prefix}{self._generation()}:signatures", doc_id))
+
+    def _write(self, generation: str, entries: Iterable[Tuple[str, "np.ndarray", str]]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for doc_id, signature, scope in entries:
+            pipe.hset(f"{self.prefix}{generation}:signatures", doc_id, signature.tobytes())
+            for band, key in self._keys(signature, scope):
+                pipe.sadd(self._bucket_key(generation, band, key), doc_id)
+        pipe.execute()
+
+    def add(self, doc_id: str, signature: "np.ndarray", scope: str = "") -> None:
+        self._write(self._generation(), [(doc_id, signature, scope)])
+
+    def candidates(self, signature: "np.ndarray", scope: str = "") -> Dict[str, "np.ndarray"]:
+        import numpy as np
+        generation = self._generation()
+        pipe = self.client.pipeline(transaction=False)
+        for band, key in self._keys(signature, scope):
+            pipe.smembers(self._bucket_key(generation, band, key))
+        ids = sorted({doc_id.decode() for members in pipe.execute() for doc_id in members})
+        if not ids:
+            return {}
+        stored = self.client.hmget(f"{self.prefix}{generation}:signatures", ids)
+        return {
+            doc_id: np.frombuffer(value, dtype=np.uint32)
+            for doc_id, value in zip(ids, stored) if value is not None
+        }
+
+    def replace(self, entries: List[Tuple[str, "np.ndarray", str]]) -> None:
+        """Make ``(doc_id, signature, scope)`` entries the whole index"""
+        previous = self._generation()
+        generation = uuid.uuid4().hex
+        for start in range(0, len(entries), 1000):
+            self._write(generation, entries[start:start + 1000])
+        self.client.set(f"{self.prefix}generation", generation)
+        keys = list(self.client.scan_iter(f"{self.prefix}{previous}:*"))
+        for start in range(0, len(keys), 1000):
+            self.client.delete(*keys[start:start + 1000])
+
+
+class NearDuplicateDetector:
+    """
+    Flags documents whose estimated shingle Jaccard similarity with an
+    already ingested document from the same uploader reaches ``threshold``.
+
+    With 16 bands of 8 rows, pairs at 0.9 similarity become LSH candidates
+    with probability above 0.999 while pairs at 0.5 do about 6% of the
+    time; candidates are then confirmed against the full signature.
+    Documents too short for a signature are never flagged. With
+    ``redis_url`` the index is shared by every worker process.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        bands: int = 16,
+        min_tokens: int = 20,
+        redis_url: Optional[str] = None
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.min_tokens = min_tokens
+        self._hasher: Optional[MinHasher] = None
+        self._num_perm = num_perm
+        self._bands = bands
+        self._redis_url = redis_url
+        self._lsh = self._new_index()
+        self._lock = threading.Lock()
+
+    def _new_index(self) -> LSHIndex:
+        if self._redis_url:
+            return RedisLSHIndex(self._redis_url, self._bands, self._num_perm // self._bands)
+        return LSHIndex(self._bands, self._num_perm // self._bands)
+
+    @property
+    def hasher(self) -> MinHasher:
+        if self._hasher is None:
+            self._hasher = MinHasher(self._num_perm, min_tokens=self.min_tokens)
+        return self._hasher
+
+    def __len__(self) -> int:
+        return len(self._lsh)
+
+    def _best_match(self, lsh: LSHIndex, signature: "np.ndarray", scope: str) -> Tuple[Optional[str], float]:
+        best_id, best_score = None, 0.0
+        for doc_id, candidate in lsh.candidates(signature, scope).items():
+            score = MinHasher.similarity(signature, candidate)
+            if score > best_score:
+                best_id, best_score = doc_id, score
+        if best_score < self.threshold:
+            return None, best_score
+        return best_id, best_score
+
+    def check(self, doc_id: str, content: str, scope: str = "") -> Tuple[Optional[str], float]:
+        """
+        Return ``(duplicate_of, similarity)`` for a new document and remember
+        it when it is original. ``duplicate_of`` is None for originals and
+        for documents too short to compare; only documents of the same
+        ``scope`` (uploader) can match.
+        """
+        signature = self.hasher.signature(content)
+        if signature is None:
+            return None, 0.0
+        with self._lock:
+            if doc_id in self._lsh:
+                return None, 0.0
+            duplicate_of, score = self._best_match(self._lsh, signature, scope)
+            if duplicate_of is None:
+                self._lsh.add(doc_id, signature, scope)
+            return duplicate_of, score
+
+    def rescan(self, documents: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Re-scan a corpus of ``{"id", "content", "metadata"}`` dicts: rebuild
+        the LSH index from it (for every worker when it lives in Redis) and
+        report near-duplicate groups per uploader, each keyed by the first
+        document seen
+        """
+        lsh = LSHIndex(self._bands, self._num_perm // self._bands)
+        entries: List[Tuple[str, "np.ndarray", str]] = []
+        groups: Dict[str, List[str]] = {}
+        scanned = 0
+        for document in documents:
+            scanned += 1
+            signature = self.hasher.signature(document.get("content", ""))
+            if signature is None:
+                continue
+            scope = str((document.get("metadata") or {}).get("uploaded_by", ""))
+            duplicate_of, _ = self._best_match(lsh, signature, scope)
+            if duplicate_of is not None:
+                groups.setdefault(duplicate_of, []).append(document["id"])
+                continue
+            lsh.add(document["id"], signature, scope)
+            entries.append((document["id"], signature, scope))
+
+        with self._lock:
+            if isinstance(self._lsh, RedisLSHIndex):
+                self._lsh.replace(entries)
+            else:
+                self._lsh = lsh
+
+        duplicates = sum(len(ids) for ids in groups.values())
+        logger.info(f"Near-duplicate rescan: {duplicates} of {scanned} documents are duplicates")
+        return {
+            "scanned": scanned,
+            "duplicates": duplicates,
+            "duplication_rate": duplicates / scanned if scanned else 0.0,
+            "groups": [
+                {"canonical_id": canonical_id, "duplicate_ids": ids}
+                for canonical_id, ids in groups.items()
+            ]
+        }
+
+
+# Global near-duplicate detector instance (shared through Redis with settings.dedup_redis)
+dedup_detector = NearDuplicateDetector(
+    threshold=settings.dedup_threshold,
+    min_tokens=settings.dedup_min_tokens,
+    redis_url=settings.redis_url if settings.dedup_redis else None
+)
@@ -0,0 +1,216 @@
+import fcntl
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+from ..core.config import settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FEATURE_NAMES = [
+    "document_length", "word_count", "unique_words", "sentences",
+    "line_breaks", "long_words", "urls", "emails", "uppercase_words", "punctuation"
+]
+
+WORD_COUNT = FEATURE_NAMES.index("word_count")
+DOCUMENT_LENGTH = FEATURE_NAMES.index("document_length")
+URLS = FEATURE_NAMES.index("urls")
+EMAILS = FEATURE_NAMES.index("emails")
+
+# Longest file id stored; uuid4 ids are 36 characters
+ID_BYTES = 64
+
+
+def extract_features(content: str) -> List[float]:
+    """The anomaly features of a document's text, in ``FEATURE_NAMES`` order"""
+    words = content.split()
+    return [
+        len(content),  # Document length
+        len(words),  # Word count
+        len(set(words)),  # Unique word count
+        content.count('.'),  # Sentence count (rough)
+        content.count('\n'),  # Line breaks
+        sum(1 for w in words if len(w) > 10),  # Long words
+        content.count('http'),  # URLs
+        content.count('@'),  # Email addresses
+        sum(1 for w in words if w.isupper()),  # Uppercase words
+        content.count('!') + content.count('?'),  # Exclamation/question marks
+    ]
+
+
+def record_dtype() -> "np.dtype":
+    """Fixed-size feature record: file id, ingest time and one float per feature"""
+    import numpy as np
+    return np.dtype([
+        ("file_id", f"S{ID_BYTES}"),
+        ("ingested_at", "<f8"),
+        ("features", "<f4", (len(FEATURE_NAMES),)),
+    ])
+
+
+class FeatureStore:
+    """
+    Columnar per-document feature store keyed by file id, filled once at
+    ingest so anomaly scoring and analytics never re-tokenize content.
+
+    Records are fixed-size NumPy structs. In memory they live in a growable
+    array; with a ``path`` every worker appends its records to one shared
+    file (each record is a single append under a file lock) and reads
+    pick up what other processes wrote since the last read. A re-ingested
+    file id supersedes its earlier record; superseded records are dropped
+    from memory once they outnumber the live ones.
+
+    An id -> row map makes ``get`` O(1), the dashboard aggregates are
+    updated as records arrive, and the deduplicated column view is cached
+    until the next record, so reads never rescan the corpus.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._records: Optional["np.ndarray"] = None
+        self._size = 0
+        self._read_bytes = 0
+        self._rows: Dict[str, int] = {}
+        self._totals = {"total_words": 0.0, "total_length": 0.0, "documents_with_urls": 0, "documents_with_emails": 0}
+        self._columns: Optional[Tuple["np.ndarray", "np.ndarray", "np.ndarray"]] = None
+        self._lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._rows)
+
+    def _count(self, features: "np.ndarray", sign: int) -> None:
+        """Add (or with ``sign=-1`` remove) one record's share of the aggregates"""
+        self._totals["total_words"] += sign * float(features[WORD_COUNT])
+        self._totals["total_length"] += sign * float(features[DOCUMENT_LENGTH])
+        self._totals["documents_with_urls"] += sign * int(features[URLS] > 0)
+        self._totals["documents_with_emails"] += sign * int(features[EMAILS] > 0)
+
+    def _append_memory(self, records: "np.ndarray") -> None:
+        import numpy as np
+        if self._records is None:
+            self._records = np.empty(max(16, len(records)), dtype=records.dtype)
+        elif self._size + len(records) > len(self._records):
+            grown = np.empty(max(2 * len(self._records), self._size + len(records)), dtype=records.dtype)
+            grown[:self._size] = self._records[:self._size]
+            self._records = grown
+        self._records[self._size:self._size + len(records)] = records
+        for offset, record in enumerate(records):
+            file_id = record["file_id"].decode()
+            previous = self._rows.get(file_id)
+            if previous is not None:
+                self._count(self._records[previous]["features"], -1)
+            self._count(record["features"], 1)
+            self._rows[file_id] = self._size + offset
+        self._size += len(records)
+        self._columns = None
+        if self._size - len(self._rows) > max(len(self._rows), 16):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop superseded records once they outnumber the live ones"""
+        import numpy as np
+        live = sorted(self._rows.items(), key=lambda item: item[1])
+        rows = np.fromiter((row for _, row in live), dtype=np.int64, count=len(live))
+        self._records = self._records[rows]
+        self._rows = {file_id: i for i, (file_id, _) in enumerate(live)}
+        self._size = len(live)
+
+    def add_many(self, file_ids: Sequence[str], features: Iterable[Sequence[float]]) -> None:
+        import numpy as np
+        records = np.zeros(len(file_ids), dtype=record_dtype())
+        if not len(records):
+            return
+        records["file_id"] = [file_id.encode()[:ID_BYTES] for file_id in file_ids]
+        records["ingested_at"] = time.time()
+        records["features"] = np.asarray(list(features), dtype=np.float32)
+        with self._lock:
+            if not self.path:
+                self._append_memory(records)
+                return
+            with open(self.path, "ab") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.write(records.tobytes())
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def add(self, file_id: str, features: Sequence[float]) -> None:
+        self.add_many([file_id], [features])
+
+    def _sync(self) -> None:
+        """Read records appended to the shared file since the last read"""
+        import numpy as np
+        if not self.path:
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        itemsize = record_dtype().itemsize
+        # Ignore a record another process is still writing
+        end = size - size % itemsize
+        if end <= self._read_bytes:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._read_bytes)
+            records = np.frombuffer(f.read(end - self._read_bytes), dtype=record_dtype())
+        self._append_memory(records)
+        self._read_bytes = end
+
+    def columns(self) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        ``(file_ids, features, ingested_at)`` with one row per file id (its
+        latest record); features is a (documents x features) float32 matrix
+        """
+        import numpy as np
+        with self._lock:
+            self._sync()
+            if self._columns is None:
+                rows = np.fromiter(sorted(self._rows.values()), dtype=np.int64, count=len(self._rows))
+                latest = self._records[rows] if self._records is not None else np.zeros(0, dtype=record_dtype())
+                columns = (latest["file_id"].astype(str), latest["features"], latest["ingested_at"])
+                for column in columns:
+                    # Shared by every caller until the next record arrives
+                    column.flags.writeable = False
+                self._columns = columns
+            return self._columns
+
+    def get_many(self, file_ids: Sequence[Optional[str]]) -> List[Optional["np.ndarray"]]:
+        """Latest features of each file id, None for ids not in the store"""
+        with self._lock:
+            self._sync()
+            rows = [self._rows.get(file_id) if file_id else None for file_id in file_ids]
+            return [None if row is None else self._records[row]["features"].copy() for row in rows]
+
+    def get(self, file_id: str) -> Optional[List[float]]:
+        features = self.get_many([file_id])[0]
+        return None if features is None else features.tolist()
+
+    def summary(self) -> Dict[str, Any]:
+        """Corpus-wide aggregates for the dashboard"""
+        with self._lock:
+            self._sync()
+            documents = len(self._rows)
+            totals = dict(self._totals)
+        if not documents:
+            return {"documents": 0}
+        return {
+            "documents": documents,
+            "total_words": int(round(totals["total_words"])),
+            "avg_words": round(totals["total_words"] / documents, 1),
+            "avg_length": round(totals["total_length"] / documents, 1),
+            "documents_with_urls": totals["documents_with_urls"],
+            "documents_with_emails": totals["documents_with_emails"],
+        }
+
+
+# Global feature store instance (in memory unless settings.feature_store_path is set)
+feature_store = FeatureStore(settings.feature_store_path)
@@ -0,0 +1,363 @@
+import json
+import os
+from array import array
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence
+import logging
+from ..core.config import settings
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METADATA_FILE = "metadata.json"
+
+# Filter values standing for the caller, e.g. {"uploaded_by": "$me"}
+CURRENT_USER = "$me"
+
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte")
+
+
+def to_timestamp(value: Any) -> Optional[float]:
+    """Seconds since the epoch for an ISO date/datetime (naive means UTC), else None"""
+    if isinstance(value, datetime):
+        moment = value
+    elif isinstance(value, date):
+        moment = datetime(value.year, value.month, value.day)
+    elif isinstance(value, str):
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    else:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _values(value: Any) -> List[str]:
+    """Categorical values of a metadata field (lists index every element)"""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(item) for item in value if item is not None]
+    return [str(value)]
+
+
+def _unpack(bitmap: "np.ndarray", size: int) -> "np.ndarray":
+    import numpy as np
+    return np.unpackbits(bitmap, count=size, bitorder="little").astype(bool)
+
+
+class _MetadataIndexBase:
+    """
+    Shared lookups over per-value bitmaps and per-attribute sorted dates.
+    Subclasses provide ``size``, ``_bitmap`` and ``_dates``.
+    """
+
+    size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _bitmap(self, attribute: str, value: str) -> Optional["np.ndarray"]:
+        raise NotImplementedError
+
+    def _dates(self, attribute: str):
+        raise NotImplementedError
+
+    def match(self, attribute: str, values: Sequence[str]) -> "np.ndarray":
+        """Mask of documents whose ``attribute`` is any of ``values``"""
+        import numpy as np
+        packed = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for value in values:
+            bitmap = self._bitmap(attribute, value)
+            if bitmap is not None:
+                # Bitmaps of values last seen early in the index are shorter
+                packed[:len(bitmap)] |= bitmap[:len(packed)]
+        return _unpack(packed, self.size)
+
+    def range(
+        self,
+        attribute: str,
+        lower: Optional[float] = None,
+        upper: Optional[float] = None,
+        include_lower: bool = True,
+        include_upper: bool = True
+    ) -> "np.ndarray":
+        """Mask of documents whose ``attribute`` timestamp lies within the bounds"""
+        import numpy as np
+        timestamps, docnums = self._dates(attribute)
+        start = 0 if lower is None else np.searchsorted(timestamps, lower, side="left" if include_lower else "right")
+        end = len(timestamps) if upper is None else np.searchsorted(timestamps, upper, side="right" if include_upper else "left")
+        mask = np.zeros(self.size, dtype=bool)
+        mask[docnums[start:end]] = True
+        return mask
+
+
+class MetadataIndex(_MetadataIndexBase):
+    """
+    Incrementally built filter index over document metadata.
+
+    Categorical ``attributes`` get one packed bitmap (a bit per document)
+    per distinct value; ``date_attributes`` keep their timestamps sorted
+    alongside the document numbers so range filters are two binary
+    searches. Dates are appended at ingest and sorted into place at the
+    next lookup, so adding documents stays O(1) each.
+    """
+
+    def __init__(self, attributes: Optional[Iterable[str]] = None, date_attributes: Optional[Iterable[str]] = None):
+        self.attributes = list(settings.filter_attributes if attributes is None else attributes)
+        self.date_attributes = list(settings.filter_date_attributes if date_attributes is None else date_attributes)
+        self.size = 0
+        self._bitmaps: Dict[str, Dict[str, bytearray]] = {attribute: {} for attribute in self.attributes}
+        self._timestamps: Dict[str, array] = {attribute: array("d") for attribute in self.date_attributes}
+        self._docnums: Dict[str, array] = {attribute: array("I") for attribute in self.date_attributes}
+        # Length of the sorted prefix of each attribute's dates
+        self._sorted: Dict[str, int] = {attribute: 0 for attribute in self.date_attributes}
+
+    def add(self, docnum: int, metadata: Dict[str, Any]) -> None:
+        byte, bit = docnum >> 3, 1 << (docnum & 7)
+        for attribute in self.attributes:
+            for value in _values(metadata.get(attribute)):
+                bitmap = self._bitmaps[attribute].setdefault(value, bytearray())
+                if len(bitmap) <= byte:
+                    bitmap.extend(bytes(byte + 1 - len(bitmap)))
+                bitmap[byte] |= bit
+        for attribute in self.date_attributes:
+            timestamp = to_timestamp(metadata.get(attribute))
+            if timestamp is None:
+                continue
+            self._timestamps[attribute].append(timestamp)
+            self._docnums[attribute].append(docnum)
+        self.size = max(self.size, docnum + 1)
+
+    def _bitmap(self, attribute: str, value: str) -> Optional["np.ndarray"]:
+        import numpy as np
+        bitmap = self._bitmaps.get(attribute, {}).get(value)
+        return None if bitmap is None else np.frombuffer(bytes(bitmap), dtype=np.uint8)
+
+    def _dates(self, attribute: str):
+        import numpy as np
+        if attribute not in self._timestamps:
+            return np.empty(0), np.empty(0, dtype=np.uint32)
+        timestamps = np.frombuffer(self._timestamps[attribute], dtype=np.float64)
+        docnums = np.frombuffer(self._docnums[attribute], dtype=np.uint32)
+        done = self._sorted[attribute]
+        if done == len(timestamps):
+            return timestamps, docnums
+        # Sort the dates added since the last lookup and merge them into the
+        # sorted prefix; equal dates keep insertion order
+        tail = done + np.argsort(timestamps[done:], kind="stable")
+        positions = np.searchsorted(timestamps[:done], timestamps[tail], side="right") + np.arange(len(tail))
+        added = np.zeros(len(timestamps), dtype=bool)
+        added[positions] = True
+        merged_timestamps = np.empty_like(timestamps)
+        merged_docnums = np.empty_like(docnums)
+        merged_timestamps[positions], merged_docnums[positions] = timestamps[tail], docnums[tail]
+        merged_timestamps[~added], merged_docnums[~added] = timestamps[:done], docnums[:done]
+        self._timestamps[attribute] = array("d", merged_timestamps.tobytes())
+        self._docnums[attribute] = array("I", merged_docnums.tobytes())
+        self._sorted[attribute] = len(merged_timestamps)
+        return merged_timestamps, merged_docnums
+
+    def save(self, path: str) -> None:
+        """Write the index into a segment directory for ``StoredMetadataIndex``"""
+        import numpy as np
+        width = (self.size + 7) // 8
+        layout: Dict[str, Any] = {"size": self.size, "bitmaps": {}, "dates": []}
+        for i, attribute in enumerate(self.attributes):
+            values = sorted(self._bitmaps[attribute])
+            matrix = np.zeros((len(values), width), dtype=np.uint8)
+            for row, value in enumerate(values):
+                bitmap = self._bitmaps[attribute][value]
+                matrix[row, :len(bitmap)] = np.frombuffer(bytes(bitmap), dtype=np.uint8)
+            np.save(os.path.join(path, f"bitmaps_{i}.npy"), matrix)
+            layout["bitmaps"][attribute] = {"file": f"bitmaps_{i}.npy", "values": values}
+        for i, attribute in enumerate(self.date_attributes):
+            timestamps, docnums = self._dates(attribute)
+            np.save(os.path.join(path, f"dates_{i}.npy"), timestamps)
+            np.save(os.path.join(path, f"date_docs_{i}.npy"), docnums)
+            layout["dates"].append({"attribute": attribute, "timestamps": f"dates_{i}.npy", "docnums": f"date_docs_{i}.npy"})
+        with open(os.path.join(path, METADATA_FILE), "w") as f:
+            json.dump(layout, f)
+
+
+class StoredMetadataIndex(_MetadataIndexBase):
+    """Read-only, memory-mapped ``MetadataIndex`` saved in a segment directory"""
+
+    def __init__(self, path: str):
+        import numpy as np
+        with open(os.path.join(path, METADATA_FILE)) as f:
+            layout = json.load(f)
+        self.size = layout["size"]
+        self._bitmaps = {
+            attribute: (
+                {value: row for row, value in enumerate(entry["values"])},
+                np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+            )
+            for attribute, entry in layout["bitmaps"].items()
+        }
+        self._date_arrays = {
+            entry["attribute"]: (
+                np.load(os.path.join(path, entry["timestamps"]), mmap_mode="r"),
+                np.load(os.path.join(path, entry["docnums"]), mmap_mode="r")
+            )
+            for entry in layout["dates"]
+        }
+
+    def _bitmap(self, attribute: str, value: str) -> Optional["np.ndarray"]:
+        rows, matrix = self._bitmaps.get(attribute, ({}, None))
+        row = rows.get(value)
+        return None if row is None else matrix[row]
+
+    def _dates(self, attribute: str):
+        import numpy as np
+        return self._date_arrays.get(attribute, (np.empty(0), np.empty(0, dtype=np.uint32)))
+
+
+class Filter:
+    """Compiled filter expression; ``mask`` evaluates it against a metadata index"""
+
+    def mask(self, index: _MetadataIndexBase) -> "np.ndarray":
+        raise NotImplementedError
+
+
+class _Match(Filter):
+    def __init__(self, attribute: str, values: List[str], negate: bool = False):
+        self.attribute = attribute
+        self.values = values
+        self.negate = negate
+
+    def mask(self, index):
+        mask = index.match(self.attribute, self.values)
+        return ~mask if self.negate else mask
+
+
+class _Range(Filter):
+    def __init__(self, attribute: str, bounds: Dict[str, float]):
+        self.attribute = attribute
+        self.bounds = bounds
+
+    def mask(self, index):
+        lower = self.bounds.get("gte", self.bounds.get("gt"))
+        upper = self.bounds.get("lte", self.bounds.get("lt"))
+        return index.range(self.attribute, lower, upper, "gt" not in self.bounds, "lt" not in self.bounds)
+
+
+class _And(Filter):
+    def __init__(self, children: List[Filter]):
+        self.children = children
+
+    def mask(self, index):
+        import numpy as np
+        mask = np.ones(len(index), dtype=bool)
+        for child in self.children:
+            mask &= child.mask(index)
+            if not mask.any():
+                break
+        return mask
+
+
+class _Or(Filter):
+    def __init__(self, children: List[Filter]):
+        self.children = children
+
+    def mask(self, index):
+        import numpy as np
+        mask = np.zeros(len(index), dtype=bool)
+        for child in self.children:
+            mask |= child.mask(index)
+        return mask
+
+
+class _Not(Filter):
+    def __init__(self, child: Filter):
+        self.child = child
+
+    def mask(self, index):
+        return ~self.child.mask(index)
+
+
+def parse_filter(
+    expression: Optional[Dict[str, Any]],
+    current_user: Optional[str] = None,
+    attributes: Optional[Iterable[str]] = None,
+    date_attributes: Optional[Iterable[str]] = None
+) -> Optional[Filter]:
+    """
+    Compile a filter expression. Fields are ANDed together::
+
+        {"type": "report"}                                  equality
+        {"file_type": ["pdf", "csv"]}                       any of
+        {"uploaded_by": {"ne": "$me"}}                      eq / ne / in
+        {"date": {"gte": "2024-01-01", "lt": "2024-02-01"}} date range
+        {"or": [{...}, {...}]}, {"not": {...}}              composition
+
+    ``$me`` stands for ``current_user``. Raises ValueError for attributes
+    that are not indexed and malformed expressions.
+    """
+    if not expression:
+        return None
+    attributes = set(settings.filter_attributes if attributes is None else attributes)
+    date_attributes = set(settings.filter_date_attributes if date_attributes is None else date_attributes)
+
+    def value(item: Any) -> str:
+        if item == CURRENT_USER:
+            if current_user is None:
+                raise ValueError(f"{CURRENT_USER} needs an authenticated user")
+            return current_user
+        if isinstance(item, (dict, list)):
+            raise ValueError(f"Invalid filter value: {item!r}")
+        return str(item)
+
+    def field(attribute: str, condition: Any) -> Filter:
+        if attribute in date_attributes:
+            if not isinstance(condition, dict) or not condition or set(condition) - set(RANGE_OPERATORS):
+                raise ValueError(f"Date filter on {attribute} needs gt/gte/lt/lte bounds")
+            bounds = {}
+            for operator, bound in condition.items():
+                timestamp = to_timestamp(bound)
+                if timestamp is None:
+                    raise ValueError(f"Invalid date for {attribute}: {bound!r}")
+                bounds[operator] = timestamp
+            if ("gt" in bounds and "gte" in bounds) or ("lt" in bounds and "lte" in bounds):
+                raise ValueError(f"Conflicting bounds for {attribute}")
+            return _Range(attribute, bounds)
+        if attribute not in attributes:
+            raise ValueError(f"Cannot filter on {attribute}")
+        if isinstance(condition, list):
+            return _Match(attribute, [value(item) for item in condition])
+        if not isinstance(condition, dict):
+            return _Match(attribute, [value(condition)])
+        children: List[Filter] = []
+        for operator, operand in condition.items():
+            if operator == "eq":
+                children.append(_Match(attribute, [value(operand)]))
+            elif operator == "ne":
+                children.append(_Match(attribute, [value(operand)], negate=True))
+            elif operator == "in" and isinstance(operand, list):
+                children.append(_Match(attribute, [value(item) for item in operand]))
+            else:
+                raise ValueError(f"Unsupported filter on {attribute}: {operator}")
+        return children[0] if len(children) == 1 else _And(children)
+
+    def node(expr: Any) -> Filter:
+        if not isinstance(expr, dict) or not expr:
+            raise ValueError("Filter must be a non-empty object")
+        children: List[Filter] = []
+        for key, condition in expr.items():
+            if key in ("and", "or"):
+                if not isinstance(condition, list) or not condition:
+                    raise ValueError(f"'{key}' takes a non-empty list of filters")
+                parts = [node(child) for child in condition]
+                children.append(_And(parts) if key == "and" else _Or(parts))
+            elif key == "not":
+                children.append(_Not(node(condition)))
+            else:
+                children.append(field(key, condition))
+        return children[0] if len(children) == 1 else _And(children)
+
+    return node(expression)
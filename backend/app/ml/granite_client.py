@@ -2,6 +2,7 @@ import httpx
 import asyncio
 from typing import Optional, Dict, Any, List
 from ..core.config import settings
+from ..core.metrics import timed
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,8 +12,20 @@ class GraniteClient:
     def __init__(self):
         self.api_key = settings.granite_api_key
         self.api_url = settings.granite_api_url
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self._client: Optional[httpx.AsyncClient] = None
     
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so importing this module stays cheap
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        return self._client
+    
+    @client.setter
+    def client(self, value: httpx.AsyncClient) -> None:
+        self._client = value
+    
+    @timed("granite.speech_to_text")
     async def speech_to_text(self, audio_data: bytes, language: str = "en-US") -> Dict[str, Any]:
         """
         Convert speech to text using Granite ASR
@@ -53,6 +66,7 @@ class GraniteClient:
                 "duration": 0.0
             }
     
+    @timed("granite.generate_text")
     async def generate_text(self, prompt: str, max_tokens: int = 150) -> Dict[str, Any]:
         """
         Generate text using Granite Instruct model
@@ -94,6 +108,7 @@ class GraniteClient:
                 "model": "granite-instruct-error"
             }
     
+    @timed("granite.create_embeddings")
     async def create_embeddings(self, texts: List[str]) -> Dict[str, Any]:
         """
         Create embeddings using Granite embedding model
@@ -136,7 +151,9 @@ class GraniteClient:
             }
     
     async def close(self):
-        await self.client.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 
 # Global client instance
@@ -0,0 +1,274 @@
+import os
+from typing import TYPE_CHECKING, Dict, Optional
+import logging
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CODEC_FILE = "codec.npz"
+
+# Rows converted to float32 at a time while scoring, bounding temporaries
+SCORE_BLOCK_ROWS = 16384
+
+
+class EmbeddingCodec:
+    """
+    Compressed storage for L2-normalized embeddings. ``score`` returns the
+    (queries x vectors) inner products computed from the codes directly.
+    """
+
+    name = ""
+    dtype = "float32"
+    trained = True
+
+    def fit(self, vectors: "np.ndarray") -> None:
+        self.trained = True
+
+    def code_size(self, dimension: int) -> int:
+        """Code width in elements of ``dtype`` for one vector"""
+        return dimension
+
+    def encode(self, vectors: "np.ndarray") -> "np.ndarray":
+        raise NotImplementedError
+
+    def decode(self, codes: "np.ndarray") -> "np.ndarray":
+        raise NotImplementedError
+
+    def score(self, queries: "np.ndarray", codes: "np.ndarray") -> "np.ndarray":
+        import numpy as np
+        prepared = self._prepare(queries)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            block = codes[start:start + SCORE_BLOCK_ROWS]
+            scores[:, start:start + len(block)] = self._score_block(prepared, block)
+        return scores
+
+    def _prepare(self, queries: "np.ndarray"):
+        """Per-query work shared by every block of codes"""
+        return queries
+
+    def _score_block(self, prepared, codes: "np.ndarray") -> "np.ndarray":
+        return prepared @ self.decode(codes).T
+
+    def state(self) -> Dict[str, "np.ndarray"]:
+        """Trained parameters, saved next to the codes"""
+        return {}
+
+    def load_state(self, state: Dict[str, "np.ndarray"]) -> None:
+        self.trained = True
+
+
+class Float32Codec(EmbeddingCodec):
+    """Uncompressed, 4 bytes per dimension"""
+
+    name = "float32"
+
+    def encode(self, vectors):
+        import numpy as np
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def decode(self, codes):
+        import numpy as np
+        return np.asarray(codes, dtype=np.float32)
+
+    def score(self, queries, codes):
+        return queries @ codes.T
+
+
+class Float16Codec(EmbeddingCodec):
+    """
+    Half precision, 2 bytes per dimension; effectively lossless for ranking,
+    but scoring pays for converting each block back to float32
+    """
+
+    name = "float16"
+    dtype = "float16"
+
+    def encode(self, vectors):
+        import numpy as np
+        return np.asarray(vectors, dtype=np.float16)
+
+    def decode(self, codes):
+        import numpy as np
+        return np.asarray(codes, dtype=np.float32)
+
+
+class Int8Codec(EmbeddingCodec):
+    """
+    Per-dimension scalar quantization, 1 byte per dimension. Each dimension
+    is mapped linearly from its trained [min, max] onto 256 levels.
+    """
+
+    name = "int8"
+    dtype = "int8"
+    trained = False
+
+    def __init__(self):
+        self.minimum: Optional["np.ndarray"] = None
+        self.scale: Optional["np.ndarray"] = None
+
+    def fit(self, vectors):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.minimum = vectors.min(axis=0)
+        scale = (vectors.max(axis=0) - self.minimum) / 255.0
+        self.scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+        self.trained = True
+
+    def encode(self, vectors):
+        import numpy as np
+        levels = np.rint((np.asarray(vectors, dtype=np.float32) - self.minimum) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes):
+        import numpy as np
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.minimum
+
+    def _prepare(self, queries):
+        # q.x = (q * scale).code + q.(min + 128 * scale): one multiply on the raw codes
+        return queries * self.scale, queries @ (self.minimum + 128.0 * self.scale)
+
+    def _score_block(self, prepared, codes):
+        import numpy as np
+        scaled, offset = prepared
+        return scaled @ codes.astype(np.float32).T + offset[:, None]
+
+    def state(self):
+        return {"minimum": self.minimum, "scale": self.scale}
+
+    def load_state(self, state):
+        self.minimum = state["minimum"]
+        self.scale = state["scale"]
+        self.trained = True
+
+
+def kmeans(points: "np.ndarray", k: int, iterations: int = 15, seed: int = 0) -> "np.ndarray":
+    """Lloyd's k-means; returns (k x dimension) centroids"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    centroids = points[rng.choice(len(points), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(points, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([
+            np.bincount(assignment, weights=points[:, d], minlength=k) for d in range(points.shape[1])
+        ], axis=1)
+        filled = counts > 0
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def _nearest(points: "np.ndarray", centroids: "np.ndarray") -> "np.ndarray":
+    distances = (centroids ** 2).sum(axis=1) - 2 * points @ centroids.T
+    return distances.argmin(axis=1)
+
+
+class ProductQuantizer(EmbeddingCodec):
+    """
+    Product quantization: vectors are split into ``subspaces`` chunks, each
+    replaced by the index of its nearest of 256 trained centroids, so a
+    vector costs one byte per subspace. Queries are scored asymmetrically:
+    a (subspaces x 256) table of query-chunk/centroid products is built
+    once per query and each vector's score is a sum of table lookups.
+    """
+
+    name = "pq"
+    dtype = "uint8"
+    trained = False
+
+    def __init__(self, subspaces: int = 96, train_size: int = 16384, iterations: int = 15):
+        self.subspaces = subspaces
+        self.train_size = train_size
+        self.iterations = iterations
+        self.centroids: Optional["np.ndarray"] = None  # (subspaces, k, dimension / subspaces)
+
+    def code_size(self, dimension: int) -> int:
+        return self.subspaces
+
+    def fit(self, vectors):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dimension = vectors.shape[1]
+        # Subspaces must split the dimension evenly
+        self.subspaces = max(1, min(self.subspaces, dimension))
+        while dimension % self.subspaces:
+            self.subspaces -= 1
+        if len(vectors) > self.train_size:
+            sample = np.random.default_rng(0).choice(len(vectors), size=self.train_size, replace=False)
+            vectors = vectors[sample]
+        k = min(256, len(vectors))
+        chunks = vectors.reshape(len(vectors), self.subspaces, -1)
+        self.centroids = np.stack([
+            kmeans(chunks[:, j], k, self.iterations, seed=j) for j in range(self.subspaces)
+        ]).astype(np.float32)
+        self.trained = True
+
+    def encode(self, vectors):
+        import numpy as np
+        vectors = np.asarray(vectors, dtype=np.float32)
+        chunks = vectors.reshape(len(vectors), self.subspaces, -1)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+            for j in range(self.subspaces):
+                codes[start:start + SCORE_BLOCK_ROWS, j] = _nearest(chunks[start:start + SCORE_BLOCK_ROWS, j], self.centroids[j])
+        return codes
+
+    def decode(self, codes):
+        import numpy as np
+        return np.concatenate([self.centroids[j][codes[:, j]] for j in range(self.subspaces)], axis=1)
+
+    def _prepare(self, queries):
+        import numpy as np
+        # (queries, subspaces, k) lookup tables
+        return np.einsum("qjd,jkd->qjk", queries.reshape(len(queries), self.subspaces, -1), self.centroids)
+
+    def _score_block(self, tables, codes):
+        import numpy as np
+        scores = np.zeros((len(tables), len(codes)), dtype=np.float32)
+        for j in range(self.subspaces):
+            scores += tables[:, j, codes[:, j]]
+        return scores
+
+    def state(self):
+        return {"centroids": self.centroids}
+
+    def load_state(self, state):
+        self.centroids = state["centroids"]
+        self.subspaces = self.centroids.shape[0]
+        self.trained = True
+
+
+CODECS = {
+    "float32": Float32Codec,
+    "float16": Float16Codec,
+    "int8": Int8Codec,
+    "pq": ProductQuantizer,
+}
+
+
+def create_codec(name: str, pq_subspaces: int = 96) -> EmbeddingCodec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown embedding codec: {name}")
+    if name == "pq":
+        return ProductQuantizer(pq_subspaces)
+    return CODECS[name]()
+
+
+def save_codec(path: str, codec: EmbeddingCodec) -> None:
+    import numpy as np
+    np.savez(os.path.join(path, CODEC_FILE), name=np.array(codec.name), **codec.state())
+
+
+def load_codec(path: str) -> Optional[EmbeddingCodec]:
+    """Codec saved in a segment directory, or None for segments without one"""
+    import numpy as np
+    codec_path = os.path.join(path, CODEC_FILE)
+    if not os.path.exists(codec_path):
+        return None
+    with np.load(codec_path) as saved:
+        codec = CODECS[str(saved["name"])]()
+        codec.load_state({key: saved[key] for key in saved.files if key != "name"})
+    return codec
@@ -0,0 +1,410 @@
+import copy
+import os
+import re
+import threading
+from array import array
+from typing import TYPE_CHECKING, Any, Dict, Hashable, List, Optional, Sequence, Tuple, Union
+import logging
+from ..core.config import settings
+from .filters import Filter, MetadataIndex
+from .quantization import EmbeddingCodec, Float32Codec, create_codec
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keeps codes like "sku-1042" or "v2.3" together as single tokens; a dot
+# only joins digits, so "grew.The" is two words
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:(?:[-_]|(?<=[0-9])\.(?=[0-9]))[a-z0-9]+)*")
+PART_SEPARATOR = re.compile(r"[-_]")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def tokenize_filename(filename: str) -> List[str]:
+    """
+    Tokens of a filename: each compound in the stem ("contract_zx99"), its
+    parts ("contract", "zx99") and the extension ("csv")
+    """
+    stem, extension = os.path.splitext(filename)
+    tokens = tokenize(stem)
+    tokens += [part for token in tokens if PART_SEPARATOR.search(token) for part in PART_SEPARATOR.split(token) if part]
+    return tokens + tokenize(extension)
+
+
+def document_tokens(document: Dict[str, Any]) -> List[str]:
+    """Indexed tokens of a document dict: its filename followed by its content"""
+    return tokenize_filename(document.get("filename") or "") + tokenize(document.get("content") or "")
+
+
+class _Postings:
+    """Array-backed postings list: parallel doc numbers and term frequencies"""
+    __slots__ = ("docs", "freqs")
+
+    def __init__(self):
+        self.docs = array("I")
+        self.freqs = array("I")
+
+
+class InvertedIndex:
+    """
+    Incrementally built inverted index with BM25 scoring.
+
+    Documents get increasing internal numbers, so appending keeps every
+    postings list sorted. Scoring is vectorized over each query term's
+    postings with NumPy.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, _Postings] = {}
+        self._doc_lengths = array("I")
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(self, docnum: int, text: Union[str, List[str]]) -> None:
+        """Index ``text``, or a list of tokens that were already extracted"""
+        if docnum != len(self._doc_lengths):
+            raise ValueError("Documents must be added in docnum order")
+        tokens = tokenize(text) if isinstance(text, str) else text
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, freq in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.docs.append(docnum)
+            postings.freqs.append(freq)
+        self._doc_lengths.append(len(tokens))
+        self._total_length += len(tokens)
+
+    def scores(self, query: str, mask: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """
+        BM25 score of every document for ``query`` (0 where no term matches).
+        With a boolean ``mask`` only postings of allowed documents are scored.
+        """
+        import numpy as np
+        n_docs = len(self._doc_lengths)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not n_docs:
+            return scores
+        avg_length = self._total_length / n_docs or 1.0
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings.docs, dtype=np.uint32)
+            freqs = np.frombuffer(postings.freqs, dtype=np.uint32)
+            if mask is not None:
+                allowed = mask[docs]
+                docs, freqs = docs[allowed], freqs[allowed]
+            freqs = freqs.astype(np.float32)
+            idf = np.log1p((n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_lengths[docs] / avg_length)
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+        return scores
+
+
+class VectorIndex:
+    """
+    Growable matrix of L2-normalized embeddings scored by cosine similarity.
+
+    Vectors are held compressed by ``codec`` and scored on the codes.
+    Codecs that need training (int8, pq) keep vectors as float32 until
+    ``train`` runs, which callers do once ``needs_training`` (``train_size``
+    vectors have arrived). Training works on a snapshot, so the owner's
+    lock is only needed for ``snapshot`` and ``install``, never for the fit.
+    """
+
+    def __init__(self, codec: Optional[EmbeddingCodec] = None, train_size: Optional[int] = None):
+        self.codec = codec or create_codec(settings.embedding_codec, settings.embedding_pq_subspaces)
+        self.train_size = settings.embedding_codec_train_size if train_size is None else train_size
+        self._float32 = Float32Codec()
+        self._matrix: Optional["np.ndarray"] = None
+        self._size = 0
+        self._row_docs = array("I")
+        self._doc_rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def _codec(self) -> EmbeddingCodec:
+        return self.codec if self.codec.trained else self._float32
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the stored codes"""
+        return 0 if self._matrix is None else self._matrix[:self._size].nbytes
+
+    def add(self, docnum: int, vector: Sequence[float]) -> None:
+        import numpy as np
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        code = self._codec.encode(vector[None, :])[0]
+        row = self._doc_rows.get(docnum)
+        if row is not None:
+            self._matrix[row] = code
+            return
+        if self._matrix is None:
+            self._matrix = np.empty((16, code.shape[0]), dtype=code.dtype)
+        elif self._size == self._matrix.shape[0]:
+            # Amortized doubling keeps incremental adds O(1)
+            grown = np.empty((self._size * 2, self._matrix.shape[1]), dtype=self._matrix.dtype)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size] = code
+        self._doc_rows[docnum] = self._size
+        self._row_docs.append(docnum)
+        self._size += 1
+
+    @property
+    def needs_training(self) -> bool:
+        return not self.codec.trained and self._size >= self.train_size
+
+    def snapshot(self) -> "np.ndarray":
+        """Copy of the float32 vectors stored so far, to train on"""
+        return self._matrix[:self._size].copy()
+
+    def fit(self, vectors: "np.ndarray") -> Tuple[EmbeddingCodec, "np.ndarray"]:
+        """Train a copy of the codec on ``vectors`` and encode them; touches no index state"""
+        codec = copy.deepcopy(self.codec)
+        codec.fit(vectors)
+        return codec, codec.encode(vectors)
+
+    def install(self, codec: EmbeddingCodec, snapshot: "np.ndarray", codes: "np.ndarray") -> None:
+        """Switch to the trained ``codec``; rows added or replaced since ``snapshot`` are encoded now"""
+        import numpy as np
+        if self.codec.trained:
+            return
+        matrix = np.empty((self._matrix.shape[0], codes.shape[1]), dtype=codes.dtype)
+        matrix[:len(codes)] = codes
+        current = self._matrix[:len(snapshot)]
+        stale = np.flatnonzero((current != snapshot).any(axis=1))
+        if len(stale):
+            matrix[stale] = codec.encode(current[stale])
+        if self._size > len(snapshot):
+            matrix[len(snapshot):self._size] = codec.encode(self._matrix[len(snapshot):self._size])
+        self.codec = codec
+        self._matrix = matrix
+        logger.info(f"Trained {codec.name} embedding codec on {len(snapshot)} vectors")
+
+    def train(self) -> None:
+        """Train and install in one step, for callers that need no lock"""
+        snapshot = self.snapshot()
+        codec, codes = self.fit(snapshot)
+        self.install(codec, snapshot, codes)
+
+    def vector(self, docnum: int) -> Optional["np.ndarray"]:
+        row = self._doc_rows.get(docnum)
+        return None if row is None else self._codec.decode(self._matrix[row:row + 1])[0]
+
+    def similarity(self, docnum: int, query: "np.ndarray") -> Optional[float]:
+        row = self._doc_rows.get(docnum)
+        return None if row is None else float(self._codec.score(query[None, :], self._matrix[row:row + 1])[0, 0])
+
+    def search(self, query: "np.ndarray", k: int, mask: Optional["np.ndarray"] = None) -> List[Tuple[int, float]]:
+        return self.search_batch(query[None, :], k, mask)[0]
+
+    def search_batch(
+        self,
+        queries: "np.ndarray",
+        k: int,
+        mask: Optional["np.ndarray"] = None
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Top ``k`` per row of a (queries x dimension) matrix, scored in one
+        multiply. With a boolean docnum ``mask`` only allowed rows are scored.
+        """
+        import numpy as np
+        if not self._size:
+            return [[] for _ in range(len(queries))]
+        row_docs = np.frombuffer(self._row_docs, dtype=np.uint32)[:self._size]
+        if mask is None:
+            rows = np.arange(self._size)
+            scores = self._codec.score(queries, self._matrix[:self._size])
+        else:
+            rows = np.flatnonzero(mask[row_docs])
+            scores = self._codec.score(queries, self._matrix[rows])
+        return [
+            [(int(row_docs[rows[i]]), float(row_scores[i])) for i in _top_k(row_scores, k)]
+            for row_scores in scores
+        ]
+
+
+def _top_k(scores: "np.ndarray", k: int) -> "np.ndarray":
+    """Indices of the ``k`` highest scores, best first"""
+    import numpy as np
+    if k <= 0 or not len(scores):
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def normalize_rows(vectors: Sequence[Sequence[float]]) -> "np.ndarray":
+    """L2-normalize each row as float32 (zero rows stay zero)"""
+    import numpy as np
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def reciprocal_rank_fusion(rankings: List[List[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Fuse ranked lists of document keys: score = sum of 1 / (k + rank)"""
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, docnum in enumerate(ranking, start=1):
+            fused[docnum] = fused.get(docnum, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever:
+    """
+    In-memory document store with BM25 and vector retrieval fused by
+    reciprocal rank fusion.
+
+    Documents become lexically searchable as soon as they are added; their
+    embeddings can arrive later via ``add_embedding``. The embedding codec
+    is trained in a background thread once enough embeddings have arrived;
+    until then vectors are served as float32.
+    """
+
+    def __init__(self, candidates: int = 50, rrf_k: int = 60):
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.documents: List[Dict[str, Any]] = []
+        self._docnums: Dict[str, int] = {}
+        self._lexical = InvertedIndex()
+        self._vectors = VectorIndex()
+        self._metadata = MetadataIndex()
+        self._lock = threading.RLock()
+        self._training: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def add_document(self, document: Dict[str, Any]) -> int:
+        """Index a document dict with ``id``, ``filename`` and ``content``"""
+        with self._lock:
+            docnum = self._docnums.get(document["id"])
+            if docnum is not None:
+                return docnum
+            docnum = len(self.documents)
+            self._lexical.add(docnum, document_tokens(document))
+            self._metadata.add(docnum, document.get("metadata") or {})
+            self.documents.append(document)
+            self._docnums[document["id"]] = docnum
+            return docnum
+
+    def add_embedding(self, doc_id: str, embedding: Sequence[float]) -> None:
+        self.add_embeddings([doc_id], [embedding])
+
+    def add_embeddings(self, doc_ids: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        with self._lock:
+            for doc_id, embedding in zip(doc_ids, embeddings):
+                docnum = self._docnums.get(doc_id)
+                if docnum is None:
+                    logger.warning(f"Embedding for unknown document {doc_id} ignored")
+                    continue
+                self._vectors.add(docnum, embedding)
+            if self._vectors.needs_training and self._training is None:
+                # k-means for pq takes seconds; searches keep using float32 meanwhile
+                self._training = threading.Thread(target=self._train_codec, daemon=True)
+                self._training.start()
+
+    def _train_codec(self) -> None:
+        try:
+            with self._lock:
+                snapshot = self._vectors.snapshot()
+            codec, codes = self._vectors.fit(snapshot)
+            with self._lock:
+                self._vectors.install(codec, snapshot, codes)
+        except Exception as e:
+            logger.error(f"Error training embedding codec: {e}")
+        finally:
+            with self._lock:
+                self._training = None
+
+    def search(
+        self,
+        query: str,
+        query_embedding: Optional[Sequence[float]] = None,
+        limit: int = 5,
+        with_embeddings: bool = False,
+        filters: Optional[Filter] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Top ``limit`` documents, each with ``similarity_score`` (cosine, when
+        the document has an embedding), ``lexical_score`` (BM25) and
+        ``fusion_score``. ``with_embeddings`` adds each document's normalized
+        ``embedding`` (None when it has not been embedded yet). ``filters``
+        restricts scoring to documents whose metadata matches.
+        """
+        query_embeddings = None if query_embedding is None else [query_embedding]
+        return self.search_batch([query], query_embeddings, limit, with_embeddings, filters)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+        limit: int = 5,
+        with_embeddings: bool = False,
+        filters: Optional[Filter] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """``search`` for many queries; the vector side is one matrix multiply"""
+        import numpy as np
+        with self._lock:
+            # Pre-filter: excluded documents are never scored
+            mask = None if filters is None else filters.mask(self._metadata)
+            if mask is not None and not mask.any():
+                return [[] for _ in queries]
+
+            query_matrix = None
+            vector_hits: List[List[Tuple[int, float]]] = [[] for _ in queries]
+            if query_embeddings is not None and len(self._vectors):
+                query_matrix = normalize_rows(query_embeddings)
+                vector_hits = self._vectors.search_batch(query_matrix, self.candidates, mask)
+
+            batch = []
+            for i, query in enumerate(queries):
+                lexical_scores = self._lexical.scores(query, mask)
+                matched = np.flatnonzero(lexical_scores)
+                top = _top_k(lexical_scores[matched], self.candidates)
+                rankings = [[int(docnum) for docnum in matched[top]]]
+                if query_matrix is not None:
+                    rankings.append([docnum for docnum, _ in vector_hits[i]])
+
+                results = []
+                for docnum, fusion_score in reciprocal_rank_fusion(rankings, self.rrf_k)[:limit]:
+                    similarity = None
+                    if query_matrix is not None:
+                        similarity = self._vectors.similarity(docnum, query_matrix[i])
+                    result = {
+                        **self.documents[docnum],
+                        "similarity_score": similarity if similarity is not None else 0.0,
+                        "lexical_score": float(lexical_scores[docnum]),
+                        "fusion_score": fusion_score
+                    }
+                    if with_embeddings:
+                        result["embedding"] = self._vectors.vector(docnum)
+                    results.append(result)
+                batch.append(results)
+            return batch
+
+
+# Global retriever instance
+retriever = HybridRetriever()
@@ -0,0 +1,494 @@
+import fcntl
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+from ..core.config import settings
+from .filters import METADATA_FILE, Filter, MetadataIndex, StoredMetadataIndex
+from .quantization import EmbeddingCodec, Float32Codec, create_codec, load_codec, save_codec
+from .retrieval import _top_k, document_tokens, normalize_rows, reciprocal_rank_fusion, tokenize
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+SEGMENTS_DIR = "segments"
+WRITER_LOCK = "writer.lock"
+
+
+def write_segment(
+    path: str,
+    documents: List[Dict[str, Any]],
+    embeddings: Sequence[Sequence[float]],
+    codec: Optional[EmbeddingCodec] = None
+) -> None:
+    """
+    Write an immutable segment directory: normalized vectors, their
+    compressed codes (``codec`` is trained on this segment's vectors), BM25
+    postings, metadata filter bitmaps and JSON document records, all as
+    flat files readers can memory-map.
+    """
+    import numpy as np
+
+    os.makedirs(path)
+    vectors = normalize_rows(embeddings)
+    np.save(os.path.join(path, "vectors.npy"), vectors)
+    if codec is not None and not isinstance(codec, Float32Codec):
+        codec.fit(vectors)
+        np.save(os.path.join(path, "codes.npy"), codec.encode(vectors))
+        save_codec(path, codec)
+
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    doc_lengths = []
+    metadata = MetadataIndex()
+    for docnum, document in enumerate(documents):
+        metadata.add(docnum, document.get("metadata") or {})
+        tokens = document_tokens(document)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for term, freq in counts.items():
+            postings.setdefault(term, []).append((docnum, freq))
+        doc_lengths.append(len(tokens))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    docs, freqs = [], []
+    for i, term in enumerate(terms):
+        for docnum, freq in postings[term]:
+            docs.append(docnum)
+            freqs.append(freq)
+        offsets[i + 1] = len(docs)
+    with open(os.path.join(path, "terms.json"), "w") as f:
+        json.dump(terms, f)
+    np.save(os.path.join(path, "term_offsets.npy"), offsets)
+    np.save(os.path.join(path, "postings_docs.npy"), np.asarray(docs, dtype=np.uint32))
+    np.save(os.path.join(path, "postings_freqs.npy"), np.asarray(freqs, dtype=np.uint32))
+    np.save(os.path.join(path, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.uint32))
+    metadata.save(path)
+
+    record_offsets = [0]
+    with open(os.path.join(path, "records.jsonl"), "wb") as f:
+        for document in documents:
+            line = json.dumps(document, default=str).encode() + b"\n"
+            f.write(line)
+            record_offsets.append(record_offsets[-1] + len(line))
+        f.flush()
+        os.fsync(f.fileno())
+    np.save(os.path.join(path, "record_offsets.npy"), np.asarray(record_offsets, dtype=np.int64))
+
+
+class Segment:
+    """Read-only, memory-mapped view of one segment directory"""
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.path = path
+        # Exact vectors stay on disk; only re-ranked candidates are paged in
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.codec = load_codec(path) or Float32Codec()
+        self.codes = self.vectors
+        if not isinstance(self.codec, Float32Codec):
+            self.codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy"), mmap_mode="r")
+        self.term_offsets = np.load(os.path.join(path, "term_offsets.npy"), mmap_mode="r")
+        self.postings_docs = np.load(os.path.join(path, "postings_docs.npy"), mmap_mode="r")
+        self.postings_freqs = np.load(os.path.join(path, "postings_freqs.npy"), mmap_mode="r")
+        self.record_offsets = np.load(os.path.join(path, "record_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "terms.json")) as f:
+            self.term_ids = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(path, "records.jsonl"), "rb") as f:
+            self._records = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._metadata: Optional[Any] = None
+        if os.path.exists(os.path.join(path, METADATA_FILE)):
+            self._metadata = StoredMetadataIndex(path)
+
+    @property
+    def metadata(self):
+        """Filter index; segments written before it existed build one from their records"""
+        if self._metadata is None:
+            metadata = MetadataIndex()
+            for docnum, record in enumerate(self.records()):
+                metadata.add(docnum, record.get("metadata") or {})
+            metadata.size = len(self)
+            self._metadata = metadata
+        return self._metadata
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def postings(self, term: str):
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            return None
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.postings_docs[start:end], self.postings_freqs[start:end]
+
+    def record(self, docnum: int) -> Dict[str, Any]:
+        start, end = self.record_offsets[docnum], self.record_offsets[docnum + 1]
+        return json.loads(self._records[start:end])
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for docnum in range(len(self)):
+            yield self.record(docnum)
+
+
+class SharedIndex:
+    """
+    Retrieval index shared by every worker process on a node.
+
+    Segments are immutable files that all workers memory-map, so the
+    operating system keeps one copy of the embeddings in the page cache no
+    matter how many workers run. Writers publish a segment by writing it
+    under a temporary name, renaming it into place and then atomically
+    replacing the manifest, all under an exclusive file lock. Readers poll
+    the manifest and map new segments without reloading old ones.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        poll_interval: float = 1.0,
+        merge_factor: int = 10,
+        max_merge_docs: int = 1000000,
+        codec: str = "float32",
+        pq_subspaces: int = 96,
+        rerank_factor: int = 4,
+        candidates: int = 50,
+        rrf_k: int = 60,
+        k1: float = 1.5,
+        b: float = 0.75
+    ):
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.merge_factor = max(merge_factor, 2)
+        self.max_merge_docs = max_merge_docs
+        self.codec = codec
+        self.pq_subspaces = pq_subspaces
+        self.rerank_factor = rerank_factor
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.k1 = k1
+        self.b = b
+        self.version = 0
+        self._segments: List[Segment] = []
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, SEGMENTS_DIR), exist_ok=True)
+
+    def __len__(self) -> int:
+        self.refresh()
+        return sum(len(segment) for segment in self._segments)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """Every document record, oldest segment first"""
+        self.refresh()
+        for segment in self._segments:
+            yield from segment.records()
+
+    # Reader side
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 0, "segments": []}
+
+    def refresh(self, force: bool = False) -> None:
+        """Pick up newly published segments (at most once per poll interval)"""
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.poll_interval:
+            return
+        self._checked_at = now
+        # The manifest is small; its version, unlike its mtime, changes on
+        # every publish however close together or however it was copied
+        manifest = self._read_manifest()
+        if manifest["version"] == self.version and not force:
+            return
+
+        with self._lock:
+            opened = {os.path.basename(segment.path): segment for segment in self._segments}
+            try:
+                segments = [
+                    opened.get(name) or Segment(os.path.join(self.directory, SEGMENTS_DIR, name))
+                    for name in manifest["segments"]
+                ]
+            except FileNotFoundError:
+                # Compacted away between reading the manifest and mapping; retry next poll
+                return
+            self._segments = segments
+            self.version = manifest["version"]
+        logger.info(f"Shared index at version {self.version} with {len(self._segments)} segments")
+
+    def _lexical_candidates(
+        self,
+        segments: List[Segment],
+        query: str,
+        masks: Optional[List["np.ndarray"]] = None
+    ) -> List[Tuple[Tuple[int, int], float]]:
+        import numpy as np
+
+        n_docs = sum(len(segment) for segment in segments)
+        if not n_docs:
+            return []
+        avg_length = sum(float(segment.doc_lengths.sum()) for segment in segments) / n_docs or 1.0
+        terms = set(tokenize(query))
+        # Document frequency across all segments, so scores are comparable
+        doc_freqs = {
+            term: sum(len(p[0]) for p in (s.postings(term) for s in segments) if p is not None)
+            for term in terms
+        }
+
+        candidates = []
+        for seg_index, segment in enumerate(segments):
+            mask = None if masks is None else masks[seg_index]
+            if mask is not None and not mask.any():
+                continue
+            scores = np.zeros(len(segment), dtype=np.float32)
+            for term in terms:
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                docs, freqs = postings
+                if mask is not None:
+                    allowed = mask[docs]
+                    docs, freqs = docs[allowed], freqs[allowed]
+                freqs = freqs.astype(np.float32)
+                df = doc_freqs[term]
+                idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * segment.doc_lengths[docs] / avg_length)
+                scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+            matched = np.flatnonzero(scores)
+            for docnum in matched[_top_k(scores[matched], self.candidates)]:
+                candidates.append((float(scores[docnum]), seg_index, int(docnum)))
+        candidates.sort(reverse=True)
+        return [((seg_index, docnum), score) for score, seg_index, docnum in candidates[:self.candidates]]
+
+    def _vector_candidates(
+        self,
+        segments: List[Segment],
+        query_matrix,
+        masks: Optional[List["np.ndarray"]] = None
+    ) -> List[List[Tuple[int, int]]]:
+        """
+        Top candidates per query row; one multiply per segment for the whole
+        batch. Compressed segments are scored on their codes and the best
+        ``rerank_factor`` x candidates are re-scored on the exact vectors.
+        """
+        import numpy as np
+
+        candidates: List[List[Tuple[float, int, int]]] = [[] for _ in range(len(query_matrix))]
+        for seg_index, segment in enumerate(segments):
+            if masks is None:
+                docnums = np.arange(len(segment))
+                scores = segment.codec.score(query_matrix, segment.codes)
+            else:
+                # Only the allowed rows are paged in and scored
+                docnums = np.flatnonzero(masks[seg_index])
+                if not len(docnums):
+                    continue
+                scores = segment.codec.score(query_matrix, segment.codes[docnums])
+            rerank = self.rerank_factor > 1 and not isinstance(segment.codec, Float32Codec)
+            shortlist = self.candidates * self.rerank_factor if rerank else self.candidates
+            for row, row_scores in enumerate(scores):
+                top = _top_k(row_scores, shortlist)
+                values, found = row_scores[top], docnums[top]
+                if rerank:
+                    values = np.asarray(segment.vectors[found]) @ query_matrix[row]
+                    keep = _top_k(values, self.candidates)
+                    values, found = values[keep], found[keep]
+                for value, docnum in zip(values, found):
+                    candidates[row].append((float(value), seg_index, int(docnum)))
+        ranked = []
+        for row_candidates in candidates:
+            row_candidates.sort(reverse=True)
+            ranked.append([(seg_index, docnum) for _, seg_index, docnum in row_candidates[:self.candidates]])
+        return ranked
+
+    def search(
+        self,
+        query: str,
+        query_embedding: Optional[Sequence[float]] = None,
+        limit: int = 5,
+        with_embeddings: bool = False,
+        filters: Optional[Filter] = None
+    ) -> List[Dict[str, Any]]:
+        """Same contract as ``HybridRetriever.search``"""
+        query_embeddings = None if query_embedding is None else [query_embedding]
+        return self.search_batch([query], query_embeddings, limit, with_embeddings, filters)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+        limit: int = 5,
+        with_embeddings: bool = False,
+        filters: Optional[Filter] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Same contract as ``HybridRetriever.search_batch``"""
+        import numpy as np
+
+        self.refresh()
+        segments = self._segments
+        masks = None if filters is None else [filters.mask(segment.metadata) for segment in segments]
+        query_matrix = None
+        vector_rankings: List[List[Tuple[int, int]]] = [[] for _ in queries]
+        if query_embeddings is not None and segments:
+            query_matrix = normalize_rows(query_embeddings)
+            vector_rankings = self._vector_candidates(segments, query_matrix, masks)
+
+        batch = []
+        for i, query in enumerate(queries):
+            lexical = dict(self._lexical_candidates(segments, query, masks))
+            rankings = [list(lexical)]
+            if query_matrix is not None:
+                rankings.append(vector_rankings[i])
+
+            results = []
+            for (seg_index, docnum), fusion_score in reciprocal_rank_fusion(rankings, self.rrf_k)[:limit]:
+                segment = segments[seg_index]
+                similarity = 0.0
+                if query_matrix is not None:
+                    similarity = float(segment.vectors[docnum] @ query_matrix[i])
+                result = {
+                    **segment.record(docnum),
+                    "similarity_score": similarity,
+                    "lexical_score": lexical.get((seg_index, docnum), 0.0),
+                    "fusion_score": fusion_score
+                }
+                if with_embeddings:
+                    result["embedding"] = np.array(segment.vectors[docnum])
+                results.append(result)
+            batch.append(results)
+        return batch
+
+    # Writer side
+
+    @contextmanager
+    def _writer(self):
+        with open(os.path.join(self.directory, WRITER_LOCK), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_manifest(self, segments: List[str], version: int) -> None:
+        tmp_path = os.path.join(self.directory, f".{MANIFEST}.{uuid.uuid4().hex}")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": version, "segments": segments}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, os.path.join(self.directory, MANIFEST))
+
+    def _new_segment(self, documents: List[Dict[str, Any]], embeddings: Sequence[Sequence[float]]) -> str:
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        segments_dir = os.path.join(self.directory, SEGMENTS_DIR)
+        tmp_path = os.path.join(segments_dir, f".tmp-{name}")
+        write_segment(tmp_path, documents, embeddings, create_codec(self.codec, self.pq_subspaces))
+        os.rename(tmp_path, os.path.join(segments_dir, name))
+        return name
+
+    def publish(self, documents: List[Dict[str, Any]], embeddings: Sequence[Sequence[float]]) -> None:
+        """Publish documents and their embeddings as a new segment"""
+        if not documents:
+            return
+        with self._writer():
+            manifest = self._read_manifest()
+            name = self._new_segment(documents, embeddings)
+            self._write_manifest(manifest["segments"] + [name], manifest["version"] + 1)
+            self._merge_locked()
+        self.refresh(force=True)
+
+    def compact(self) -> None:
+        """Merge all segments into one (rewrites the whole corpus; an admin operation)"""
+        with self._writer():
+            manifest = self._read_manifest()
+            if len(manifest["segments"]) > 1:
+                self._merge_segments(manifest, manifest["segments"])
+        self.refresh(force=True)
+
+    def _tier(self, size: int) -> int:
+        """Segments within a factor of ``merge_factor`` in size share a tier"""
+        tier = 0
+        while size >= self.merge_factor:
+            size //= self.merge_factor
+            tier += 1
+        return tier
+
+    def _merge_candidates(self, names: List[str]) -> Optional[List[str]]:
+        """``merge_factor`` segments of the smallest full tier, or None"""
+        import numpy as np
+
+        segments_dir = os.path.join(self.directory, SEGMENTS_DIR)
+        tiers: Dict[int, List[str]] = {}
+        for name in names:
+            # Reads only the .npy header
+            size = len(np.load(os.path.join(segments_dir, name, "doc_lengths.npy"), mmap_mode="r"))
+            if size < self.max_merge_docs:
+                tiers.setdefault(self._tier(size), []).append(name)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.merge_factor:
+                return tiers[tier][:self.merge_factor]
+        return None
+
+    def _merge_locked(self) -> None:
+        """
+        Tiered merging: whenever ``merge_factor`` segments of similar size
+        exist they are merged into one segment of the next tier, so each
+        document is rewritten about log(N) times in total and large
+        segments are left alone by small publishes. Segments of
+        ``max_merge_docs`` documents or more are never merged again.
+        """
+        while True:
+            manifest = self._read_manifest()
+            names = self._merge_candidates(manifest["segments"])
+            if names is None:
+                return
+            self._merge_segments(manifest, names)
+
+    def _merge_segments(self, manifest: Dict[str, Any], names: List[str]) -> None:
+        import numpy as np
+
+        segments_dir = os.path.join(self.directory, SEGMENTS_DIR)
+        documents, vectors = [], []
+        for name in names:
+            segment = Segment(os.path.join(segments_dir, name))
+            documents.extend(segment.records())
+            vectors.append(np.asarray(segment.vectors))
+        merged = self._new_segment(documents, np.concatenate(vectors))
+        # The merged segment takes the place of the oldest one it replaces
+        segments = []
+        for name in manifest["segments"]:
+            if name == names[0]:
+                segments.append(merged)
+            elif name not in names:
+                segments.append(name)
+        self._write_manifest(segments, manifest["version"] + 1)
+        # Readers that still map old segments keep working: unlinked files
+        # stay valid until their mappings are closed
+        for old in names:
+            shutil.rmtree(os.path.join(segments_dir, old), ignore_errors=True)
+        logger.info(f"Merged {len(names)} segments ({len(documents)} documents) into {merged}")
+
+
+# Global shared index, enabled by settings.shared_index_dir
+shared_index = SharedIndex(
+    settings.shared_index_dir,
+    poll_interval=settings.shared_index_poll_interval,
+    merge_factor=settings.shared_index_merge_factor,
+    max_merge_docs=settings.shared_index_max_merge_docs,
+    codec=settings.embedding_codec,
+    pq_subspaces=settings.embedding_pq_subspaces,
+    rerank_factor=settings.embedding_rerank_factor
+) if settings.shared_index_dir else None
@@ -0,0 +1,21 @@
+import logging
+import time
+from .anomaly import anomaly_detector
+from .granite_client import granite_client
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up() -> None:
+    """
+    Import heavy dependencies and build lazily created clients ahead of the
+    first request. Optional: everything here also happens on first use.
+    """
+    start_time = time.time()
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    import pdfminer.high_level  # noqa: F401
+    anomaly_detector.scaler
+    anomaly_detector.isolation_forest
+    granite_client.client
+    logger.info(f"Warm-up completed in {time.time() - start_time:.2f}s")
@@ -20,6 +20,26 @@ class ParsedDocument(BaseModel):
     word_count: Optional[int] = None
 
 
+class BulkParseResult(BaseModel):
+    filename: str
+    status: str  # "ok" or "error"
+    document: Optional[ParsedDocument] = None
+    error: Optional[str] = None
+    status_code: Optional[int] = None
+
+
+class DuplicateGroup(BaseModel):
+    canonical_id: str
+    duplicate_ids: List[str]
+
+
+class DedupRescanResponse(BaseModel):
+    scanned: int
+    duplicates: int
+    duplication_rate: float
+    groups: List[DuplicateGroup]
+
+
 class ASRRequest(BaseModel):
     audio_file_url: Optional[str] = None
     language: str = "en-US"
@@ -30,12 +50,17 @@ class ASRResponse(BaseModel):
     confidence: float
     duration: Optional[float] = None
     language: str
+    # Set when the audio was pre-processed (WAV input)
+    original_duration: Optional[float] = None
+    processed_duration: Optional[float] = None
 
 
 class QueryRequest(BaseModel):
     question: str
     context_limit: int = 5
     include_sources: bool = True
+    # Metadata filter expression, e.g. {"type": "report", "uploaded_by": "$me"}
+    filters: Optional[Dict[str, Any]] = None
 
 
 class QueryResponse(BaseModel):
@@ -45,6 +70,21 @@ class QueryResponse(BaseModel):
     processing_time: float
 
 
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
+    context_limit: int = 5
+    include_sources: bool = True
+    filters: Optional[Dict[str, Any]] = None
+
+
+class BatchQueryResult(BaseModel):
+    index: int  # position of the question in the request
+    question: str
+    status: str  # "ok" or "error"
+    response: Optional[QueryResponse] = None
+    error: Optional[str] = None
+
+
 class AnomalyAlert(BaseModel):
     id: str
     document_id: str
@@ -56,9 +96,27 @@ class AnomalyAlert(BaseModel):
     metadata: Dict[str, Any]
 
 
+class LatencySummary(BaseModel):
+    count: int
+    mean: float
+    p50: float
+    p95: float
+    p99: float
+    max: float
+
+
+class StatsBucket(BaseModel):
+    start: datetime
+    counters: Dict[str, int]
+    latency: Dict[str, LatencySummary]
+
+
 class DashboardStats(BaseModel):
     total_documents: int
     total_queries: int
     avg_processing_time: float
     anomalies_detected: int
-    last_processed: Optional[datetime] = None
\ No newline at end of file
+    last_processed: Optional[datetime] = None
+    latency: Dict[str, LatencySummary] = {}
+    series: Optional[List[StatsBucket]] = None
+    corpus: Dict[str, Any] = {}  # aggregates over the feature store
\ No newline at end of file
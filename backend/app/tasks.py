@@ -1,9 +1,16 @@
+import asyncio
 from celery import Celery
+from celery.signals import worker_process_init
+from kombu import Queue
 from typing import List, Dict, Any
 import logging
 from .core.config import settings
+from .core.storage import storage
 from .ml.anomaly import anomaly_detector
+from .ml.features import feature_store
 from .ml.granite_client import granite_client
+from .ml.shared_index import shared_index
+from .ml.warmup import warm_up
 
 logger = logging.getLogger(__name__)
 
@@ -14,22 +21,72 @@ celery_app = Celery(
     backend=settings.redis_url
 )
 
+# One queue per workload so long batch and audio jobs never sit in front of
+# interactive ingestion; run dedicated workers per queue (docker-compose.yml)
+QUEUE_INGEST = "ingest"
+QUEUE_REEMBED = "reembed"
+QUEUE_AUDIO = "audio"
+QUEUE_BATCH = "batch"
+
+# Redis transport pops lower numbers first
+PRIORITY_HIGH = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_LOW = 9
+
 celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
+    task_queues=[
+        Queue(name, routing_key=name)
+        for name in (QUEUE_INGEST, QUEUE_REEMBED, QUEUE_AUDIO, QUEUE_BATCH)
+    ],
+    task_default_queue=QUEUE_INGEST,
+    task_routes={
+        "app.tasks.create_embeddings_task": {"queue": QUEUE_INGEST},
+        "app.tasks.process_audio_task": {"queue": QUEUE_AUDIO},
+        "app.tasks.process_documents_batch": {"queue": QUEUE_BATCH},
+        "app.tasks.expire_uploads": {"queue": QUEUE_BATCH},
+        "app.tasks.rescore_anomalies": {"queue": QUEUE_BATCH},
+    },
+    task_default_priority=PRIORITY_DEFAULT,
+    broker_transport_options={
+        "queue_order_strategy": "priority",
+        "priority_steps": list(range(10)),
+        "sep": ":",
+    },
+    # Long tasks: take one message at a time and acknowledge only when done,
+    # so a busy worker does not hoard queued work and a crash requeues it
+    worker_prefetch_multiplier=settings.celery_prefetch_multiplier,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_max_memory_per_child=settings.celery_max_memory_per_child,
+    result_expires=settings.celery_result_expires,
     beat_schedule={
         "process-documents-hourly": {
             "task": "app.tasks.process_documents_batch",
             "schedule": 3600.0,  # Every hour
+            "options": {"priority": PRIORITY_LOW},
+        },
+        "expire-uploads-hourly": {
+            "task": "app.tasks.expire_uploads",
+            "schedule": 3600.0,  # Every hour
+            "options": {"priority": PRIORITY_LOW},
         },
     },
 )
 
 
-@celery_app.task
+@worker_process_init.connect
+def warm_up_worker(**kwargs):
+    """Load heavy dependencies in each worker process before it takes tasks"""
+    if settings.warmup_on_startup:
+        warm_up()
+
+
+@celery_app.task(soft_time_limit=1800, time_limit=1900)
 def process_documents_batch():
     """
     Background task to process documents and detect anomalies
@@ -82,18 +139,27 @@ def process_documents_batch():
         raise
 
 
-@celery_app.task
+@celery_app.task(soft_time_limit=60, time_limit=90)
 def create_embeddings_task(documents: List[Dict[str, Any]]):
     """
-    Background task to create document embeddings
+    Background task to embed retrieval records and publish them to the
+    shared index, which every API worker reads
     """
+    if shared_index is None:
+        # The API's in-process retriever is out of this worker's reach
+        raise ValueError("create_embeddings_task needs SHARED_INDEX_DIR shared with the API workers")
+    from .api.parse import embed_documents
+    
+    async def embed():
+        try:
+            await embed_documents(documents)
+        finally:
+            # The HTTP client belongs to this task's event loop
+            await granite_client.close()
+    
     try:
         logger.info(f"Creating embeddings for {len(documents)} documents")
-        
-        texts = [doc["content"][:1000] for doc in documents]  # Limit text length
-        
-        # This would be async in real implementation
-        # For demo, we'll just log the action
+        asyncio.run(embed())
         logger.info("Embeddings created successfully")
         
         return {"documents_processed": len(documents)}
@@ -103,7 +169,18 @@ def create_embeddings_task(documents: List[Dict[str, Any]]):
         raise
 
 
-@celery_app.task
+def enqueue_embeddings(documents: List[Dict[str, Any]], backfill: bool = False):
+    """
+    Queue embedding work. Uploads a user is waiting on go to the ingest
+    queue at high priority; re-embedding backfills go to their own queue
+    at low priority so they never delay interactive ingestion.
+    """
+    if backfill:
+        return create_embeddings_task.apply_async((documents,), queue=QUEUE_REEMBED, priority=PRIORITY_LOW)
+    return create_embeddings_task.apply_async((documents,), queue=QUEUE_INGEST, priority=PRIORITY_HIGH)
+
+
+@celery_app.task(soft_time_limit=600, time_limit=660)
 def process_audio_task(audio_file_path: str, language: str = "en-US"):
     """
     Background task to process audio files
@@ -124,4 +201,40 @@ def process_audio_task(audio_file_path: str, language: str = "en-US"):
         
     except Exception as e:
         logger.error(f"Error processing audio: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+@celery_app.task(soft_time_limit=600, time_limit=660, ignore_result=True)
+def expire_uploads():
+    """
+    Background task to delete uploads older than the retention period
+    """
+    if settings.upload_retention_days is None:
+        return {"expired": 0}
+    try:
+        expired = storage.expire(settings.upload_retention_days * 86400)
+        return {"expired": expired}
+        
+    except Exception as e:
+        logger.error(f"Error expiring uploads: {e}")
+        raise
+
+
+@celery_app.task(soft_time_limit=1800, time_limit=1900)
+def rescore_anomalies(refit: bool = True):
+    """
+    Background task to re-score the whole corpus from the feature store,
+    e.g. after the anomaly model changes; no document is re-parsed
+    """
+    if not feature_store.path:
+        # An in-memory store in a worker only holds what that worker ingested
+        raise ValueError("rescore_anomalies needs FEATURE_STORE_PATH shared with the API workers")
+    try:
+        results = anomaly_detector.rescore_store(refit=refit)
+        anomalies = sum(1 for result in results if result["is_anomaly"])
+        logger.info(f"Re-scored {len(results)} documents, {anomalies} anomalies")
+        return {"processed": len(results), "anomalies": anomalies}
+        
+    except Exception as e:
+        logger.error(f"Error re-scoring anomalies: {e}")
+        raise
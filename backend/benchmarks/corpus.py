@@ -0,0 +1,114 @@
+"""
+Synthetic corpus generators for the benchmark suite.
+
+All generators are seeded so a given size produces the same bytes on
+every run, which keeps results comparable across commits.
+"""
+import io
+import random
+from typing import List
+
+VOCABULARY = [
+    "report", "quarterly", "revenue", "growth", "analysis", "customer", "product",
+    "market", "strategy", "performance", "document", "processing", "machine",
+    "learning", "model", "pipeline", "latency", "throughput", "invoice", "contract",
+    "compliance", "review", "summary", "forecast", "budget", "operations", "risk",
+    "security", "deployment", "integration", "metrics", "dashboard", "anomaly",
+]
+
+
+def make_words(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [rng.choice(VOCABULARY) for _ in range(count)]
+
+
+def make_text(words: int, seed: int = 0, words_per_line: int = 12) -> str:
+    tokens = make_words(words, seed)
+    lines = [
+        " ".join(tokens[i:i + words_per_line]).capitalize() + "."
+        for i in range(0, len(tokens), words_per_line)
+    ]
+    return "\n".join(lines)
+
+
+def make_csv(rows: int, columns: int = 6, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    header = ["id"] + [f"col_{i}" for i in range(1, columns)]
+    out = io.StringIO()
+    out.write(",".join(header) + "\n")
+    for row in range(rows):
+        values = [str(row)] + [
+            rng.choice(VOCABULARY) if i % 2 else f"{rng.random() * 1000:.3f}"
+            for i in range(1, columns)
+        ]
+        out.write(",".join(values) + "\n")
+    return out.getvalue().encode()
+
+
+def make_pdf(pages: int, words_per_page: int = 300, seed: int = 0) -> bytes:
+    """Build a minimal text-only PDF that pdfminer can extract"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once page object ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for page in range(pages):
+        lines = make_text(words_per_page, seed=seed * 100003 + page).split("\n")
+        stream = "BT /F1 10 Tf 50 780 Td 12 TL\n"
+        stream += "\n".join(f"({line}) '" for line in lines[:60])
+        stream += "\nET"
+        content = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_documents(count: int, words: int = 400, seed: int = 0) -> List[dict]:
+    """Parsed-document dicts shaped like the parse endpoint's output"""
+    return [
+        {
+            "file_id": f"doc_{i}",
+            "filename": f"document_{i}.txt",
+            "content": make_text(words, seed=seed * 100003 + i),
+        }
+        for i in range(count)
+    ]
+
+
+def make_embeddings(count: int, dimension: int = 768, rank: int = 64, noise: float = 0.1, seed: int = 0):
+    """
+    L2-normalized float32 vectors with low intrinsic dimension, like real
+    text embeddings: a random ``rank``-dimensional latent projected up to
+    ``dimension`` plus isotropic noise
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    basis = rng.standard_normal((rank, dimension)).astype(np.float32) / np.sqrt(rank)
+    vectors = np.empty((count, dimension), dtype=np.float32)
+    for start in range(0, count, 65536):
+        rows = min(65536, count - start)
+        block = rng.standard_normal((rows, rank)).astype(np.float32) @ basis
+        block += noise * rng.standard_normal((rows, dimension)).astype(np.float32) / np.sqrt(dimension)
+        vectors[start:start + rows] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
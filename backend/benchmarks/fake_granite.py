@@ -0,0 +1,72 @@
+"""
+Local stand-in for the Granite API used by the end-to-end benchmarks.
+
+Responses are deterministic and an optional fixed delay models upstream
+latency, so end-to-end numbers measure this service rather than the
+network.
+"""
+import asyncio
+import hashlib
+from contextlib import contextmanager
+import httpx
+import numpy as np
+from fastapi import FastAPI, Request
+
+EMBEDDING_DIMENSION = 768
+
+
+def create_fake_granite_app(latency: float = 0.0) -> FastAPI:
+    fake = FastAPI()
+
+    async def _wait():
+        if latency:
+            await asyncio.sleep(latency)
+
+    @fake.post("/embeddings")
+    async def embeddings(request: Request):
+        await _wait()
+        texts = (await request.json())["texts"]
+        vectors = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=4).digest(), "little")
+            vectors.append(np.random.default_rng(seed).random(EMBEDDING_DIMENSION).tolist())
+        return {"embeddings": vectors, "model": "granite-embeddings-fake", "dimension": EMBEDDING_DIMENSION}
+
+    @fake.post("/instruct")
+    async def instruct(request: Request):
+        await _wait()
+        payload = await request.json()
+        return {
+            "generated_text": f"Fake answer for a {len(payload['prompt'])} character prompt",
+            "tokens_used": min(payload.get("max_tokens", 150), 64),
+            "model": "granite-instruct-fake",
+        }
+
+    @fake.post("/asr")
+    async def asr(request: Request):
+        await _wait()
+        audio = await request.body()
+        return {
+            "transcript": "fake transcript",
+            "confidence": 0.99,
+            "language": request.query_params.get("language", "en-US"),
+            "duration": len(audio) / 32000,
+        }
+
+    return fake
+
+
+@contextmanager
+def fake_granite(client, latency: float = 0.0):
+    """Route a ``GraniteClient`` to an in-process fake Granite server"""
+    saved = (client.api_key, client.api_url, client.client)
+    client.api_key = "benchmark"
+    client.api_url = "http://fake-granite"
+    client.client = httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=create_fake_granite_app(latency)),
+        timeout=30.0,
+    )
+    try:
+        yield client
+    finally:
+        client.api_key, client.api_url, client.client = saved
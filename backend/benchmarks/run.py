@@ -0,0 +1,316 @@
+"""
+Benchmark suite for parsing, anomaly detection, retrieval, embedding
+compression (memory and recall per codec) and the end-to-end
+parse/query API.
+
+    python -m benchmarks.run --profile small --output bench.json
+
+Results are JSON with throughput and p50/p99 latency per benchmark, plus
+the git commit, so runs can be compared across commits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+import httpx
+from .corpus import make_csv, make_documents, make_embeddings, make_pdf, make_text
+from .fake_granite import fake_granite
+
+PROFILES = {
+    "tiny": {
+        "pdf_pages": 2, "csv_rows": 200, "text_words": 2000, "documents": 50,
+        "repeat": 3, "e2e_requests": 10, "concurrency": 4, "granite_latency": 0.0,
+        "vectors": 2000, "vector_queries": 20,
+    },
+    "small": {
+        "pdf_pages": 10, "csv_rows": 5000, "text_words": 20000, "documents": 500,
+        "repeat": 10, "e2e_requests": 200, "concurrency": 16, "granite_latency": 0.005,
+        "vectors": 50000, "vector_queries": 100,
+    },
+    "large": {
+        "pdf_pages": 50, "csv_rows": 100000, "text_words": 200000, "documents": 5000,
+        "repeat": 10, "e2e_requests": 2000, "concurrency": 64, "granite_latency": 0.02,
+        "vectors": 500000, "vector_queries": 200,
+    },
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = q * (len(sorted_values) - 1)
+    lower = int(index)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (index - lower)
+
+
+def summarize(durations: List[float], items: int = 1, wall_time: float = None) -> Dict[str, Any]:
+    """Latency percentiles (seconds) and throughput (items/second)"""
+    ordered = sorted(durations)
+    elapsed = wall_time if wall_time is not None else sum(durations)
+    return {
+        "runs": len(durations),
+        "mean": sum(durations) / len(durations) if durations else 0.0,
+        "p50": percentile(ordered, 0.50),
+        "p99": percentile(ordered, 0.99),
+        "throughput": (items * len(durations)) / elapsed if elapsed else 0.0,
+    }
+
+
+def bench(fn: Callable[[], Any], repeat: int, items: int = 1, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations, items)
+
+
+def bench_parsers(workdir: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+    from app.api.parse import parse_csv, parse_pdf, parse_text
+
+    pdf_path = os.path.join(workdir, "bench.pdf")
+    csv_path = os.path.join(workdir, "bench.csv")
+    text_path = os.path.join(workdir, "bench.txt")
+    with open(pdf_path, "wb") as f:
+        f.write(make_pdf(profile["pdf_pages"]))
+    with open(csv_path, "wb") as f:
+        f.write(make_csv(profile["csv_rows"]))
+    with open(text_path, "w", encoding="utf-8") as f:
+        f.write(make_text(profile["text_words"]))
+
+    def run(parser, path):
+        with open(path, "rb") as f:
+            return parser(f)
+
+    repeat = profile["repeat"]
+    return {
+        "parse_pdf": {"pages": profile["pdf_pages"], **bench(lambda: run(parse_pdf, pdf_path), repeat)},
+        "parse_csv": {"rows": profile["csv_rows"], **bench(lambda: run(parse_csv, csv_path), repeat)},
+        "parse_text": {"words": profile["text_words"], **bench(lambda: run(parse_text, text_path), repeat)},
+    }
+
+
+def bench_anomaly(profile: Dict[str, Any]) -> Dict[str, Any]:
+    from app.ml.anomaly import AnomalyDetector
+    from app.ml.features import FeatureStore
+
+    documents = make_documents(profile["documents"])
+    detector = AnomalyDetector()
+    detector.fit(documents)
+    store = FeatureStore()
+    store.add_many(
+        [doc["file_id"] for doc in documents],
+        [detector.extract_features(doc) for doc in documents]
+    )
+    repeat = profile["repeat"]
+    return {
+        "extract_features": bench(
+            lambda: [detector.extract_features(doc) for doc in documents],
+            repeat, items=len(documents)
+        ),
+        "batch_detect": bench(lambda: detector.batch_detect(documents), repeat, items=len(documents)),
+        # Scores from stored features only, as after a model change
+        "rescore_feature_store": bench(lambda: detector.rescore_store(store), repeat, items=len(documents)),
+    }
+
+
+def bench_retrieval(profile: Dict[str, Any]) -> Dict[str, Any]:
+    import numpy as np
+    from app.core.config import settings
+    from app.ml.retrieval import HybridRetriever
+
+    # A fresh retriever over a seeded corpus of the profile's size, so the
+    # numbers do not depend on whatever the global index holds
+    documents = make_documents(profile["documents"])
+    embeddings = make_embeddings(len(documents), settings.embedding_dimension)
+    retriever = HybridRetriever()
+    for document, embedding in zip(documents, embeddings):
+        retriever.add_document({"id": document["file_id"], "filename": document["filename"], "content": document["content"]})
+        retriever.add_embedding(document["file_id"], embedding)
+
+    questions = [make_text(6, seed=i) for i in range(profile["repeat"] * 10)]
+    # Query vectors near stored documents, like questions about them
+    rng = np.random.default_rng(1)
+    query_embeddings = embeddings[rng.integers(len(embeddings), size=len(questions))]
+    query_embeddings = query_embeddings + 0.5 * make_embeddings(len(questions), settings.embedding_dimension, seed=2)
+
+    for question, embedding in zip(questions[:3], query_embeddings):
+        retriever.search(question, embedding)
+    durations = []
+    for question, embedding in zip(questions, query_embeddings):
+        start = time.perf_counter()
+        retriever.search(question, embedding)
+        durations.append(time.perf_counter() - start)
+
+    return {
+        "semantic_search": {"documents": len(documents), **summarize(durations)},
+        "semantic_search_batch": {
+            "documents": len(documents),
+            "questions": len(questions),
+            **bench(lambda: retriever.search_batch(questions, query_embeddings), profile["repeat"], items=len(questions)),
+        },
+    }
+
+
+def recall_at_k(found: List[List[int]], truth: List[List[int]]) -> float:
+    """Mean fraction of the true top-k found"""
+    if not truth:
+        return 0.0
+    return sum(len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)) / len(truth)
+
+
+def bench_embedding_codecs(profile: Dict[str, Any], k: int = 10) -> Dict[str, Any]:
+    import numpy as np
+    from app.core.config import settings
+    from app.ml.quantization import CODECS, create_codec
+
+    vectors = make_embeddings(profile["vectors"], settings.embedding_dimension)
+    # Queries near stored vectors, like questions about indexed documents
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), profile["vector_queries"], replace=False)]
+    queries = queries + 0.5 * make_embeddings(len(queries), settings.embedding_dimension, seed=2)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def top_k(scores, count):
+        top = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    truth = top_k(queries @ vectors.T, k).tolist()
+    shortlist = k * settings.embedding_rerank_factor
+    results = {}
+    for name in CODECS:
+        codec = create_codec(name, settings.embedding_pq_subspaces)
+        start = time.perf_counter()
+        codec.fit(vectors)
+        codes = codec.encode(vectors)
+        train_seconds = time.perf_counter() - start
+
+        approximate = top_k(codec.score(queries, codes), shortlist)
+        reranked = [
+            candidates[np.argsort(-(vectors[candidates] @ query))][:k]
+            for candidates, query in zip(approximate, queries)
+        ]
+        results[f"embeddings_{name}"] = {
+            "vectors": len(vectors),
+            "bytes_per_vector": codes.nbytes / len(vectors),
+            "index_mb": codes.nbytes / (1024 * 1024),
+            "train_seconds": train_seconds,
+            f"recall_at_{k}": recall_at_k(approximate[:, :k].tolist(), truth),
+            f"recall_at_{k}_reranked": recall_at_k([r.tolist() for r in reranked], truth),
+            **bench(lambda: top_k(codec.score(queries[:1], codes), k), profile["repeat"]),
+        }
+    return results
+
+
+async def _load(client: httpx.AsyncClient, requests: int, concurrency: int, send) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    durations: List[float] = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await send(client, i)
+            durations.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall_time = time.perf_counter() - start
+    return {"concurrency": concurrency, "errors": errors, **summarize(durations, wall_time=wall_time)}
+
+
+def bench_end_to_end(workdir: str, profile: Dict[str, Any]) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.main import app
+    from app.ml.granite_client import granite_client
+
+    headers = {"Authorization": "Bearer benchmark"}
+    text_upload = make_text(profile["text_words"] // 10).encode()
+    requests, concurrency = profile["e2e_requests"], profile["concurrency"]
+
+    async def send_parse(client, i):
+        files = {"file": (f"bench_{i}.txt", text_upload, "text/plain")}
+        return await client.post("/api/parse", files=files, headers=headers)
+
+    async def send_query(client, i):
+        payload = {"question": make_text(8, seed=i)}
+        return await client.post("/api/query", json=payload, headers=headers)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return {
+                "api_parse": await _load(client, requests, concurrency, send_parse),
+                "api_query": await _load(client, requests, concurrency, send_query),
+            }
+
+    upload_dir, admission_enabled = settings.upload_dir, settings.admission_enabled
+    settings.upload_dir = os.path.join(workdir, "uploads")
+    # Measure the pipeline, not the single benchmark user's rate limit
+    settings.admission_enabled = False
+    try:
+        with fake_granite(granite_client, latency=profile["granite_latency"]):
+            return asyncio.run(run())
+    finally:
+        settings.upload_dir, settings.admission_enabled = upload_dir, admission_enabled
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def run_benchmarks(profile_name: str = "small") -> Dict[str, Any]:
+    profile = PROFILES[profile_name]
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {
+            **bench_parsers(workdir, profile),
+            **bench_anomaly(profile),
+            **bench_retrieval(profile),
+            **bench_embedding_codecs(profile),
+            **bench_end_to_end(workdir, profile),
+        }
+    return {
+        "commit": _git_commit(),
+        "profile": profile_name,
+        "python": platform.python_version(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "results": results,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the backend benchmark suite")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--output", help="Write JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run_benchmarks(args.profile), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
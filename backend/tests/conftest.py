@@ -0,0 +1,12 @@
+import pytest
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(monkeypatch, tmp_path):
+    """Uploads go to a per-test directory"""
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    yield
+    # Parse pool processes keep the settings they were started with
+    from app.api.bulk import shutdown_parse_pool
+    shutdown_parse_pool()
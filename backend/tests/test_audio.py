@@ -0,0 +1,101 @@
+import io
+import struct
+import wave
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.ml.audio import decode_wav, preprocess_wav, resample
+
+client = TestClient(app)
+
+
+def _wav(samples, rate, channels=1):
+    pcm = (np.clip(samples, -1, 1) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(channels)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _meeting(rate):
+    """1s speech-like tone, 3s pause, 1s tone, surrounded by 2s of room noise"""
+    noise = np.random.RandomState(0).randn
+    tone = 0.3 * np.sin(2 * np.pi * 220 * np.arange(rate) / rate)
+    return np.concatenate([0.001 * noise(2 * rate), tone, 0.001 * noise(3 * rate), tone, 0.001 * noise(2 * rate)])
+
+
+def test_preprocess_trims_silence_and_downsamples():
+    stereo = np.repeat(_meeting(44100)[:, None], 2, axis=1).reshape(-1)
+    data = _wav(stereo, 44100, channels=2)
+
+    processed, report = preprocess_wav(data, target_rate=16000, max_pause=0.5)
+
+    assert report["original_duration"] == 9.0
+    assert 2.0 < report["processed_duration"] < 3.5
+    assert report["processed_bytes"] < len(data) / 10
+    samples, rate = decode_wav(processed)
+    assert rate == 16000 and samples.shape[1] == 1
+
+
+def test_low_rate_audio_keeps_its_native_rate():
+    data = _wav(_meeting(8000), 8000)
+
+    processed, report = preprocess_wav(data, target_rate=16000, max_pause=0.5)
+
+    assert report["sample_rate"] == 8000
+    assert decode_wav(processed)[1] == 8000
+    assert len(processed) < len(data)
+
+
+def test_recording_without_silence_is_not_trimmed():
+    rate = 16000
+    t = np.arange(rate) / rate
+    loud, quiet = 0.5 * np.sin(2 * np.pi * 220 * t), 0.02 * np.sin(2 * np.pi * 180 * t)
+    # Two speakers taking turns, 20+ dB apart, with no pauses at all
+    dialogue = np.concatenate([loud, quiet] * 5)
+
+    _, report = preprocess_wav(_wav(dialogue, rate), target_rate=rate)
+
+    assert report["processed_duration"] > 9.95  # only the partial last frame goes
+
+
+@pytest.mark.parametrize("data", [
+    b"RIFF\x24\x00\x00\x00WAVEfmt \x04\x00\x00\x00\x01\x00\x01\x00",  # truncated fmt chunk
+    b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00" + struct.pack("<HHIIHH", 1, 0, 16000, 0, 0, 16) + b"data\x02\x00\x00\x00\x00\x00",
+    b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00" + struct.pack("<HHIIHH", 1, 1, 16000, 0, 0, 12) + b"data\x02\x00\x00\x00\x00\x00",
+    b"RIFF\x04\x00\x00\x00WAVE",  # no chunks
+])
+def test_malformed_wav_raises_value_error(data):
+    with pytest.raises(ValueError):
+        decode_wav(data)
+
+
+def test_asr_forwards_malformed_wav_unchanged():
+    data = b"RIFF\x24\x00\x00\x00WAVEfmt \x10\x00\x00\x00" + struct.pack("<HHIIHH", 1, 0, 16000, 0, 0, 16) + b"data\x02\x00\x00\x00\x00\x00"
+    files = {"audio_file": ("broken.wav", data, "audio/wav")}
+    response = client.post("/api/asr", files=files, headers={"Authorization": "Bearer test"})
+
+    assert response.status_code == 200
+    assert response.json()["processed_duration"] is None
+
+
+def test_resample_preserves_tone_frequency():
+    rate, target = 48000, 16000
+    tone = np.sin(2 * np.pi * 440 * np.arange(rate) / rate)
+    out = resample(tone, rate, target)
+    assert len(out) == target
+    assert np.argmax(np.abs(np.fft.rfft(out))) == 440
+
+
+def test_asr_endpoint_reports_durations():
+    files = {"audio_file": ("meeting.wav", _wav(_meeting(16000), 16000), "audio/wav")}
+    response = client.post("/api/asr", files=files, headers={"Authorization": "Bearer test"})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["original_duration"] == 9.0
+    assert body["processed_duration"] < body["original_duration"]
@@ -0,0 +1,83 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core import auth
+from app.core.auth import JWKSCache, TokenCache, create_access_token, verify_token_async
+
+
+@pytest.mark.asyncio
+async def test_verified_tokens_are_cached(monkeypatch):
+    auth.token_cache.clear()
+    calls = []
+    decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(threading.get_ident())
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(auth.jwt, "decode", counting_decode)
+    token = create_access_token({"sub": "alice"})
+
+    assert await verify_token_async(token) == "alice"
+    assert await verify_token_async(token) == "alice"
+    assert len(calls) == 1
+    # The signature check on a miss stays off the event loop thread
+    assert calls[0] != threading.get_ident()
+
+
+def test_token_cache_honours_exp_and_size():
+    cache = TokenCache(maxsize=2, max_ttl=60)
+    cache.put("expired", "bob", exp=time.time() - 1)
+    assert cache.get("expired") is None
+
+    cache.put("a", "a", exp=None)
+    cache.put("b", "b", exp=None)
+    cache.get("a")
+    cache.put("c", "c", exp=None)
+    assert cache.get("b") is None
+    assert cache.get("a") == "a"
+    assert cache.get("c") == "c"
+
+
+@pytest.mark.asyncio
+async def test_jwks_fetch_is_coalesced(monkeypatch):
+    cache = JWKSCache("example.auth0.com")
+    fetches = []
+
+    async def fake_fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.01)
+        cache._keys = {"k1": {"kid": "k1"}}
+        cache._fetched_at = time.monotonic()
+
+    monkeypatch.setattr(cache, "_fetch", fake_fetch)
+    keys = await asyncio.gather(*(cache.get_key("k1") for _ in range(20)))
+
+    assert len(fetches) == 1
+    assert all(key == {"kid": "k1"} for key in keys)
+    assert await cache.get_key("unknown") is None
+    assert len(fetches) == 1
+
+
+@pytest.mark.asyncio
+async def test_jwks_failures_back_off(monkeypatch):
+    cache = JWKSCache("example.auth0.com", min_refetch_interval=30.0)
+    fetches = []
+
+    async def failing_fetch():
+        fetches.append(1)
+        raise RuntimeError("Auth0 unavailable")
+
+    monkeypatch.setattr(cache, "_fetch", failing_fetch)
+    for _ in range(5):
+        assert await cache.get_key("k1") is None
+    assert len(fetches) == 1
+
+    # Past the base interval, but the failure doubled it
+    cache._attempted_at -= 31
+    assert await cache.get_key("k1") is None
+    assert len(fetches) == 1
+    cache._attempted_at -= 30
+    assert await cache.get_key("k1") is None
+    assert len(fetches) == 2
@@ -0,0 +1,37 @@
+import io
+import pandas as pd
+from pdfminer.high_level import extract_text
+from benchmarks.corpus import make_csv, make_pdf, make_text
+from benchmarks.run import summarize
+
+
+def test_corpus_generators_are_parseable_and_deterministic():
+    pdf = make_pdf(pages=3, words_per_page=40)
+    assert pdf == make_pdf(pages=3, words_per_page=40)
+    assert len(extract_text(io.BytesIO(pdf)).split()) == 120
+
+    df = pd.read_csv(io.BytesIO(make_csv(rows=50, columns=4)))
+    assert df.shape == (50, 4)
+
+    assert len(make_text(100).split()) == 100
+
+
+def test_summarize_percentiles():
+    result = summarize([0.1, 0.2, 0.3, 0.4], items=10)
+    assert result["runs"] == 4
+    assert abs(result["p50"] - 0.25) < 1e-9
+    assert abs(result["throughput"] - 40.0) < 1e-9
+
+
+def test_bench_retrieval_searches_a_corpus_of_the_profile_size():
+    from app.ml.retrieval import retriever
+    from benchmarks.run import bench_retrieval
+
+    indexed = len(retriever)
+    results = bench_retrieval({"documents": 30, "repeat": 1})
+
+    assert results["semantic_search"]["documents"] == 30
+    assert results["semantic_search"]["runs"] == 10
+    assert results["semantic_search_batch"]["questions"] == 10
+    # The global retriever is left alone
+    assert len(retriever) == indexed
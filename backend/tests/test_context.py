@@ -0,0 +1,65 @@
+import pytest
+from app.core.config import settings
+from app.ml.context import adaptive_max_tokens, estimate_tokens, mmr_rerank, pack_context
+
+
+def _doc(name, content):
+    return {"id": name, "filename": name, "content": content}
+
+
+def test_mmr_skips_redundant_candidates():
+    relevance = [1.0, 0.95, 0.6]
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]]
+
+    assert mmr_rerank(relevance, embeddings, 2, lambda_=1.0) == [0, 1]
+    assert mmr_rerank(relevance, embeddings, 2, lambda_=0.5) == [0, 2]
+
+
+def test_mmr_without_embeddings_keeps_relevance_order():
+    assert mmr_rerank([0.2, 0.9, 0.5], [None, None, None], 3) == [1, 2, 0]
+
+
+def test_pack_context_respects_budget():
+    documents = [_doc("a.txt", "alpha " * 200), _doc("b.txt", "beta " * 200), _doc("c.txt", "gamma " * 200)]
+
+    packed, context, used = pack_context(documents, token_budget=300, doc_token_limit=200)
+
+    assert [doc["id"] for doc in packed] == ["a.txt", "b.txt"]
+    assert used <= 300
+    assert estimate_tokens(context) <= 300
+    assert context.startswith("Document: a.txt\nContent: alpha")
+
+
+def test_adaptive_max_tokens():
+    assert adaptive_max_tokens(100, 40, minimum=64, maximum=300, context_window=4096) == 74
+    assert adaptive_max_tokens(100, 4000, minimum=64, maximum=300, context_window=4096) == 300
+    assert adaptive_max_tokens(4000, 4000, minimum=64, maximum=300, context_window=4096) == 96
+    with pytest.raises(ValueError):
+        adaptive_max_tokens(4050, 4000, minimum=64, maximum=300, context_window=4096)
+
+
+def test_build_prompt_trims_context_to_the_model_window(monkeypatch):
+    from app.api.query import build_prompt
+    monkeypatch.setattr(settings, "model_context_window", 400)
+    candidates = [
+        {**_doc(f"{i}.txt", f"document {i} " * 200), "similarity_score": 1.0 - i / 10} for i in range(5)
+    ]
+
+    relevant_docs, prompt, max_tokens = build_prompt("what is in the documents?", candidates, 5)
+
+    assert relevant_docs
+    assert max_tokens >= settings.generation_min_tokens
+    assert estimate_tokens(prompt) + max_tokens <= 400
+
+
+def test_query_rejects_questions_longer_than_the_model_window(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    monkeypatch.setattr(settings, "admission_enabled", False)
+    monkeypatch.setattr(settings, "model_context_window", 256)
+
+    response = TestClient(app).post(
+        "/api/query", json={"question": "why " * 300}, headers={"Authorization": "Bearer test"}
+    )
+
+    assert response.status_code == 413
@@ -0,0 +1,108 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.auth import create_access_token
+from app.core.config import settings
+from app.ml.dedup import NearDuplicateDetector
+
+client = TestClient(app)
+
+REPORT = " ".join(f"quarterly revenue grew in region {i} driven by product line {i % 7}" for i in range(60))
+
+
+def test_detector_flags_near_duplicates_only():
+    detector = NearDuplicateDetector(threshold=0.8)
+    assert detector.check("a", REPORT) == (None, 0.0)
+
+    duplicate_of, similarity = detector.check("b", REPORT.replace("region 3 ", "region 33 "))
+    assert duplicate_of == "a"
+    assert similarity >= 0.8
+
+    duplicate_of, _ = detector.check("c", " ".join(f"minutes of board meeting {i} about office relocation plans" for i in range(5)))
+    assert duplicate_of is None
+    assert len(detector) == 2
+
+
+def test_short_documents_are_never_duplicates():
+    detector = NearDuplicateDetector(threshold=0.8)
+    for doc_id, content in [("blank", ""), ("spaces", "  \n\t "), ("scan", "Page 1"), ("scan2", "Page 1")]:
+        assert detector.check(doc_id, content) == (None, 0.0)
+    assert len(detector) == 0
+
+
+def test_duplicates_are_scoped_to_the_uploader():
+    detector = NearDuplicateDetector(threshold=0.8)
+    assert detector.check("a", REPORT, "alice") == (None, 0.0)
+    assert detector.check("b", REPORT, "bob")[0] is None
+    assert detector.check("c", REPORT, "alice")[0] == "a"
+    assert detector.check("d", REPORT, "bob")[0] == "b"
+
+
+def test_redis_index_is_shared_and_rebuilt_for_every_worker():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    workers = []
+    for _ in range(2):
+        detector = NearDuplicateDetector(threshold=0.8, redis_url="redis://unused")
+        detector._lsh._client = fakeredis.FakeRedis(server=server)
+        workers.append(detector)
+
+    assert workers[0].check("a", REPORT, "alice") == (None, 0.0)
+    assert workers[1].check("b", REPORT, "alice")[0] == "a"
+
+    workers[0].rescan([{"id": "c", "content": REPORT, "metadata": {"uploaded_by": "alice"}}])
+    assert len(workers[1]) == 1
+    assert workers[1].check("d", REPORT, "alice")[0] == "c"
+
+
+def test_rescan_groups_duplicates_and_rebuilds_index():
+    detector = NearDuplicateDetector(threshold=0.8)
+    result = detector.rescan([
+        {"id": "a", "content": REPORT},
+        {"id": "b", "content": "an unrelated memo about parking"},
+        {"id": "c", "content": REPORT + " final"},
+    ])
+    assert result["scanned"] == 3
+    assert result["duplicates"] == 1
+    assert result["groups"] == [{"canonical_id": "a", "duplicate_ids": ["c"]}]
+    assert detector.check("d", REPORT)[0] == "a"
+
+
+def test_duplicate_upload_is_tagged():
+    unique = REPORT + " batch 5f1c"
+    first = client.post("/api/parse", files={"file": ("r1.txt", unique, "text/plain")}, headers={"Authorization": "Bearer test"})
+    second = client.post("/api/parse", files={"file": ("r2.txt", unique, "text/plain")}, headers={"Authorization": "Bearer test"})
+
+    assert "duplicate_of" not in first.json()["metadata"]
+    assert second.json()["metadata"]["duplicate_of"] == first.json()["file_id"]
+
+
+def test_upload_dedup_check_runs_off_the_event_loop(monkeypatch):
+    import asyncio
+    from app.ml.dedup import dedup_detector
+
+    on_loop = []
+    original = dedup_detector.check
+
+    def check(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(dedup_detector, "check", check)
+    client.post("/api/parse", files={"file": ("r3.txt", REPORT + " batch 9c2e", "text/plain")}, headers={"Authorization": "Bearer test"})
+
+    assert on_loop == [False]
+
+
+def test_rescan_endpoint_is_admin_only(monkeypatch):
+    monkeypatch.setattr(settings, "admin_users", ["admin"])
+    assert client.post("/api/admin/dedup/rescan", headers={"Authorization": "Bearer test"}).status_code == 403
+
+    token = create_access_token({"sub": "admin"})
+    response = client.post("/api/admin/dedup/rescan", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.json()["scanned"] >= 3
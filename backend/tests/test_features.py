@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.ml.anomaly import AnomalyDetector
+from app.ml.features import FEATURE_NAMES, FeatureStore, extract_features, feature_store
+from app.tasks import rescore_anomalies
+from benchmarks.corpus import make_documents
+
+client = TestClient(app)
+
+
+def test_extract_features():
+    features = dict(zip(FEATURE_NAMES, extract_features("Hello WORLD. Visit http://x now!\nextraordinarily")))
+    assert features["word_count"] == 6
+    assert features["line_breaks"] == 1
+    assert features["urls"] == 1
+    assert features["uppercase_words"] == 1
+    assert features["long_words"] == 1
+
+
+def test_shared_file_store_is_columnar_and_latest_wins(tmp_path):
+    path = str(tmp_path / "features.bin")
+    writer, reader = FeatureStore(path), FeatureStore(path)
+
+    writer.add_many(["a", "b"], [[1.0] * 10, [2.0] * 10])
+    writer.add("a", [3.0] * 10)
+
+    file_ids, features, ingested_at = reader.columns()
+    assert list(file_ids) == ["b", "a"]
+    assert features.shape == (2, len(FEATURE_NAMES))
+    assert features[:, 0].tolist() == [2.0, 3.0]
+    assert reader.get("a") == [3.0] * 10
+    writer.add("c", [0.0] * 10)
+    assert len(reader) == 3
+
+
+def test_summary_is_maintained_incrementally(tmp_path):
+    path = str(tmp_path / "features.bin")
+    writer, reader = FeatureStore(path), FeatureStore(path)
+    documents = {f"doc{i}": f"word {i} http://x" if i % 3 else f"plain text number {i}" for i in range(30)}
+    writer.add_many(list(documents), [extract_features(content) for content in documents.values()])
+    writer.add("doc1", extract_features("now just two"))  # supersedes: no URL, two fewer words
+
+    file_ids, features, _ = reader.columns()
+    assert reader.columns()[1] is features  # cached until the next record
+    column = dict(zip(FEATURE_NAMES, features.T))
+    assert reader.summary() == {
+        "documents": 30,
+        "total_words": int(column["word_count"].sum()),
+        "avg_words": round(float(column["word_count"].mean()), 1),
+        "avg_length": round(float(column["document_length"].mean()), 1),
+        "documents_with_urls": int((column["urls"] > 0).sum()),
+        "documents_with_emails": 0,
+    }
+    writer.add("doc30", extract_features("one more"))
+    assert reader.columns()[1] is not features
+    assert reader.summary()["documents"] == 31
+
+
+def test_rescore_task_requires_a_shared_store(monkeypatch):
+    monkeypatch.setattr(feature_store, "path", None)
+    with pytest.raises(ValueError, match="FEATURE_STORE_PATH"):
+        rescore_anomalies()
+
+
+def test_rescore_from_store_matches_batch_detect():
+    documents = make_documents(40, words=50)
+    documents.append({"file_id": "odd", "filename": "odd.txt", "content": "BUY NOW!!! http://x http://y " * 40})
+    store = FeatureStore()
+    store.add_many([doc["file_id"] for doc in documents], [extract_features(doc["content"]) for doc in documents])
+
+    detector = AnomalyDetector()
+    detector.fit(documents)
+    expected = {result["document_id"]: result["anomaly_score"] for result in detector.batch_detect(documents)}
+    rescored = {result["document_id"]: result["anomaly_score"] for result in detector.rescore_store(store)}
+
+    assert rescored.keys() == expected.keys()
+    assert np.allclose([rescored[k] for k in expected], list(expected.values()))
+    assert max(rescored, key=rescored.get) == "odd"
+
+
+def test_parse_fills_store_and_dashboard_reads_it(monkeypatch, tmp_path):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    before = feature_store.summary().get("total_words", 0)
+    headers = {"Authorization": "Bearer test"}
+
+    response = client.post("/api/parse", files={"file": ("notes.txt", b"one two three", "text/plain")}, headers=headers)
+    file_id = response.json()["file_id"]
+
+    assert feature_store.get(file_id)[FEATURE_NAMES.index("word_count")] == 3
+    corpus = client.get("/api/dashboard/stats", headers=headers).json()["corpus"]
+    assert corpus["total_words"] == before + 3
+
+
+def test_reingested_records_do_not_accumulate(tmp_path):
+    path = str(tmp_path / "features.bin")
+    writer, reader = FeatureStore(path), FeatureStore(path)
+    memory = FeatureStore()
+    for round_ in range(50):
+        for store in (writer, memory):
+            store.add_many(["a", "b", "c"], [[float(round_)] * 10] * 3)
+        reader.get("a")  # syncs the shared file a round at a time
+
+    for store in (reader, memory):
+        assert store._size <= 2 * 16
+        assert len(store) == 3
+        assert store.get("b") == [49.0] * 10
+        assert list(store.columns()[0]) == ["a", "b", "c"]
+        assert store.summary()["documents"] == 3
+
+
+
+def test_rescore_records_one_stats_event_per_scan(monkeypatch):
+    from app.ml import anomaly
+
+    observed = []
+    monkeypatch.setattr(anomaly.stats, "observe", lambda name, duration: observed.append(name))
+    documents = make_documents(20, words=30)
+    store = FeatureStore()
+    store.add_many([doc["file_id"] for doc in documents], [extract_features(doc["content"]) for doc in documents])
+
+    AnomalyDetector().rescore_store(store, refit=True)
+
+    assert observed == ["anomaly_scan"]
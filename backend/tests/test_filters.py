@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.ml.filters import MetadataIndex, parse_filter
+from app.ml.retrieval import HybridRetriever
+from app.ml.shared_index import SharedIndex
+
+client = TestClient(app)
+
+DOCUMENTS = [
+    {"id": "jan-report", "filename": "a.pdf", "content": "quarterly revenue report",
+     "metadata": {"type": "report", "uploaded_by": "alice", "date": "2024-01-15"}},
+    {"id": "feb-report", "filename": "b.pdf", "content": "quarterly revenue report",
+     "metadata": {"type": "report", "uploaded_by": "bob", "date": "2024-02-03"}},
+    {"id": "jan-guide", "filename": "c.pdf", "content": "revenue recognition guide",
+     "metadata": {"type": "guide", "uploaded_by": "alice", "date": "2024-01-20"}},
+    {"id": "untyped", "filename": "d.txt", "content": "revenue notes", "metadata": {}},
+]
+
+
+def _ids(index, expression, user="alice"):
+    return list(np.flatnonzero(parse_filter(expression, user).mask(index)))
+
+
+def test_bitmap_and_date_filters():
+    index = MetadataIndex(["type", "uploaded_by"], ["date"])
+    for docnum, document in enumerate(DOCUMENTS):
+        index.add(docnum, document["metadata"])
+
+    assert _ids(index, {"type": "report"}) == [0, 1]
+    assert _ids(index, {"type": ["guide", "memo"]}) == [2]
+    assert _ids(index, {"uploaded_by": "$me", "type": {"ne": "guide"}}) == [0]
+    assert _ids(index, {"date": {"gte": "2024-01-01", "lt": "2024-02-01"}}) == [0, 2]
+    assert _ids(index, {"date": {"gt": "2024-01-15"}}) == [1, 2]
+    assert _ids(index, {"or": [{"type": "guide"}, {"uploaded_by": "bob"}]}) == [1, 2]
+    assert _ids(index, {"not": {"type": "report"}}) == [2, 3]
+
+
+def test_date_ranges_stay_correct_across_interleaved_adds():
+    rng = np.random.default_rng(0)
+    index = MetadataIndex(attributes=[], date_attributes=["date"])
+    days = rng.integers(1, 29, size=300)
+    for docnum, day in enumerate(days):
+        index.add(docnum, {"date": f"2024-02-{day:02d}"})
+        if docnum % 50 == 49:
+            expected = (days[:docnum + 1] >= 10) & (days[:docnum + 1] < 20)
+            mask = parse_filter({"date": {"gte": "2024-02-10", "lt": "2024-02-20"}}).mask(index)
+            assert np.array_equal(mask, expected)
+
+    timestamps, docnums = index._dates("date")
+    assert np.all(np.diff(timestamps) >= 0)
+    # Equal dates keep ingest order
+    same_day = docnums[timestamps == timestamps[0]]
+    assert np.all(np.diff(same_day.astype(np.int64)) > 0)
+
+
+def test_invalid_filters_rejected():
+    with pytest.raises(ValueError):
+        parse_filter({"filename": "a.pdf"})
+    with pytest.raises(ValueError):
+        parse_filter({"date": "2024-01-15"})
+    with pytest.raises(ValueError):
+        parse_filter({"date": {"gte": "last tuesday"}})
+    with pytest.raises(ValueError):
+        parse_filter({"or": []})
+
+
+def test_filtered_search_only_scores_matching_documents(tmp_path):
+    store = HybridRetriever()
+    shared = SharedIndex(str(tmp_path), poll_interval=0)
+    embeddings = [[1.0, 0.0], [1.0, 0.1], [0.9, 0.2], [0.8, 0.3]]
+    for document, embedding in zip(DOCUMENTS, embeddings):
+        store.add_document(document)
+        store.add_embedding(document["id"], embedding)
+    shared.publish(DOCUMENTS[:2], embeddings[:2])
+    shared.publish(DOCUMENTS[2:], embeddings[2:])
+
+    january_by_alice = parse_filter({"uploaded_by": "$me", "date": {"gte": "2024-01-01", "lt": "2024-02-01"}}, "alice")
+    for index in (store, shared):
+        results = index.search("revenue", [1.0, 0.0], limit=5, filters=january_by_alice)
+        assert {doc["id"] for doc in results} == {"jan-report", "jan-guide"}
+        assert index.search("revenue", [1.0, 0.0], limit=5, filters=parse_filter({"type": "memo"})) == []
+
+
+def test_query_endpoint_applies_filters():
+    headers = {"Authorization": "Bearer test"}
+
+    response = client.post(
+        "/api/query",
+        json={"question": "documentation", "filters": {"type": "guide"}},
+        headers=headers
+    )
+    assert response.status_code == 200
+    assert {source["metadata"]["type"] for source in response.json()["sources"]} == {"guide"}
+
+    response = client.post("/api/query", json={"question": "x", "filters": {"filename": "a"}}, headers=headers)
+    assert response.status_code == 400
@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.metrics import MetricsRegistry
+
+client = TestClient(app)
+
+
+def test_histogram_render():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test", ["stage"], buckets=(0.1, 1.0))
+    histogram.observe(0.05, stage="a")
+    histogram.observe(0.5, stage="a")
+    histogram.observe(5.0, stage="a")
+
+    text = registry.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="a"} 3' in text
+
+
+def test_metrics_endpoint_reports_query_stages():
+    headers = {"Authorization": "Bearer test"}
+    client.post("/api/query", json={"question": "technical guide"}, headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="POST",route="/api/query",status="200"}' in text
+    assert 'stage_duration_seconds_count{route="/api/query",stage="generation"}' in text
+    assert 'stage="granite.create_embeddings"' in text
+
+
+def test_captured_observations_are_recorded_under_the_current_route():
+    from app.core.metrics import STAGE_DURATION, capture_observations, current_scope, record_observations, span
+
+    with capture_observations() as observations:
+        with span("captured_stage"):
+            pass
+    assert [(name, labels) for name, _, labels in observations] == [
+        ("stage_duration_seconds", {"route": "none", "stage": "captured_stage"})
+    ]
+    assert 'stage="captured_stage"' not in "\n".join(STAGE_DURATION.render())
+
+    token = current_scope.set({"route": type("Route", (), {"path": "/api/parse/bulk"})()})
+    try:
+        record_observations(observations)
+    finally:
+        current_scope.reset(token)
+    assert 'stage_duration_seconds_count{route="/api/parse/bulk",stage="captured_stage"} 1' in "\n".join(STAGE_DURATION.render())
@@ -0,0 +1,54 @@
+import threading
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.auth import create_access_token
+from app.core.config import settings
+from app.core.profiling import RequestProfilerMiddleware, SamplingProfiler
+
+client = TestClient(app)
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampling_profiler_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        stacks = SamplingProfiler().sample(duration=0.2, interval=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert any("_busy_loop" in stack for stack in stacks)
+    assert all(count > 0 for count in stacks.values())
+
+
+def test_request_profiler_requires_admin(monkeypatch):
+    monkeypatch.setattr(settings, "admin_users", ["admin"])
+    profiled = FastAPI()
+    profiled.add_middleware(RequestProfilerMiddleware)
+
+    @profiled.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    profiled_client = TestClient(profiled)
+    admin_token = create_access_token({"sub": "admin"})
+
+    response = profiled_client.get("/ping?profile=1", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 200
+    assert response.headers["x-profiled-status"] == "200"
+    assert "function calls" in response.text
+
+    response = profiled_client.get("/ping?profile=1", headers={"Authorization": "Bearer other"})
+    assert response.json() == {"ok": True}
+
+
+def test_sample_endpoint_is_admin_only():
+    response = client.post("/api/admin/profile/sample?duration=0", headers={"Authorization": "Bearer test"})
+    assert response.status_code == 403
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from benchmarks.corpus import make_embeddings
+from app.ml.quantization import CODECS, create_codec, load_codec, save_codec
+from app.ml.retrieval import VectorIndex
+from app.ml.shared_index import SharedIndex
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    return make_embeddings(600, dimension=64, rank=16)
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_codec_scores_approximate_inner_products(vectors, name, tmp_path):
+    codec = create_codec(name, pq_subspaces=16)
+    codec.fit(vectors)
+    codes = codec.encode(vectors)
+    queries = vectors[:5]
+
+    scores = codec.score(queries, codes)
+    tolerance = {"float32": 1e-5, "float16": 1e-2, "int8": 5e-2, "pq": 0.3}[name]
+    assert np.abs(scores - queries @ vectors.T).max() < tolerance
+    # Each stored vector is (about) its own best match
+    assert (scores.argmax(axis=1) == np.arange(5)).mean() >= 0.8
+
+    save_codec(str(tmp_path), codec)
+    assert np.allclose(load_codec(str(tmp_path)).score(queries, codes), scores)
+
+
+def test_vector_index_trains_codec_after_threshold(vectors):
+    index = VectorIndex(create_codec("int8"), train_size=100)
+    for docnum, vector in enumerate(vectors[:150]):
+        index.add(docnum, vector)
+    assert index.needs_training and not index.codec.trained
+
+    index.train()
+
+    assert index.codec.trained and not index.needs_training
+    assert index.nbytes == 150 * 64
+    hits = index.search(vectors[120], k=3)
+    assert hits[0][0] == 120
+    assert abs(index.similarity(7, vectors[7]) - 1.0) < 0.05
+
+
+def test_retriever_trains_codec_in_the_background(vectors, monkeypatch):
+    import threading
+    from app.ml.retrieval import HybridRetriever
+
+    retriever = HybridRetriever()
+    retriever._vectors = VectorIndex(create_codec("int8"), train_size=100)
+    for i in range(len(vectors)):
+        retriever.add_document({"id": f"d{i}", "filename": f"d{i}.txt", "content": ""})
+
+    fitting, release = threading.Event(), threading.Event()
+    original_fit = VectorIndex.fit
+
+    def fit(self, snapshot):
+        fitting.set()
+        release.wait(5)
+        return original_fit(self, snapshot)
+
+    monkeypatch.setattr(VectorIndex, "fit", fit)
+    retriever.add_embeddings([f"d{i}" for i in range(100)], vectors[:100])
+    assert fitting.wait(5)
+
+    # Searches and adds are served as float32 while the codec trains
+    retriever.add_embeddings([f"d{i}" for i in range(100, 150)], vectors[100:150])
+    retriever.add_embedding("d3", vectors[140])
+    assert retriever.search("", vectors[120], limit=1)[0]["id"] == "d120"
+    assert not retriever._vectors.codec.trained
+
+    release.set()
+    retriever._training.join(5)
+    assert retriever._vectors.codec.trained
+    assert retriever._vectors.nbytes == 150 * 64
+    # Rows added or replaced during training were encoded with the new codec
+    assert retriever.search("", vectors[140], limit=2)[0]["id"] in {"d3", "d140"}
+    assert abs(retriever._vectors.similarity(145, vectors[145]) - 1.0) < 0.05
+    assert abs(retriever._vectors.similarity(3, vectors[140]) - 1.0) < 0.05
+
+
+def test_shared_index_reranks_compressed_candidates(vectors, tmp_path):
+    documents = [{"id": f"d{i}", "filename": f"d{i}.txt", "content": "", "metadata": {}} for i in range(len(vectors))]
+    exact = SharedIndex(str(tmp_path / "exact"), poll_interval=0)
+    compressed = SharedIndex(str(tmp_path / "pq"), poll_interval=0, codec="pq", pq_subspaces=8, rerank_factor=8)
+    exact.publish(documents, vectors)
+    compressed.publish(documents, vectors)
+
+    for query in vectors[:10]:
+        expected = [doc["id"] for doc in exact.search("", query, limit=5)]
+        results = compressed.search("", query, limit=5)
+        assert [doc["id"] for doc in results] == expected
+        # Reported similarities come from the exact vectors
+        assert results[0]["similarity_score"] == pytest.approx(1.0, abs=1e-5)
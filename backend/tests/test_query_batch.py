@@ -0,0 +1,96 @@
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.ml.granite_client import granite_client
+
+client = TestClient(app)
+headers = {"Authorization": "Bearer test"}
+
+
+def _results(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_batch_query_embeds_once_and_answers_each_question(monkeypatch):
+    embed_calls = []
+    original = granite_client.create_embeddings
+
+    async def create_embeddings(texts):
+        embed_calls.append(list(texts))
+        return await original(texts)
+
+    monkeypatch.setattr(granite_client, "create_embeddings", create_embeddings)
+    questions = ["quarterly performance", "API integration", "quarterly performance"]
+
+    response = client.post("/api/query/batch", json={"questions": questions, "context_limit": 2}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = sorted(_results(response), key=lambda result: result["index"])
+    assert [result["index"] for result in results] == [0, 1, 2]
+    assert all(result["status"] == "ok" for result in results)
+    assert [result["question"] for result in results] == questions
+    assert all(len(result["response"]["sources"]) <= 2 for result in results)
+    # Duplicate question is embedded once, in a single call
+    assert embed_calls == [["quarterly performance", "API integration"]]
+
+
+def test_batch_query_reports_generation_errors_per_question(monkeypatch):
+    async def generate_text(prompt, max_tokens=150):
+        if "broken" in prompt:
+            raise RuntimeError("model unavailable")
+        return {"generated_text": "fine"}
+
+    monkeypatch.setattr(granite_client, "generate_text", generate_text)
+
+    response = client.post("/api/query/batch", json={"questions": ["broken", "working"]}, headers=headers)
+
+    by_question = {result["question"]: result for result in _results(response)}
+    assert by_question["broken"]["status"] == "error"
+    assert "model unavailable" in by_question["broken"]["error"]
+    assert by_question["working"]["response"]["answer"] == "fine"
+
+
+def test_batch_query_limits_question_count(monkeypatch):
+    monkeypatch.setattr(settings, "admission_enabled", False)
+    monkeypatch.setattr(settings, "query_batch_max_questions", 2)
+
+    response = client.post("/api/query/batch", json={"questions": ["a", "b", "c"]}, headers=headers)
+
+    assert response.status_code == 413
+
+
+def test_batch_query_searches_and_assembles_prompts_off_the_event_loop(monkeypatch):
+    import asyncio
+    from app.api import query
+    from app.ml.retrieval import retriever
+
+    on_loop = {}
+    original_search = retriever.search_batch
+    original_build = query.build_prompt
+
+    def running_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return True
+
+    def search_batch(*args, **kwargs):
+        on_loop["search"] = running_loop()
+        return original_search(*args, **kwargs)
+
+    def build_prompt(*args, **kwargs):
+        on_loop["prompt"] = running_loop()
+        return original_build(*args, **kwargs)
+
+    monkeypatch.setattr(query, "shared_index", None)
+    monkeypatch.setattr(retriever, "search_batch", search_batch)
+    monkeypatch.setattr(query, "build_prompt", build_prompt)
+
+    response = client.post("/api/query/batch", json={"questions": ["quarterly performance"]}, headers=headers)
+
+    assert response.status_code == 200
+    assert _results(response)[0]["status"] == "ok"
+    assert on_loop == {"search": False, "prompt": False}
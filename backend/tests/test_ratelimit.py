@@ -0,0 +1,102 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.auth import create_access_token
+from app.core.config import settings
+from app.core.ratelimit import ConcurrencyLimiter, Overloaded, TokenBucketLimiter
+
+client = TestClient(app)
+
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    limiter = TokenBucketLimiter()
+
+    async def run():
+        waits = [await limiter.acquire("alice", "query", rate=0.5, capacity=3) for _ in range(4)]
+        other = await limiter.acquire("bob", "query", rate=0.5, capacity=3)
+        return waits, other
+
+    waits, other = asyncio.run(run())
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert 1.9 < waits[3] <= 2.0
+    assert other == 0.0
+
+
+def test_concurrency_limiter_queues_then_rejects():
+    async def run():
+        limiter = ConcurrencyLimiter(limit=1, queue_size=1, timeout=0.05)
+        await limiter.acquire()
+
+        queued = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await limiter.acquire()  # queue full
+
+        limiter.release()  # hands the slot to the queued request
+        await queued
+        assert limiter.active == 1
+
+        with pytest.raises(Overloaded):
+            await limiter.acquire()  # waits, then times out
+        assert limiter.queued == 0
+
+    asyncio.run(run())
+
+
+def test_query_rate_limited_per_user(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limits", {"query": 0.01})
+    monkeypatch.setattr(settings, "rate_limit_bursts", {"query": 2})
+    token = create_access_token({"sub": "rate-limited-user"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    statuses = [
+        client.post("/api/query", json={"question": "revenue"}, headers=headers).status_code
+        for _ in range(3)
+    ]
+
+    assert statuses == [200, 200, 429]
+    response = client.post("/api/query", json={"question": "revenue"}, headers=headers)
+    assert int(response.headers["Retry-After"]) > 0
+    other = client.post("/api/query", json={"question": "revenue"}, headers={"Authorization": "Bearer test"})
+    assert other.status_code == 200
+
+
+def test_batches_are_charged_per_question(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limits", {"query_batch": 0.01})
+    monkeypatch.setattr(settings, "rate_limit_bursts", {"query_batch": 5})
+    token = create_access_token({"sub": "batch-user"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    def batch(count):
+        return client.post("/api/query/batch", json={"questions": [f"q{i}" for i in range(count)]}, headers=headers)
+
+    assert batch(6).status_code == 413  # more than the bucket holds: never admissible
+    assert batch(3).status_code == 200
+    response = batch(3)  # 2 tokens left
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert batch(2).status_code == 200
+
+
+def test_bulk_archive_members_are_charged(monkeypatch, tmp_path):
+    import io
+    import json
+    import zipfile
+    monkeypatch.setattr(settings, "rate_limits", {"parse_bulk": 0.01})
+    monkeypatch.setattr(settings, "rate_limit_bursts", {"parse_bulk": 3})
+    token = create_access_token({"sub": "bulk-user"})
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(5):
+            zf.writestr(f"note{i}.txt", f"note {i}")
+
+    response = client.post(
+        "/api/parse/bulk",
+        files=[("files", ("notes.zip", archive.getvalue(), "application/zip"))],
+        headers={"Authorization": f"Bearer {token}"}
+    )
+
+    # One token for the archive, then one per member after the first
+    statuses = [json.loads(line)["status_code"] for line in response.text.splitlines()]
+    assert sorted(statuses, key=str) == [429, None, None, None]
@@ -0,0 +1,64 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from benchmarks.corpus import make_pdf, make_text
+
+client = TestClient(app)
+HEADERS = {"Authorization": "Bearer test", "Accept-Encoding": "identity"}
+
+
+def _parse(filename, content, headers=HEADERS, **params):
+    return client.post("/api/parse", params=params, files={"file": (filename, content, "text/plain")}, headers=headers)
+
+
+def test_fields_and_include_content():
+    response = _parse("a.txt", make_text(500, seed=11), fields="file_id,word_count,content", include_content="false")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"file_id", "word_count"}
+    assert _parse("a.txt", "text", fields="nope").status_code == 400
+
+
+def test_content_pagination_and_truncation():
+    response = _parse("r.pdf", make_pdf(pages=4, words_per_page=30), page=2, page_size=2, fields="content")
+    body = response.json()
+    assert body["total_pages"] == 4
+    assert body["content"].count("\f") == 1
+    assert body["content_length"] > len(body["content"])
+
+    body = _parse("b.txt", make_text(500, seed=12), content_limit=100).json()
+    assert len(body["content"]) == 100
+    assert body["content_truncated"] is True
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_responses_are_compressed(encoding):
+    content = make_text(3000, seed=13)
+    response = client.post(
+        "/api/parse",
+        files={"file": ("c.txt", content, "text/plain")},
+        headers={"Authorization": "Bearer test", "Accept-Encoding": encoding}
+    )
+
+    assert response.headers["content-encoding"] == encoding
+    assert int(response.headers["content-length"]) < len(content) / 2
+    # The client decompresses transparently
+    assert response.json()["content"] == content
+
+
+def test_small_responses_are_not_compressed():
+    response = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_ndjson_is_compressed_incrementally():
+    files = [("files", (f"d{i}.txt", make_text(400, seed=20 + i), "text/plain")) for i in range(3)]
+    response = client.post(
+        "/api/parse/bulk",
+        files=files,
+        headers={"Authorization": "Bearer test", "Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert len(response.text.splitlines()) == 3
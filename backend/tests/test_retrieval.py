@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.config import settings
+from app.ml.retrieval import HybridRetriever, InvertedIndex, reciprocal_rank_fusion, retriever, tokenize, tokenize_filename
+
+client = TestClient(app)
+
+
+def test_tokenize_keeps_codes_together():
+    assert tokenize("Order SKU-1042 shipped, v2.3!") == ["order", "sku-1042", "shipped", "v2.3"]
+    assert tokenize("Revenue grew.The total was 3.5 report.pdf") == [
+        "revenue", "grew", "the", "total", "was", "3.5", "report", "pdf"
+    ]
+
+
+def test_tokenize_filename_splits_parts_and_extension():
+    assert tokenize_filename("contract_ZX99.csv") == ["contract_zx99", "contract", "zx99", "csv"]
+    assert tokenize_filename("quarterly_report.pdf") == ["quarterly_report", "quarterly", "report", "pdf"]
+
+
+def test_search_matches_filename_parts():
+    store = HybridRetriever()
+    store.add_document({"id": "a", "filename": "contract_ZX99.csv", "content": "terms"})
+    store.add_document({"id": "b", "filename": "quarterly_report.pdf", "content": "numbers"})
+
+    assert [doc["id"] for doc in store.search("contract_zx99")] == ["a"]
+    assert [doc["id"] for doc in store.search("zx99")] == ["a"]
+    assert [doc["id"] for doc in store.search("quarterly report")] == ["b"]
+    assert [doc["id"] for doc in store.search("pdf")] == ["b"]
+
+
+def test_bm25_prefers_rarer_and_denser_matches():
+    index = InvertedIndex()
+    index.add(0, "invoice invoice invoice payment")
+    index.add(1, "invoice payment terms and conditions apply here")
+    index.add(2, "quarterly report")
+
+    scores = index.scores("invoice")
+    assert scores[0] > scores[1] > 0
+    assert scores[2] == 0
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [docnum for docnum, _ in fused] == [1, 3, 2]
+
+
+def test_hybrid_search_fuses_lexical_and_vector_results():
+    store = HybridRetriever()
+    store.add_document({"id": "a", "filename": "a.txt", "content": "part number XJ-9000 spec"})
+    store.add_document({"id": "b", "filename": "b.txt", "content": "general overview"})
+    store.add_embedding("b", np.array([1.0, 0.0]))
+    store.add_embedding("a", np.array([0.0, 1.0]))
+
+    results = store.search("xj-9000", query_embedding=[1.0, 0.0], limit=2)
+    assert {doc["id"] for doc in results} == {"a", "b"}
+    by_id = {doc["id"]: doc for doc in results}
+    assert by_id["a"]["lexical_score"] > 0
+    assert abs(by_id["b"]["similarity_score"] - 1.0) < 1e-6
+
+    assert store.search("xj-9000", limit=5)[0]["id"] == "a"
+
+
+def test_parsed_documents_become_searchable(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path))
+    files = {"file": ("codes.txt", "Shipment manifest for pallet QZ-31337", "text/plain")}
+    response = client.post("/api/parse", files=files, headers={"Authorization": "Bearer test"})
+    assert response.status_code == 200
+
+    results = retriever.search("qz-31337", limit=1)
+    assert results[0]["id"] == response.json()["file_id"]
+
+
+def test_search_batch_matches_single_searches():
+    store = HybridRetriever()
+    for name, content, vector in [("a", "invoice terms", [1.0, 0.0]), ("b", "audit report", [0.0, 1.0]), ("c", "misc", [0.6, 0.8])]:
+        store.add_document({"id": name, "filename": name, "content": content})
+        store.add_embedding(name, np.array(vector))
+
+    queries = ["invoice", "report"]
+    embeddings = [[1.0, 0.1], [0.1, 1.0]]
+    batch = store.search_batch(queries, embeddings, limit=3)
+
+    for query, embedding, results in zip(queries, embeddings, batch):
+        single = store.search(query, embedding, limit=3)
+        assert [doc["id"] for doc in results] == [doc["id"] for doc in single]
+        assert [doc["similarity_score"] for doc in results] == pytest.approx([doc["similarity_score"] for doc in single])
@@ -0,0 +1,85 @@
+import os
+from app.ml.shared_index import SharedIndex
+
+
+def _doc(doc_id, content):
+    return {"id": doc_id, "filename": f"{doc_id}.txt", "content": content, "metadata": {}}
+
+
+def test_readers_see_published_segments(tmp_path):
+    writer = SharedIndex(str(tmp_path), poll_interval=0)
+    reader = SharedIndex(str(tmp_path), poll_interval=0)
+    assert len(reader) == 0
+
+    writer.publish([_doc("a", "part number XJ-9000 spec")], [[0.0, 1.0]])
+    writer.publish([_doc("b", "general overview"), _doc("c", "quarterly report")], [[1.0, 0.0], [0.6, 0.8]])
+
+    assert len(reader) == 3
+    assert reader.version == 2
+    results = reader.search("xj-9000", query_embedding=[1.0, 0.0], limit=3)
+    by_id = {doc["id"]: doc for doc in results}
+    assert by_id["a"]["lexical_score"] > 0
+    assert by_id["b"]["similarity_score"] == 1.0
+    assert results[0]["id"] in {"a", "b"}
+
+
+def test_readers_see_publishes_that_keep_the_manifest_mtime(tmp_path):
+    writer = SharedIndex(str(tmp_path), poll_interval=0)
+    reader = SharedIndex(str(tmp_path), poll_interval=0)
+    writer.publish([_doc("a", "first")], [[1.0, 0.0]])
+    assert len(reader) == 1
+
+    manifest = os.path.join(str(tmp_path), "manifest.json")
+    stat = os.stat(manifest)
+    writer.publish([_doc("b", "second")], [[0.0, 1.0]])
+    # Same timestamp, as for two publishes within the filesystem's granularity
+    os.utime(manifest, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    assert len(reader) == 2
+    assert reader.version == 2
+
+
+def test_compaction_preserves_results(tmp_path):
+    index = SharedIndex(str(tmp_path), poll_interval=0, merge_factor=3)
+    for i in range(3):
+        index.publish([_doc(f"d{i}", f"invoice {i} " + "payment " * i)], [[1.0, float(i)]])
+    before = index.search("invoice payment", query_embedding=[1.0, 1.0], limit=3)
+
+    index.compact()
+    assert len(os.listdir(tmp_path / "segments")) == 1
+    after = index.search("invoice payment", query_embedding=[1.0, 1.0], limit=3)
+    assert [doc["id"] for doc in after] == [doc["id"] for doc in before]
+
+
+def test_tiered_merging_only_combines_similar_sizes(tmp_path):
+    index = SharedIndex(str(tmp_path), poll_interval=0, merge_factor=3)
+    segments_dir = tmp_path / "segments"
+
+    for i in range(3):
+        index.publish([_doc(f"a{i}", "memo")], [[1.0, 0.0]])
+    # Three 1-document segments merged into one of 3 documents
+    assert len(os.listdir(segments_dir)) == 1
+    (large,) = os.listdir(segments_dir)
+
+    for i in range(2):
+        index.publish([_doc(f"b{i}", "memo")], [[1.0, 0.0]])
+    # Small publishes leave the larger segment untouched
+    assert len(os.listdir(segments_dir)) == 3
+    assert large in os.listdir(segments_dir)
+
+    for i in range(7):
+        index.publish([_doc(f"c{i}", "memo")], [[1.0, 0.0]])
+    # Merges cascade: three 3-document segments became one of 9
+    assert len(index) == 12
+    sizes = sorted(len(segment) for segment in index._segments)
+    assert sizes == [3, 9]
+    assert large not in os.listdir(segments_dir)
+
+
+def test_query_fallback_reads_the_shared_index(tmp_path, monkeypatch):
+    from app.api import query
+    index = SharedIndex(str(tmp_path), poll_interval=0)
+    index.publish([_doc("s1", "shared only"), _doc("s2", "also shared")], [[1.0, 0.0], [0.0, 1.0]])
+    monkeypatch.setattr(query, "shared_index", index)
+
+    assert [doc["id"] for doc in query._fallback_documents(1)] == ["s1"]
@@ -0,0 +1,29 @@
+import json
+import subprocess
+import sys
+import os
+
+# Generous wall-clock budget for importing the API and Celery app; the
+# heavy-module check below is the precise regression signal
+IMPORT_BUDGET_SECONDS = 2.0
+HEAVY_MODULES = ["numpy", "pandas", "sklearn", "scipy", "pdfminer"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import app.main, app.tasks
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % HEAVY_MODULES
+
+
+def test_import_stays_lazy_and_within_budget():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT], cwd=backend_dir,
+        capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    assert result["loaded"] == []
+    assert result["elapsed"] < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,104 @@
+from fastapi.testclient import TestClient
+from app.main import app
+import pytest
+from app.api import alerts
+from app.core.stats import LatencySketch, MemoryCounters, RedisCounters, StatsAggregator, stats
+from app.ml import anomaly
+from app.tasks import process_documents_batch
+
+client = TestClient(app)
+
+
+def test_latency_sketch_quantiles():
+    sketch = LatencySketch()
+    for i in range(1, 1001):
+        sketch.record(i / 1000)
+
+    assert sketch.count == 1000
+    assert abs(sketch.mean - 0.5005) < 1e-9
+    assert abs(sketch.quantile(0.50) - 0.5) / 0.5 < 0.03
+    assert abs(sketch.quantile(0.99) - 0.99) / 0.99 < 0.03
+    assert sketch.quantile(1.0) <= sketch.max
+
+
+def test_stats_aggregator_rollup():
+    aggregator = StatsAggregator(bucket_seconds=60, retention=10)
+    aggregator.observe("query", 0.2)
+    aggregator.observe("query", 0.4)
+    aggregator.increment("anomalies", 3)
+
+    assert aggregator.count("query") == 2
+    assert aggregator.count("anomalies") == 3
+    assert abs(aggregator.mean("query") - 0.3) < 1e-9
+
+    series = aggregator.series()
+    assert len(series) == 1
+    assert series[0]["counters"] == {"query": 2, "anomalies": 3}
+    assert series[0]["latency"]["query"]["count"] == 2
+
+
+def test_dashboard_stats_reflect_queries():
+    stats.reset()
+    headers = {"Authorization": "Bearer test"}
+    client.post("/api/query", json={"question": "quarterly report"}, headers=headers)
+
+    response = client.get("/api/dashboard/stats?series=true", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total_queries"] == 1
+    assert data["latency"]["query"]["count"] == 1
+    assert len(data["series"]) == 1
+
+
+def test_dashboard_counts_distinct_anomalies_recorded_by_the_worker(monkeypatch):
+    # A Celery worker and an API process, each with its own aggregator,
+    # sharing one store as they share Redis in deployment
+    store = MemoryCounters()
+    worker = StatsAggregator(store=store)
+    api = StatsAggregator(store=store)
+    monkeypatch.setattr(anomaly, "stats", worker)
+    monkeypatch.setattr(alerts, "stats_aggregator", api)
+
+    first = process_documents_batch()
+    process_documents_batch()  # the hourly pass scores the same documents again
+
+    response = client.get("/api/dashboard/stats", headers={"Authorization": "Bearer test"})
+    assert response.status_code == 200
+    assert first["anomalies"] >= 1
+    assert response.json()["anomalies_detected"] == first["anomalies"]
+
+
+def test_buffered_events_reach_the_shared_store():
+    store = MemoryCounters()
+    writer = StatsAggregator(store=store, flush_interval=60)
+    reader = StatsAggregator(store=store)
+    writer.observe("parse", 0.5)
+    writer.add_distinct("anomalies", ["a", "b", "a"])
+    assert reader.count("parse") == 0
+
+    writer.flush()
+    assert reader.count("parse") == 1
+    assert reader.mean("parse") == 0.5
+    assert reader.distinct("anomalies") == 2
+
+
+def test_redis_counters_shared_between_aggregators():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    stores = []
+    for _ in range(2):
+        store = RedisCounters("redis://unused")
+        store._client = fakeredis.FakeRedis(server=server)
+        stores.append(store)
+    worker, api = StatsAggregator(store=stores[0]), StatsAggregator(store=stores[1])
+
+    worker.observe("parse", 0.2)
+    worker.observe("parse", 0.4)
+    worker.add_distinct("anomalies", ["doc_1", "doc_2"])
+    worker.add_distinct("anomalies", ["doc_2"])
+
+    totals = api.totals()
+    assert totals.count("parse") == 2
+    assert abs(totals.mean("parse") - 0.3) < 1e-9
+    assert totals.last_seen("parse") is not None
+    assert totals.distinct("anomalies") == 2
@@ -0,0 +1,116 @@
+import io
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api import parse
+from app.core.storage import CachedStorage, LocalStorage, S3Storage
+from benchmarks.corpus import make_pdf
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def s3():
+    with moto.mock_aws():
+        boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="uploads")
+        yield S3Storage("uploads", prefix="docs/", chunk_size=5 * 1024 * 1024, block_size=4096, region_name="us-east-1")
+
+
+def test_s3_multipart_upload_and_ranged_reads(s3):
+    data = os.urandom(11 * 1024 * 1024)  # three multipart parts
+
+    assert s3.save("big.bin", io.BytesIO(data)) == len(data)
+    assert s3.size("big.bin") == len(data)
+    assert s3.uri("big.bin") == "s3://uploads/docs/big.bin"
+
+    with s3.open("big.bin") as f:
+        f.seek(len(data) - 10)
+        assert f.read() == data[-10:]
+        f.seek(1000)
+        assert f.read(5) == data[1000:1005]
+
+    s3.delete("big.bin")
+    with pytest.raises(FileNotFoundError):
+        s3.size("big.bin")
+
+
+def test_cache_evicts_least_recently_used(s3, tmp_path):
+    cache = CachedStorage(s3, str(tmp_path), max_bytes=4000)
+    for name in "abcde":
+        s3.save(name, io.BytesIO(name.encode() * 1000))
+
+    for name in "abca":
+        with cache.open(name) as f:
+            assert f.read() == name.encode() * 1000
+        time.sleep(0.01)
+    assert cache.stats() == {"hits": 1, "misses": 3}
+
+    cache.open("d").close()  # 4000 bytes: at the limit, nothing evicted
+    time.sleep(0.01)
+    cache.open("e").close()  # over the limit: b is the least recently used
+    assert not os.path.exists(cache._cache_path("b"))
+    assert all(os.path.exists(cache._cache_path(name)) for name in "acde")
+
+
+def test_cached_s3_save_reads_back_from_s3_and_cache(s3, tmp_path):
+    cache = CachedStorage(s3, str(tmp_path), max_bytes=1024 * 1024)
+    upload = io.BytesIO(b"header" + b"payload" * 1000)
+    upload.seek(6)  # saves read from the current position
+
+    assert cache.save("doc.txt", upload) == 7000
+    assert not upload.closed
+    with s3.open("doc.txt") as f:
+        assert f.read() == b"payload" * 1000
+    with cache.open("doc.txt") as f:
+        assert f.read() == b"payload" * 1000
+    assert cache.stats() == {"hits": 1, "misses": 0}
+
+
+def test_expire_removes_old_uploads(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    storage.save("old.txt", io.BytesIO(b"old"))
+    storage.save("new.txt", io.BytesIO(b"new"))
+    os.utime(storage.path("old.txt"), (time.time() - 7200, time.time() - 7200))
+
+    assert storage.expire(3600) == 1
+    assert os.listdir(tmp_path) == ["new.txt"]
+
+
+def test_parse_endpoint_streams_from_s3(s3, monkeypatch):
+    monkeypatch.setattr(parse, "storage", s3)
+
+    response = client.post(
+        "/api/parse",
+        files={"file": ("report.pdf", make_pdf(3), "application/pdf")},
+        headers={"Authorization": "Bearer test"}
+    )
+
+    assert response.status_code == 200
+    metadata = response.json()["metadata"]
+    assert metadata["page_count"] == 3
+    assert metadata["file_path"].startswith("s3://uploads/docs/")
+    assert s3.size(metadata["storage_key"]) > 0
+
+
+def test_cache_tracks_size_without_rescanning(s3, tmp_path, monkeypatch):
+    (tmp_path / "old.bin").write_bytes(b"x" * 3000)  # left by an earlier process
+    cache = CachedStorage(s3, str(tmp_path), max_bytes=4000)
+    assert cache._total == 3000
+
+    def scandir(path):
+        raise AssertionError("cache directory rescanned")
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    cache.save("a", io.BytesIO(b"a" * 1000))
+    assert cache._total == 4000
+    cache.save("b", io.BytesIO(b"b" * 1000))  # over the limit: the startup file goes
+    assert not (tmp_path / "old.bin").exists()
+    assert cache._total == 2000
+
+    cache.delete("a")
+    assert cache._total == 1000
@@ -0,0 +1,78 @@
+from app.tasks import (
+    PRIORITY_HIGH,
+    PRIORITY_LOW,
+    celery_app,
+    create_embeddings_task,
+    enqueue_embeddings,
+    process_audio_task,
+    process_documents_batch
+)
+
+
+def _queue(task_name):
+    return celery_app.amqp.router.route({}, task_name)["queue"].name
+
+
+def test_tasks_are_routed_per_workload():
+    assert _queue("app.tasks.create_embeddings_task") == "ingest"
+    assert _queue("app.tasks.process_audio_task") == "audio"
+    assert _queue("app.tasks.process_documents_batch") == "batch"
+    assert _queue("app.tasks.expire_uploads") == "batch"
+
+
+def test_long_tasks_are_bounded():
+    assert celery_app.conf.task_acks_late
+    assert celery_app.conf.worker_prefetch_multiplier == 1
+    assert celery_app.conf.result_expires
+    for task in (create_embeddings_task, process_audio_task, process_documents_batch):
+        assert task.soft_time_limit < task.time_limit
+
+
+def test_backfills_queue_behind_interactive_ingestion(monkeypatch):
+    calls = []
+    monkeypatch.setattr(create_embeddings_task, "apply_async", lambda args, **options: calls.append(options))
+
+    enqueue_embeddings([{"content": "new upload"}])
+    enqueue_embeddings([{"content": "old document"}], backfill=True)
+
+    assert calls == [
+        {"queue": "ingest", "priority": PRIORITY_HIGH},
+        {"queue": "reembed", "priority": PRIORITY_LOW},
+    ]
+
+
+def test_uploads_embed_on_the_ingest_queue_with_a_shared_index(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import tasks
+    from app.api import parse
+    from app.main import app
+    from app.ml.shared_index import SharedIndex
+
+    index = SharedIndex(str(tmp_path / "index"), poll_interval=0)
+    monkeypatch.setattr(parse, "shared_index", index)
+    monkeypatch.setattr(tasks, "shared_index", index)
+    queued = []
+    monkeypatch.setattr(create_embeddings_task, "apply_async", lambda args, **options: queued.append((args, options)))
+
+    response = TestClient(app).post(
+        "/api/parse", files={"file": ("notes.txt", b"quarterly shared notes", "text/plain")},
+        headers={"Authorization": "Bearer test"}
+    )
+
+    assert response.status_code == 200
+    ((documents,), options), = queued
+    assert options == {"queue": "ingest", "priority": PRIORITY_HIGH}
+    assert [doc["id"] for doc in documents] == [response.json()["file_id"]]
+
+    # The worker embeds and publishes to the index every API worker reads
+    create_embeddings_task.run(documents)
+    assert [doc["id"] for doc in index.search("quarterly", None, limit=1)] == [response.json()["file_id"]]
+
+
+def test_embedding_task_needs_a_shared_index(monkeypatch):
+    import pytest
+    from app import tasks
+
+    monkeypatch.setattr(tasks, "shared_index", None)
+    with pytest.raises(ValueError, match="SHARED_INDEX_DIR"):
+        create_embeddings_task.run([{"id": "a", "content": "text"}])
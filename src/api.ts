@@ -33,6 +33,8 @@ export interface ASRResponse {
   confidence: number;
   duration?: number;
   language: string;
+  original_duration?: number;
+  processed_duration?: number;
 }
 
 export interface QueryResponse {
@@ -59,12 +61,30 @@ export interface AnomalyAlert {
   metadata: Record<string, any>;
 }
 
+export interface LatencySummary {
+  count: number;
+  mean: number;
+  p50: number;
+  p95: number;
+  p99: number;
+  max: number;
+}
+
+export interface StatsBucket {
+  start: string;
+  counters: Record<string, number>;
+  latency: Record<string, LatencySummary>;
+}
+
 export interface DashboardStats {
   total_documents: number;
   total_queries: number;
   avg_processing_time: number;
   anomalies_detected: number;
   last_processed?: string;
+  latency?: Record<string, LatencySummary>;
+  series?: StatsBucket[];
+  corpus?: Record<string, number>;
 }
 
 // API functions
@@ -97,11 +117,17 @@ export const apiService = {
   },
 
   // Query documents
-  queryDocuments: async (question: string, contextLimit = 5, includeSources = true): Promise<QueryResponse> => {
+  queryDocuments: async (
+    question: string,
+    contextLimit = 5,
+    includeSources = true,
+    filters?: Record<string, unknown>
+  ): Promise<QueryResponse> => {
     const response = await api.post('/api/query', {
       question,
       context_limit: contextLimit,
       include_sources: includeSources,
+      filters,
     });
     return response.data;
   },